@@ -2,13 +2,21 @@ import streamlit as st
 import pandas as pd
 import tempfile
 import os
+import io
 import json
 import csv
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 from utils.excel_parser import ExcelParser
 from utils.ai_client import AIClient
 from utils.code_renderer import CodeRenderer
+from utils.prompts import PROMPT_VERSION
+from utils.example_warmer import ExampleWarmer
+from utils.artifact_store import LOG_FILENAME, ArtifactHandle, get_artifact_store
+from utils.workbook_cache import get_workbook_cache, workbook_digest
+from utils.similarity_index import get_similarity_index
+from utils.script_analyzer import PreviewCost, analyze_scripts, throttle_for_preview
+from utils.project_bundle import build_zip, inline_project
 
 # Настройка страницы для мобильных устройств
 st.set_page_config(
@@ -72,52 +80,187 @@ def get_session_id():
         st.session_state.session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.urandom(4).hex()}"
     return st.session_state.session_id
 
-def save_user_state():
-    """Сохранение состояния пользователя"""
-    user_id = get_user_id()
-    user_state_file = os.path.join(USERS_DIR, f"{user_id}_state.json")
+# Журнал состояния сжимается в один снимок, когда в нем накапливается столько записей
+STATE_COMPACT_LINES = 200
+
+def get_state_file(user_id: str) -> str:
+    return os.path.join(USERS_DIR, f"{user_id}_state.jsonl")
+
+def save_user_state(**changes):
+    """Дозапись изменения состояния пользователя в журнал
     
-    state_to_save = {
-        'user_id': user_id,
-        'excel_tasks': st.session_state.get('excel_tasks', []),
-        'text_tasks': st.session_state.get('text_tasks', []),
-        'generated_codes': st.session_state.get('generated_codes', {}),
-        'html_contents': st.session_state.get('html_contents', {}),
-        'saved_files': st.session_state.get('saved_files', {}),
-        'last_saved': datetime.now().isoformat()
-    }
+    В журнал попадают только метаданные задач и ссылки на артефакты, тела страниц
+    хранятся в хранилище артефактов. Поддерживаемые изменения: excel_tasks, text_task, artifact.
+    """
+    user_state_file = get_state_file(get_user_id())
+    entry = dict(changes)
+    entry['saved_at'] = datetime.now().isoformat()
     
     try:
-        with open(user_state_file, 'w', encoding='utf-8') as f:
-            json.dump(state_to_save, f, ensure_ascii=False, indent=2)
+        with open(user_state_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        st.session_state.state_log_lines = st.session_state.get('state_log_lines', 0) + 1
+        if st.session_state.state_log_lines > STATE_COMPACT_LINES:
+            compact_user_state()
     except Exception as e:
         st.error(f"Ошибка сохранения состояния: {e}")
 
+def compact_user_state():
+    """Перезапись журнала одним снимком текущего состояния"""
+    snapshot = {
+        'excel_tasks': st.session_state.get('excel_tasks', []),
+        'excel_digest': st.session_state.get('last_file_hash'),
+        'text_tasks': st.session_state.get('text_tasks', []),
+        'artifact_refs': st.session_state.get('artifact_refs', {}),
+        'saved_files': st.session_state.get('saved_files', {})
+    }
+    entry = {'snapshot': snapshot, 'saved_at': datetime.now().isoformat()}
+    get_artifact_store().write_text(
+        get_state_file(get_user_id()), json.dumps(entry, ensure_ascii=False) + '\n'
+    )
+    st.session_state.state_log_lines = 1
+
 def load_user_state():
-    """Загрузка состояния пользователя"""
+    """Загрузка состояния пользователя (без тел страниц - они подгружаются при открытии задачи)"""
     user_id = get_user_id()
-    user_state_file = os.path.join(USERS_DIR, f"{user_id}_state.json")
+    user_state_file = get_state_file(user_id)
     
-    if os.path.exists(user_state_file):
-        try:
-            with open(user_state_file, 'r', encoding='utf-8') as f:
-                saved_state = json.load(f)
-            
-            # Восстанавливаем состояние
-            st.session_state.excel_tasks = saved_state.get('excel_tasks', [])
-            st.session_state.text_tasks = saved_state.get('text_tasks', [])
-            st.session_state.generated_codes = saved_state.get('generated_codes', {})
-            st.session_state.html_contents = saved_state.get('html_contents', {})
-            st.session_state.saved_files = saved_state.get('saved_files', {})
-            
-            # Обновляем информацию о последнем сохранении
-            st.session_state.last_state_load = saved_state.get('last_saved', 'unknown')
-            
-            return True
-        except Exception as e:
-            st.error(f"Ошибка загрузки состояния: {e}")
-            return False
-    return False
+    if not os.path.exists(user_state_file):
+        return load_legacy_user_state(user_id)
+    
+    try:
+        state = {'excel_tasks': [], 'text_tasks': [], 'artifact_refs': {}, 'saved_files': {}}
+        last_saved = 'unknown'
+        lines = 0
+        with open(user_state_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Недописанная строка после сбоя
+                    continue
+                lines += 1
+                last_saved = entry.get('saved_at', last_saved)
+                if 'snapshot' in entry:
+                    state = entry['snapshot']
+                if 'excel_tasks' in entry:
+                    state['excel_tasks'] = entry['excel_tasks']
+                    state['excel_digest'] = entry.get('excel_digest')
+                if 'text_task' in entry:
+                    if all(t['id'] != entry['text_task']['id'] for t in state['text_tasks']):
+                        state['text_tasks'].append(entry['text_task'])
+                if 'artifact' in entry:
+                    task_id = entry['artifact']['task_id']
+                    state['artifact_refs'][task_id] = entry['artifact']['ref']
+                    state['saved_files'][task_id] = entry['artifact']['saved_files']
+        
+        # Восстанавливаем состояние
+        st.session_state.excel_tasks = state.get('excel_tasks', [])
+        st.session_state.text_tasks = state.get('text_tasks', [])
+        st.session_state.artifact_refs = state.get('artifact_refs', {})
+        st.session_state.saved_files = state.get('saved_files', {})
+        st.session_state.state_log_lines = lines
+        if state.get('excel_digest'):
+            st.session_state.last_file_hash = state['excel_digest']
+            apply_workbook_results(state['excel_digest'])
+        
+        # Обновляем информацию о последнем сохранении
+        st.session_state.last_state_load = last_saved
+        
+        return True
+    except Exception as e:
+        st.error(f"Ошибка загрузки состояния: {e}")
+        return False
+
+def load_legacy_user_state(user_id: str):
+    """Однократный перенос старого {user_id}_state.json с полными телами страниц в журнал"""
+    legacy_state_file = os.path.join(USERS_DIR, f"{user_id}_state.json")
+    if not os.path.exists(legacy_state_file):
+        return False
+    
+    try:
+        with open(legacy_state_file, 'r', encoding='utf-8') as f:
+            saved_state = json.load(f)
+        
+        store = get_artifact_store()
+        user_codes_dir = os.path.join(USERS_DIR, user_id, "codes")
+        last_saved = saved_state.get('last_saved', 'unknown')
+        artifact_refs = {}
+        for task_id, html_content in saved_state.get('html_contents', {}).items():
+            digest, path, encoding = store.put_blob(html_content)
+            artifact_refs[task_id] = ArtifactHandle(
+                user_codes_dir, task_id, path, encoding, last_saved, digest
+            )._asdict()
+        
+        st.session_state.excel_tasks = saved_state.get('excel_tasks', [])
+        st.session_state.text_tasks = saved_state.get('text_tasks', [])
+        st.session_state.generated_codes = saved_state.get('generated_codes', {})
+        st.session_state.html_contents = saved_state.get('html_contents', {})
+        st.session_state.artifact_refs = artifact_refs
+        st.session_state.saved_files = saved_state.get('saved_files', {})
+        st.session_state.last_state_load = last_saved
+        
+        compact_user_state()
+        return True
+    except Exception as e:
+        st.error(f"Ошибка загрузки состояния: {e}")
+        return False
+
+def has_generated_code(task_id: str) -> bool:
+    return task_id in st.session_state.generated_codes or task_id in st.session_state.artifact_refs
+
+def get_task_code(task_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """(generated_code, html_content) задачи. Тело читается из хранилища при первом обращении"""
+    if task_id not in st.session_state.html_contents:
+        ref = st.session_state.artifact_refs.get(task_id)
+        html_content = get_artifact_store().read_html(ArtifactHandle(**ref)) if ref else None
+        if html_content is not None:
+            st.session_state.html_contents[task_id] = html_content
+            # Исходный ответ модели не сохраняется, код восстанавливается из HTML
+            st.session_state.generated_codes.setdefault(task_id, html_content)
+    return st.session_state.generated_codes.get(task_id), st.session_state.html_contents.get(task_id)
+
+def get_task_metadata(task_id: str) -> Dict:
+    """Метаданные последней сохраненной версии задачи из журнала хранилища (тело не читается)"""
+    ref = st.session_state.artifact_refs.get(task_id)
+    return get_artifact_store().index(ref['codes_dir']).get(task_id, {}) if ref else {}
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def analyze_preview_cost(html_content: str) -> PreviewCost:
+    """Оценка стоимости превью для артефактов, сохраненных до появления preview_cost"""
+    return analyze_scripts(html_content)
+
+def get_preview_cost(task_id: str, html_content: str) -> PreviewCost:
+    """Стоимость превью, записанная при сохранении; пересчет только для старых артефактов"""
+    metadata = get_task_metadata(task_id)
+    if 'preview_cost' in metadata:
+        return PreviewCost(metadata['preview_cost'], metadata.get('preview_flags', []))
+    return analyze_preview_cost(html_content)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_project_zip(manifest_key: str, _files: Dict[str, str]) -> bytes:
+    """ZIP архив проекта. Ключ кэша - манифест блобов версии, файлы повторно не хэшируются и не сжимаются"""
+    return build_zip(_files)
+
+def get_project_zip(task: Dict, files: Dict[str, str]) -> bytes:
+    manifest = get_task_metadata(task['id']).get('project_files')
+    if not manifest:
+        return build_zip(files)
+    return build_project_zip(json.dumps(manifest, sort_keys=True), files)
+
+def get_project_files(task: Dict) -> Optional[Dict[str, str]]:
+    """Файлы многофайлового проекта задачи: из сессии или по манифесту в журнале хранилища"""
+    if task.get('output') != 'project':
+        return None
+    files = st.session_state.project_files.get(task['id'])
+    if files is None:
+        manifest = get_task_metadata(task['id']).get('project_files')
+        files = get_artifact_store().read_files(manifest) if manifest else None
+        if files:
+            st.session_state.project_files[task['id']] = files
+    return files
 
 def load_tasks_from_files():
     """Загрузка задач из сохраненных файлов для переключения на них"""
@@ -129,83 +272,64 @@ def load_tasks_from_files():
     
     loaded_tasks = []
     
-    # Ищем все JSON файлы с метаданными
-    for filename in os.listdir(user_codes_dir):
-        if filename.endswith('.json'):
-            try:
-                with open(os.path.join(user_codes_dir, filename), 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                
-                # Создаем задачу из метаданных
-                task = {
-                    'id': metadata.get('task_id', filename),
-                    'description': metadata.get('task_description', ''),
-                    'summary': metadata.get('task_summary', ''),
-                    'type': metadata.get('task_type', 'file'),
-                    'generated_at': metadata.get('generated_at', ''),
-                    'html_file': metadata.get('html_file', ''),
-                    'metadata_file': filename
-                }
-                
-                # Добавляем в список загруженных задач
-                loaded_tasks.append(task)
-                
-                # Загружаем HTML содержимое если нужно
-                html_file_path = os.path.join(user_codes_dir, task['html_file'])
-                if os.path.exists(html_file_path) and task['id'] not in st.session_state.html_contents:
-                    with open(html_file_path, 'r', encoding='utf-8') as f:
-                        html_content = f.read()
-                    st.session_state.html_contents[task['id']] = html_content
-                
-                # ПРОВЕРЯЕМ, есть ли уже сохраненный код в других файлах
-                # Загружаем HTML файл и сохраняем его как код (если нужно)
-                if os.path.exists(html_file_path) and task['id'] not in st.session_state.generated_codes:
-                    with open(html_file_path, 'r', encoding='utf-8') as f:
-                        html_content = f.read()
-                    # Сохраняем оригинальный HTML как код
-                    st.session_state.generated_codes[task['id']] = html_content
-                
-            except Exception as e:
-                print(f"Ошибка загрузки файла {filename}: {e}")
+    # Только последняя версия каждой задачи по индексу хранилища. Тела страниц не читаются:
+    # задача получает ссылку на артефакт, HTML подгружается при открытии плитки
+    for metadata, handle in get_artifact_store().latest_entries(user_codes_dir):
+        task = {
+            'id': handle.task_id,
+            'description': metadata.get('task_description', ''),
+            'summary': metadata.get('task_summary', ''),
+            'type': metadata.get('task_type', 'file'),
+            'generated_at': metadata.get('generated_at', ''),
+            'html_file': os.path.basename(handle.path),
+            'metadata_file': metadata.get('metadata_file', LOG_FILENAME)
+        }
+        loaded_tasks.append(task)
+        st.session_state.artifact_refs.setdefault(task['id'], handle._asdict())
     
     return loaded_tasks
 
-def save_generated_code(session_id: str, task: Dict, html_content: str, generated_code: str):
-    """Сохранение сгенерированного кода в файл"""
+def save_generated_code(session_id: str, task: Dict, html_content: str, generated_code: str,
+                        project_files: Optional[Dict[str, str]] = None):
+    """Сохранение сгенерированного кода в файл (project_files - файлы многофайлового проекта)"""
     user_id = get_user_id()
     user_codes_dir = os.path.join(USERS_DIR, user_id, "codes")
-    os.makedirs(user_codes_dir, exist_ok=True)
     
-    # Сохраняем HTML файл
-    html_filename = f"task_{task['id']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-    html_filepath = os.path.join(user_codes_dir, html_filename)
-    
-    with open(html_filepath, 'w', encoding='utf-8') as f:
-        f.write(html_content)
-    
-    # Сохраняем метаданные
-    metadata = {
-        'task_id': task['id'],
-        'task_description': task.get('description', ''),
-        'task_summary': task.get('summary', ''),
-        'task_type': task.get('type', 'unknown'),
-        'generated_at': datetime.now().isoformat(),
-        'html_file': html_filename,
+    # Тело страницы сохраняется в общее хранилище, метаданные - в журнал директории
+    extra_metadata = {
+        'prompt_version': PROMPT_VERSION,
         'user_id': user_id,
         'session_id': session_id,
-        'platform': 'streamlit'
+        'platform': 'streamlit',
+        'quality_score': load_code_renderer().inspect_html(html_content).score,
+        **analyze_scripts(html_content).as_metadata()
     }
-    
-    metadata_filename = f"task_{task['id']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    metadata_filepath = os.path.join(user_codes_dir, metadata_filename)
-    
-    with open(metadata_filepath, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=2)
-    
-    # Сохраняем состояние пользователя
-    save_user_state()
-    
-    return html_filepath, metadata_filepath
+    if project_files:
+        # Неизмененные файлы проекта остаются теми же блобами
+        extra_metadata['project_files'] = get_artifact_store().put_files(project_files)
+        st.session_state.project_files[task['id']] = project_files
+    else:
+        st.session_state.project_files.pop(task['id'], None)
+    handle = get_artifact_store().save(user_codes_dir, task, html_content, extra_metadata)
+    metadata_filepath = os.path.join(user_codes_dir, LOG_FILENAME)
+    
+    # Сохраняем состояние пользователя: только ссылку на артефакт
+    ref = handle._asdict()
+    st.session_state.artifact_refs[task['id']] = ref
+    changes = {'artifact': {
+        'task_id': task['id'],
+        'ref': ref,
+        'saved_files': {'html_file': handle.path, 'metadata_file': metadata_filepath}
+    }}
+    if any(t['id'] == task['id'] for t in st.session_state.text_tasks):
+        changes['text_task'] = task
+    save_user_state(**changes)
+    
+    # Результат строки загруженной книги доступен этому пользователю при повторной загрузке того же файла
+    if st.session_state.get('last_file_hash') and any(t['id'] == task['id'] for t in st.session_state.excel_tasks):
+        get_workbook_cache().record_result(st.session_state.last_file_hash, user_id, task['id'], handle)
+    
+    return handle.path, metadata_filepath
 
 def log_activity(session_id: str, action: str, task_id: str = "", task_description: str = ""):
     """Логирование активности в Streamlit"""
@@ -228,6 +352,16 @@ def log_activity(session_id: str, action: str, task_id: str = "", task_descripti
             'streamlit'
         ])
 
+# Описания готовых примеров (используются и кнопками, и фоновым прогревом)
+EXAMPLES = {
+    'cat': "Создай креативное сайт-портфолио для кота, который ищет работу фронтенд-разработчиком в Яндексе. Включи анимации, интерактивные элементы и чувство юмора.",
+    'treasure': "Создай интерактивную карту сокровищ с анимацией клада, анимированным компасом и эффектами при наведении на острова.",
+    'dinosaur': "Создай простую игру 'Убеги от тимлида' с анимированным персонажем, препятствиями и счетчиком очков. В котором персонаж должен прыгать по нажатию пользователем и уклоняться от препядствий",
+    'memes': "Создай генератор мемов с движущимися элементами, с функциональной возможностью добавления текста и анимированными кнопками.",
+    'yandexoids': "Создай сайт на котором на шутливый манер рассказывается история о том, как древние Яндексоиды прилетели на планету Земля чтобы подарить людям сервис доставки еды и лучшую поисковую систему.",
+    'analytics': "Создай интерактивный дашборд для анализа статистики доставки с графиками, фильтрами и анимированными переходами."
+}
+
 # Инициализация утилит
 @st.cache_resource
 def load_ai_client():
@@ -237,6 +371,45 @@ def load_ai_client():
 def load_code_renderer():
     return CodeRenderer()
 
+@st.cache_data(show_spinner=False, max_entries=32)
+def parse_workbook(file_digest: str, _file_bytes: bytes) -> List[Dict]:
+    """Разбор Excel файла. Ключ кэша - SHA-256 содержимого, сами байты не хэшируются повторно.
+    Книги, которые уже разбирались в других сессиях или ботом, берутся из общего кэша"""
+    workbook_cache = get_workbook_cache()
+    tasks = workbook_cache.get_tasks(file_digest)
+    if tasks is None:
+        tasks = ExcelParser.extract_tasks_from_xlsx(io.BytesIO(_file_bytes))
+        if tasks:
+            workbook_cache.put_tasks(file_digest, tasks)
+    return tasks
+
+def forget_excel_results():
+    """Сброс результатов задач прежней книги: id задач позиционные (excel_1, excel_2...),
+    поэтому строки новой книги иначе открыли бы страницы старой"""
+    for key in ('artifact_refs', 'generated_codes', 'html_contents', 'project_files', 'saved_files'):
+        st.session_state[key] = {
+            task_id: value for task_id, value in st.session_state[key].items() if not task_id.startswith('excel_')
+        }
+    if st.session_state.current_task and st.session_state.current_task['id'].startswith('excel_'):
+        st.session_state.current_task = None
+
+def apply_workbook_results(file_digest: str, replace: bool = False) -> int:
+    """Отметка строк книги, для которых уже есть результат, возвращает их количество.
+    replace - загружена другая книга, результаты прежней сбрасываются"""
+    if replace:
+        forget_excel_results()
+    results = get_workbook_cache().results(file_digest, get_user_id())
+    for task_id, handle in results.items():
+        if replace:
+            st.session_state.artifact_refs[task_id] = handle._asdict()
+        else:
+            st.session_state.artifact_refs.setdefault(task_id, handle._asdict())
+    return len(results)
+
+@st.cache_resource
+def load_example_warmer():
+    return ExampleWarmer(load_ai_client(), load_code_renderer(), list(EXAMPLES.values())).start()
+
 def main():
     # URL изображений с GitHub
     header_image_path = "https://raw.githubusercontent.com/Thif26/aihackaton_telegram_coder_bot/main/images/Header.png"
@@ -259,8 +432,10 @@ def main():
     user_id = get_user_id()
     session_id = get_session_id()
     
-    # Логируем запуск приложения
-    log_activity(session_id, "start_app")
+    # Логируем запуск приложения один раз за сессию, а не на каждый rerun
+    if not st.session_state.get('start_logged'):
+        log_activity(session_id, "start_app")
+        st.session_state.start_logged = True
     
     # Инициализация сессии с загрузкой состояния
     if 'excel_tasks' not in st.session_state:
@@ -277,6 +452,10 @@ def main():
         st.session_state.html_contents = {}
     if 'saved_files' not in st.session_state:
         st.session_state.saved_files = {}
+    if 'artifact_refs' not in st.session_state:
+        st.session_state.artifact_refs = {}
+    if 'project_files' not in st.session_state:
+        st.session_state.project_files = {}
     
     # Загружаем состояние пользователя при первом запуске
     if 'state_loaded' not in st.session_state:
@@ -292,7 +471,7 @@ def main():
         st.session_state.state_loaded = True
     
     # Мобильная навигация
-    if st.session_state.current_task and st.session_state.current_task['id'] in st.session_state.generated_codes:
+    if st.session_state.current_task and has_generated_code(st.session_state.current_task['id']):
         display_results(session_id, user_id)
     else:
         show_input_section(session_id, user_id)
@@ -353,10 +532,6 @@ def handle_file_upload_mobile(session_id):
         key="excel_uploader"
     )
     
-    # Логируем загрузку файла
-    if uploaded_file:
-        log_activity(session_id, "upload_excel", task_description=uploaded_file.name)
-    
     # Показываем историю задач в виде плиток
     if st.session_state.excel_tasks:
         st.markdown("---")
@@ -368,19 +543,23 @@ def handle_file_upload_mobile(session_id):
     if uploaded_file:
         try:
             # Проверяем, не загружали ли уже этот файл
-            file_hash = hash(uploaded_file.getvalue())
+            file_bytes = uploaded_file.getvalue()
+            file_hash = workbook_digest(file_bytes)
             if 'last_file_hash' not in st.session_state or st.session_state.last_file_hash != file_hash:
-                excel_parser = ExcelParser()
-                tasks = excel_parser.extract_tasks_from_xlsx(uploaded_file)
+                # Логируем загрузку файла (один раз на новый файл)
+                log_activity(session_id, "upload_excel", task_description=uploaded_file.name)
+                tasks = parse_workbook(file_hash, file_bytes)
                 
                 if tasks:
                     st.session_state.excel_tasks = tasks
                     st.session_state.last_file_hash = file_hash
+                    ready = apply_workbook_results(file_hash, replace=True)
                     
                     # Сохраняем состояние после загрузки файла
-                    save_user_state()
+                    save_user_state(excel_tasks=tasks, excel_digest=file_hash)
                     
-                    st.success(f"✅ Найдено задач: {len(tasks)}")
+                    ready_text = f", уже готово: {ready}" if ready else ""
+                    st.success(f"✅ Найдено задач: {len(tasks)}{ready_text}")
                     
                     # Логируем успешную загрузку
                     log_activity(session_id, "excel_processed", task_description=f"Found {len(tasks)} tasks")
@@ -394,6 +573,8 @@ def handle_file_upload_mobile(session_id):
 
 def handle_text_input_mobile(session_id):
     """Оптимизированный текстовый ввод для мобильных"""
+    render_similar_offer(session_id)
+    
     # Показываем задачи из файлов для переключения
     if st.session_state.file_tasks:
         st.markdown("---")
@@ -411,21 +592,21 @@ def handle_text_input_mobile(session_id):
                     use_container_width=True, 
                     key="cat_portfolio_unique",
                     help="Создай креативное сайт-портфолио для кота"):
-            example_description = "Создай креативное сайт-портфолио для кота, который ищет работу фронтенд-разработчиком в Яндексе. Включи анимации, интерактивные элементы и чувство юмора."
+            example_description = EXAMPLES['cat']
             create_task_from_example(session_id, example_description, "Портфолио для кота в IT")
         
         if st.button("🗺️ Карта на которой расписано где курьеры прячут вкусные отменёнки", 
                     use_container_width=True, 
                     key="treasure_map_unique",
                     help="Интерактивная карта с анимацией"):
-            example_description = "Создай интерактивную карту сокровищ с анимацией клада, анимированным компасом и эффектами при наведении на острова."
+            example_description = EXAMPLES['treasure']
             create_task_from_example(session_id, example_description, "Карта сокровищ курьеров")
         
         if st.button("🎮 Игра: Убеги от тимлида", 
                     use_container_width=True, 
                     key="dinosaur_game_unique",
                     help="Простая игра с прыжками и препятствиями"):
-            example_description = "Создай простую игру 'Убеги от тимлида' с анимированным персонажем, препятствиями и счетчиком очков. В котором персонаж должен прыгать по нажатию пользователем и уклоняться от препядствий"
+            example_description = EXAMPLES['dinosaur']
             create_task_from_example(session_id, example_description, "Убеги от тимлида")
     
     with example_cols[1]:
@@ -433,21 +614,21 @@ def handle_text_input_mobile(session_id):
                     use_container_width=True, 
                     key="meme_generator_unique",
                     help="Генератор мемов с анимированными кнопками"):
-            example_description = "Создай генератор мемов с движущимися элементами, с функциональной возможностью добавления текста и анимированными кнопками."
+            example_description = EXAMPLES['memes']
             create_task_from_example(session_id, example_description, "Генератор мемов")
         
         if st.button("🪬 Тайные знания древних яндексоидов **УЗНАТЬ БОЛЬШЕ**", 
                     use_container_width=True, 
                     key="qwfqfqw_unique",
                     help="Шутливый сайт о древних Яндексоидах"):
-            example_description = "Создай сайт на котором на шутливый манер рассказывается история о том, как древние Яндексоиды прилетели на планету Земля чтобы подарить людям сервис доставки еды и лучшую поисковую систему."
+            example_description = EXAMPLES['yandexoids']
             create_task_from_example(session_id, example_description, "Тайные знания древних яндексоидов")
         
         if st.button("📊 Аналитика\nдоставки", 
                     use_container_width=True, 
                     key="analytics_dashboard_unique",
                     help="Дашборд для анализа доставки"):
-            example_description = "Создай интерактивный дашборд для анализа статистики доставки с графиками, фильтрами и анимированными переходами."
+            example_description = EXAMPLES['analytics']
             create_task_from_example(session_id, example_description, "Аналитика доставки")
     
     st.markdown("---")
@@ -468,9 +649,14 @@ def handle_text_input_mobile(session_id):
     # Обновляем session_state при изменении текста
     st.session_state.text_input = task_description
     
+    project_mode = st.checkbox(
+        "📦 Проект из нескольких файлов (index.html, styles.css, app.js) в ZIP",
+        key="project_mode"
+    )
+    
     if st.button("🚀 Сгенерировать код", type="primary", use_container_width=True, key="generate_from_text"):
         if task_description.strip():
-            create_task_from_text(session_id, task_description)
+            create_task_from_text(session_id, task_description, project=project_mode)
         else:
             st.warning("⚠️ Введите описание задачи")
 
@@ -495,16 +681,20 @@ def create_task_from_example(session_id, description, summary):
         'type': 'text'
     }
     
-    # Добавляем в историю текстовых задач
-    st.session_state.text_tasks.append(task)
-    
     # Логируем использование примера
     log_activity(session_id, "use_example", task_id, summary)
     
-    generate_code(session_id, task)
+    # Берем заранее подготовленный вариант, если он есть
+    pregenerated = load_example_warmer().take(description)
+    if not pregenerated and offer_similar_result(session_id, task):
+        return
+    
+    # Добавляем в историю текстовых задач
+    st.session_state.text_tasks.append(task)
+    generate_code(session_id, task, pregenerated=pregenerated)
 
-def create_task_from_text(session_id, task_description):
-    """Создает задачу из пользовательского текста и запускает генерацию"""
+def create_task_from_text(session_id, task_description, project=False):
+    """Создает задачу из пользовательского текста и запускает генерацию (project - многофайловый проект)"""
     # Проверяем, нет ли уже такой задачи в истории
     existing_task = next((t for t in st.session_state.text_tasks if t['description'] == task_description), None)
     
@@ -523,12 +713,67 @@ def create_task_from_text(session_id, task_description):
         'summary': task_description[:50] + "..." if len(task_description) > 50 else task_description,
         'type': 'text'
     }
+    if project:
+        task['output'] = 'project'
+    
+    # Готовые результаты похожих задач однофайловые - для проектов не предлагаем
+    if not project and offer_similar_result(session_id, task):
+        return
     
     # Добавляем в историю текстовых задач
     st.session_state.text_tasks.append(task)
-    
     generate_code(session_id, task)
 
+def offer_similar_result(session_id, task) -> bool:
+    """Если похожая задача уже генерировалась, предлагает готовый результат вместо нового вызова модели"""
+    match = get_similarity_index().query(task['description'], get_user_id(), load_ai_client().model)
+    if not match or not os.path.exists(match.ref.get('path', '')):
+        return False
+    
+    st.session_state.similar_offer = {
+        'task': task,
+        'ref': match.ref,
+        'similarity': match.similarity,
+        'description': match.description
+    }
+    log_activity(session_id, "similar_offer", task['id'], match.description)
+    st.rerun()
+    return True
+
+def accept_similar_offer(offer) -> Dict:
+    """Задача из предложения попадает в историю только после выбора пользователя.
+    id выдается заново: пока предложение ждало ответа, могли появиться другие задачи"""
+    del st.session_state.similar_offer
+    task = dict(offer['task'], id=f"text_{len(st.session_state.text_tasks) + 1}")
+    st.session_state.text_tasks.append(task)
+    return task
+
+def render_similar_offer(session_id):
+    """Выбор между готовым результатом похожей задачи и новой генерацией"""
+    offer = st.session_state.get('similar_offer')
+    if not offer:
+        return
+    
+    description = offer['description']
+    st.info(
+        f"♻️ Похожая задача уже генерировалась (сходство {offer['similarity']:.0%}):\n\n"
+        f"«{description[:200]}{'...' if len(description) > 200 else ''}»"
+    )
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("♻️ Показать готовый", use_container_width=True, key="similar_use"):
+            task = accept_similar_offer(offer)
+            html_content = get_artifact_store().read_html(ArtifactHandle(**offer['ref']))
+            if html_content:
+                log_activity(session_id, "similar_reuse", task['id'], description)
+                generate_code(session_id, task, pregenerated=(html_content, html_content), index_result=False)
+            else:
+                generate_code(session_id, task)
+    with col2:
+        if st.button("✨ Сгенерировать заново", use_container_width=True, key="similar_fresh"):
+            generate_code(session_id, accept_similar_offer(offer))
+    st.markdown("---")
+
 def display_task_tiles(tasks, session_id, task_type):
     """Отображение задач в виде плиток с превью"""
     if not tasks:
@@ -549,13 +794,8 @@ def display_task_tiles(tasks, session_id, task_type):
 def render_task_tile(task, session_id, task_type, index):
     """Рендеринг одной плитки задачи с кликабельностью"""
     # Статус задачи
-    has_generated_code = task['id'] in st.session_state.generated_codes
-    status = "✅" if has_generated_code else "⏳"
-    
-    # Получаем HTML превью если есть сгенерированный код
-    preview_html = ""
-    if has_generated_code:
-        preview_html = st.session_state.html_contents.get(task['id'], "")
+    task_has_code = has_generated_code(task['id'])
+    status = "✅" if task_has_code else "⏳"
 
     # Создаем контейнер для плитки
     with st.container():
@@ -592,25 +832,42 @@ def render_task_tile(task, session_id, task_type, index):
         # Разделитель между плитками
         st.markdown("---")
         
-def generate_code(session_id, task):
-    """Генерация кода для задачи"""
+def generate_code(session_id, task, pregenerated=None, index_result=True):
+    """Генерация кода для задачи (pregenerated - готовая пара generated_code, html_content,
+    index_result - добавить результат в индекс похожих задач)"""
     ai_client = load_ai_client()
-    code_renderer = load_code_renderer()
     
     # Логируем начало генерации
     log_activity(session_id, "generate_code_start", task['id'], task.get('description', ''))
     
     with st.spinner("🔄 Генерируем код с помощью AI..."):
         try:
-            generated_code = ai_client.generate_code(task['description'])
+            project_files = None
+            if pregenerated:
+                generated_code, html_content = pregenerated
+            elif task.get('output') == 'project':
+                # Файлы проекта скачиваются ZIP архивом, однофайловая версия - для превью и хранилища
+                with load_example_warmer().generating():
+                    project_files = ai_client.generate_project(task['description'])
+                generated_code = project_files['index.html'] if project_files else None
+                if project_files:
+                    html_content = load_code_renderer().prepare_html(inline_project(project_files))
+            else:
+                # Пользовательская генерация - фоновый прогрев примеров уступает ей API
+                with load_example_warmer().generating():
+                    generated_code = ai_client.generate_code(task['description'])
+                if generated_code:
+                    html_content = load_code_renderer().prepare_html(generated_code)
             
             if generated_code:
-                html_content = code_renderer.prepare_html(generated_code)
-                
                 # Сохраняем код в файлы
                 html_filepath, metadata_filepath = save_generated_code(
-                    session_id, task, html_content, generated_code
+                    session_id, task, html_content, generated_code, project_files
                 )
+                if index_result:
+                    get_similarity_index().add(
+                        task['description'], st.session_state.artifact_refs[task['id']], get_user_id(), ai_client.model
+                    )
                 
                 # ПРАВИЛЬНОЕ сохранение кода в словарь - сохраняем сам код, а не True
                 st.session_state.generated_codes[task['id']] = generated_code
@@ -637,6 +894,50 @@ def generate_code(session_id, task):
             st.error(f"❌ Ошибка генерации: {str(e)}")
             log_activity(session_id, "generate_code_error", task['id'], str(e))
 
+def edit_code(session_id, task, instruction):
+    """Точечная правка сгенерированного кода по описанию пользователя"""
+    ai_client = load_ai_client()
+    
+    log_activity(session_id, "edit_code_start", task['id'], instruction)
+    
+    with st.spinner("✏️ Вносим изменения..."):
+        try:
+            html_content = get_task_code(task['id'])[1] or ""
+            project_files = get_project_files(task)
+            with load_example_warmer().generating():
+                if project_files:
+                    # Правятся только затронутые файлы проекта
+                    project_files = ai_client.edit_project(project_files, instruction)
+                    edited_code = project_files['index.html'] if project_files else None
+                else:
+                    edited_code = ai_client.edit_code(html_content, instruction)
+            
+            if edited_code:
+                html_content = load_code_renderer().prepare_html(inline_project(project_files) if project_files else edited_code)
+                
+                html_filepath, metadata_filepath = save_generated_code(
+                    session_id, task, html_content, edited_code, project_files
+                )
+                
+                st.session_state.generated_codes[task['id']] = edited_code
+                st.session_state.html_contents[task['id']] = html_content
+                st.session_state.saved_files[task['id']] = {
+                    'html_file': html_filepath,
+                    'metadata_file': metadata_filepath
+                }
+                
+                log_activity(session_id, "edit_code_success", task['id'], instruction)
+                
+                st.success("✅ Изменения внесены!")
+                st.rerun()
+            else:
+                st.error("❌ Не удалось применить изменение. Попробуйте переформулировать или перегенерируйте код.")
+                log_activity(session_id, "edit_code_failed", task['id'], instruction)
+                
+        except Exception as e:
+            st.error(f"❌ Ошибка изменения: {str(e)}")
+            log_activity(session_id, "edit_code_error", task['id'], str(e))
+
 def switch_to_task(session_id, task):
     """Переключение на существующую задачу без генерации"""
     st.session_state.current_task = task
@@ -652,9 +953,8 @@ def display_results(session_id, user_id):
     """Оптимизированное отображение результатов для мобильных"""
     task = st.session_state.current_task
     
-    # Получаем сохраненный код для текущей задачи
-    generated_code = st.session_state.generated_codes.get(task['id'])
-    html_content = st.session_state.html_contents.get(task['id'])
+    # Получаем сохраненный код для текущей задачи (тело подгружается только здесь)
+    generated_code, html_content = get_task_code(task['id'])
     
     if not generated_code or not html_content:
         st.error("❌ Код для этой задачи не найден")
@@ -671,13 +971,24 @@ def display_results(session_id, user_id):
         if st.button("🔄 Перегенерировать", use_container_width=True):
             generate_code(session_id, task)
     with col2:
-        st.download_button(
-            label="💾 Скачать HTML",
-            data=html_content,
-            file_name=f"task_{task['id']}_code.html",
-            mime="text/html",
-            use_container_width=True
-        )
+        project_files = get_project_files(task)
+        if project_files:
+            # Архив собирается в памяти
+            st.download_button(
+                label="📦 Скачать ZIP",
+                data=get_project_zip(task, project_files),
+                file_name=f"task_{task['id']}_project.zip",
+                mime="application/zip",
+                use_container_width=True
+            )
+        else:
+            st.download_button(
+                label="💾 Скачать HTML",
+                data=html_content,
+                file_name=f"task_{task['id']}_code.html",
+                mime="text/html",
+                use_container_width=True
+            )
     with col3:
         if st.button("📝 Новая задача", use_container_width=True):
             clear_session()
@@ -690,9 +1001,22 @@ def display_results(session_id, user_id):
     if st.session_state.get('show_stats', False):
         show_statistics(session_id, user_id)
     
+    # Точечная правка без полной перегенерации
+    with st.expander("✏️ Изменить страницу"):
+        instruction = st.text_input(
+            "Что изменить?",
+            placeholder="Например: сделай фон темным, а кнопки круглыми",
+            key=f"edit_instruction_{task['id']}"
+        )
+        if st.button("Применить изменение", use_container_width=True, key=f"apply_edit_{task['id']}"):
+            if instruction.strip():
+                edit_code(session_id, task, instruction)
+            else:
+                st.warning("⚠️ Опишите изменение")
+    
     # Вертикальное расположение вместо колонок
     st.markdown("### 👁️ Предпросмотр")
-    st.components.v1.html(html_content, height=1000, scrolling=True)
+    render_preview(task, html_content)
     
     st.markdown("### 📝 Код")
     with st.expander("Показать код"):
@@ -703,13 +1027,32 @@ def display_results(session_id, user_id):
             st.error("Код недоступен для отображения")
 
 
+def render_preview(task, html_content):
+    """Превью с учетом стоимости: тяжелые страницы запускаются по кнопке и с ограничением анимаций"""
+    preview_cost = get_preview_cost(task['id'], html_content)
+    run_key = f"heavy_preview_{task['id']}"
+    
+    if preview_cost.level == 'high' and not st.session_state.get(run_key):
+        st.warning(
+            f"⚠️ Страница тяжелая для превью ({preview_cost.describe()}). "
+            "Скачайте файл или запустите превью с ограничением анимаций."
+        )
+        if st.button("▶️ Запустить превью", use_container_width=True, key=f"run_preview_{task['id']}"):
+            st.session_state[run_key] = True
+            st.rerun()
+        return
+    
+    if preview_cost.level != 'low':
+        html_content = throttle_for_preview(html_content)
+    st.components.v1.html(html_content, height=1000, scrolling=True)
+
 def show_statistics(session_id, user_id):
     """Показать статистику по сессии"""
     st.markdown("---")
     st.markdown("### 📊 Статистика сессии")
     
     total_tasks = len(st.session_state.excel_tasks) + len(st.session_state.text_tasks) + len(st.session_state.file_tasks)
-    generated_tasks = len(st.session_state.generated_codes)
+    generated_tasks = len(set(st.session_state.generated_codes) | set(st.session_state.artifact_refs))
     
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -732,7 +1075,7 @@ def show_settings(session_id, user_id):
     
     # Статистика
     total_tasks = len(st.session_state.excel_tasks) + len(st.session_state.text_tasks) + len(st.session_state.file_tasks)
-    generated_tasks = len(st.session_state.generated_codes)
+    generated_tasks = len(set(st.session_state.generated_codes) | set(st.session_state.artifact_refs))
     st.write(f"**📊 Статистика:** Всего задач: {total_tasks}, Сгенерировано: {generated_tasks}")
     
     if st.button("🔄 Проверить подключение к API", use_container_width=True):
@@ -791,6 +1134,8 @@ def clear_history(session_id):
     st.session_state.file_tasks = []
     st.session_state.generated_codes = {}
     st.session_state.html_contents = {}
+    st.session_state.artifact_refs = {}
+    st.session_state.project_files = {}
     st.session_state.saved_files = {}
     
     if 'last_file_hash' in st.session_state:
@@ -799,7 +1144,7 @@ def clear_history(session_id):
     clear_session()
     
     # Сохраняем пустое состояние
-    save_user_state()
+    compact_user_state()
     
     st.success("✅ История задач очищена!")
     st.rerun()
@@ -0,0 +1,185 @@
+"""Офлайн бенчмарк TelegramBot на фейковых OpenRouter и Bot API
+
+Пример:
+    python -m benchmarks.bench_bot --users 20 --latency lognormal:-1.5,0.6 --output benchmarks/results/bot.json
+    python -m benchmarks.bench_bot --users 20 --compare benchmarks/results/bot.json
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import itertools
+import resource
+import tempfile
+import tracemalloc
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update
+
+from benchmarks.common import percentile, write_results, compare_results
+from benchmarks.fake_openrouter import FakeOpenRouterServer
+from benchmarks.fake_telegram import FakeTelegramServer
+from benchmarks.workbooks import build_workbook
+
+BENCH_TOKEN = "123456:BENCHMARK"
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+
+def _user(user_id: int) -> Dict:
+    return {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}", 'username': f"user{user_id}"}
+
+
+def _message(user_id: int, **fields) -> Dict:
+    message = {
+        'message_id': next(_message_ids),
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': _user(user_id),
+    }
+    message.update(fields)
+    return {'update_id': next(_update_ids), 'message': message}
+
+
+def command_update(user_id: int, command: str) -> Dict:
+    return _message(user_id, text=command, entities=[{'type': 'bot_command', 'offset': 0, 'length': len(command)}])
+
+
+def text_update(user_id: int, text: str) -> Dict:
+    return _message(user_id, text=text)
+
+
+def document_update(user_id: int, file_id: str, file_name: str = "tasks.xlsx") -> Dict:
+    return _message(user_id, document={'file_id': file_id, 'file_unique_id': file_id, 'file_name': file_name})
+
+
+def callback_update(user_id: int, data: str) -> Dict:
+    return {
+        'update_id': next(_update_ids),
+        'callback_query': {
+            'id': str(next(_message_ids)),
+            'from': _user(user_id),
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {'message_id': 1, 'date': int(time.time()), 'chat': {'id': user_id, 'type': 'private'}},
+        }
+    }
+
+
+def user_scenario(user_id: int, workbook_file_id: str) -> List[Dict]:
+    """Типичная сессия пользователя: старт, пример, свой текст, Excel, выбор задачи, переключение"""
+    return [
+        command_update(user_id, "/start"),
+        callback_update(user_id, "example_cat"),
+        text_update(user_id, f"Создай страницу с таймером для пользователя {user_id}"),
+        document_update(user_id, workbook_file_id),
+        callback_update(user_id, "ex:0"),
+        callback_update(user_id, "task_list"),
+        callback_update(user_id, "sw:0"),
+    ]
+
+
+async def run_user(application, updates: List[Dict], latencies: List[float]):
+    for data in updates:
+        update = Update.de_json(data, application.bot)
+        started = time.perf_counter()
+        await application.process_update(update)
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_benchmark(args) -> Dict:
+    openrouter = FakeOpenRouterServer(args.latency, args.error_rate, seed=args.seed).start()
+    telegram = FakeTelegramServer(latency=args.telegram_latency).start()
+    workbook_file_id = "bench_workbook"
+    telegram.add_file(workbook_file_id, build_workbook(args.workbook_rows, seed=args.seed))
+
+    os.environ.setdefault('OPENROUTER_API_KEY', 'benchmark')
+    # Фоновый прогрев примеров исказил бы замеры
+    os.environ.setdefault('EXAMPLE_WARMER_POOL_SIZE', '0')
+    from telegram_bot import TelegramBot
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_bot_")
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        bot = TelegramBot(BENCH_TOKEN, base_url=telegram.base_url, base_file_url=telegram.base_file_url)
+        bot.ai_client.api_url = openrouter.url
+        await bot.application.initialize()
+
+        scenarios = [user_scenario(100000 + i, workbook_file_id) for i in range(args.users)]
+        latencies: List[float] = []
+
+        tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        await asyncio.gather(*(run_user(bot.application, updates, latencies) for updates in scenarios))
+        elapsed = time.perf_counter() - started
+        memory_after, memory_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        await bot.application.shutdown()
+    finally:
+        os.chdir(previous_dir)
+        openrouter.stop()
+        telegram.stop()
+
+    total_updates = len(latencies)
+    return {
+        'updates': total_updates,
+        'elapsed_s': elapsed,
+        'updates_per_s': total_updates / elapsed if elapsed else 0.0,
+        'latency_ms': {
+            'p50': percentile(latencies, 0.50) * 1000,
+            'p95': percentile(latencies, 0.95) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+        },
+        'memory': {
+            'growth_kb': (memory_after - memory_before) / 1024,
+            'peak_kb': memory_peak / 1024,
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        'upstream': {
+            'openrouter_requests': openrouter.requests_served,
+            'telegram_calls': sum(telegram.calls.values()),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн бенчмарк Telegram бота")
+    parser.add_argument("--users", type=int, default=10, help="Количество синтетических пользователей")
+    parser.add_argument("--latency", default="lognormal:-2.5,0.5", help="Задержка OpenRouter: constant:S, uniform:A,B, lognormal:MU,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов OpenRouter с ошибкой 503")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="Задержка фейкового Bot API, секунды")
+    parser.add_argument("--workbook-rows", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Файл для сохранения результатов в JSON")
+    parser.add_argument("--compare", help="JSON с результатами базового прогона")
+    args = parser.parse_args()
+
+    metrics = asyncio.run(run_benchmark(args))
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'compare')}
+
+    print(f"updates: {metrics['updates']}  updates/s: {metrics['updates_per_s']:.2f}")
+    print("latency ms: p50={p50:.1f} p95={p95:.1f} p99={p99:.1f}".format(**metrics['latency_ms']))
+    print("memory kb: growth={growth_kb:.0f} peak={peak_kb:.0f}".format(**metrics['memory']))
+
+    if args.output:
+        results = write_results(args.output, "bot", config, metrics)
+    else:
+        results = {'metrics': metrics}
+    if args.compare:
+        regressions = compare_results(results, args.compare, higher_is_better=['updates_per_s'])
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Микро-бенчмарки горячих путей обработки текста
+
+Пример:
+    python -m benchmarks.bench_text --output benchmarks/results/text.json
+    python -m benchmarks.bench_text --rows 10,1000 --compare benchmarks/results/text.json
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from typing import Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import write_results, compare_results
+from benchmarks.corpus import build_corpus
+from benchmarks.workbooks import build_workbook
+
+
+def measure(func: Callable, min_time: float) -> Dict:
+    """ops/sec за не менее чем min_time секунд и пиковые аллокации одного вызова"""
+    func()  # прогрев
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot_before = tracemalloc.take_snapshot()
+    func()
+    snapshot_after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in snapshot_after.compare_to(snapshot_before, 'filename') if stat.count_diff > 0)
+
+    runs = 0
+    started = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        func()
+        runs += 1
+        elapsed = time.perf_counter() - started
+
+    return {
+        'ops_per_s': runs / elapsed,
+        'us_per_op': elapsed / runs * 1e6,
+        'peak_alloc_kb': peak / 1024,
+        'retained_blocks': blocks,
+    }
+
+
+def text_benchmarks(min_time: float) -> Dict:
+    os.environ.setdefault('OPENROUTER_API_KEY', 'benchmark')
+    from utils.ai_client import AIClient
+    from utils.code_renderer import CodeRenderer
+
+    ai_client = AIClient()
+    renderer = CodeRenderer()
+    corpus = build_corpus()
+
+    results = {}
+    for name, text in corpus.items():
+        cleaned = ai_client._clean_ai_output(text)
+        results[name] = {
+            'size_kb': len(text.encode('utf-8')) / 1024,
+            'clean_ai_output': measure(lambda: ai_client._clean_ai_output(text), min_time),
+            # Сырой текст: уже просканированный ScannedHtml повторно не разбирается, замер был бы пустым
+            'clean_html_code': measure(lambda: renderer._clean_html_code(text), min_time),
+            'prepare_html': measure(lambda: renderer.prepare_html(cleaned), min_time),
+        }
+        print(f"{name:<20} clean_ai_output {results[name]['clean_ai_output']['ops_per_s']:>12.0f} ops/s  "
+              f"prepare_html {results[name]['prepare_html']['ops_per_s']:>12.0f} ops/s")
+    return results
+
+
+def excel_benchmarks(row_counts, min_time: float) -> Dict:
+    from utils.excel_parser import ExcelParser
+
+    results = {}
+    for rows in row_counts:
+        workbook = build_workbook(rows)
+        stats = measure(lambda: ExcelParser.extract_tasks_from_xlsx(io.BytesIO(workbook)), min_time)
+        stats['rows_per_s'] = stats['ops_per_s'] * rows
+        results[f"rows_{rows}"] = stats
+        print(f"excel {rows:>7} rows  {stats['rows_per_s']:>12.0f} rows/s  peak {stats['peak_alloc_kb']:.0f} KB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микро-бенчмарки обработки текста и Excel")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Минимальное время замера одного кейса, секунды")
+    parser.add_argument("--rows", default="10,1000,10000,100000", help="Размеры синтетических Excel файлов")
+    parser.add_argument("--skip-excel", action="store_true")
+    parser.add_argument("--output", help="Файл для сохранения результатов в JSON")
+    parser.add_argument("--compare", help="JSON с результатами базового прогона")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Допустимое ухудшение метрик")
+    args = parser.parse_args()
+
+    metrics = {'text': text_benchmarks(args.min_time)}
+    if not args.skip_excel:
+        row_counts = [int(r) for r in args.rows.split(',') if r]
+        metrics['excel'] = excel_benchmarks(row_counts, args.min_time)
+
+    config = {'min_time': args.min_time, 'rows': args.rows, 'skip_excel': args.skip_excel}
+    if args.output:
+        results = write_results(args.output, "text", config, metrics)
+    else:
+        results = {'metrics': metrics}
+    if args.compare:
+        regressions = compare_results(results, args.compare, args.threshold,
+                                      higher_is_better=['ops_per_s', 'rows_per_s'])
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
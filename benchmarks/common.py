@@ -0,0 +1,74 @@
+import os
+import json
+import platform
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль по ближайшему рангу (q от 0 до 1)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def git_revision() -> str:
+    """Короткий хеш текущего коммита, чтобы результаты можно было сравнивать между коммитами"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def write_results(path: str, benchmark: str, config: Dict, metrics: Dict) -> Dict:
+    """Сохранение результатов бенчмарка в JSON"""
+    results = {
+        'benchmark': benchmark,
+        'commit': git_revision(),
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'config': config,
+        'metrics': metrics
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return results
+
+
+def compare_results(current: Dict, baseline_path: str, threshold: float = 0.1,
+                    higher_is_better: Optional[List[str]] = None) -> List[str]:
+    """Сравнение метрик с базовым прогоном. Возвращает список регрессий больше порога"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    higher_is_better = higher_is_better or []
+    regressions = []
+
+    def walk(prefix, cur, base):
+        for key, value in cur.items():
+            name = f"{prefix}.{key}" if prefix else key
+            base_value = base.get(key) if isinstance(base, dict) else None
+            if isinstance(value, dict):
+                walk(name, value, base_value or {})
+            elif isinstance(value, (int, float)) and isinstance(base_value, (int, float)) and base_value:
+                change = (value - base_value) / base_value
+                better_up = any(name.endswith(suffix) for suffix in higher_is_better)
+                worse = -change if better_up else change
+                marker = ""
+                if worse > threshold:
+                    marker = "  <-- регрессия"
+                    regressions.append(name)
+                print(f"{name:<60} {base_value:>14.3f} -> {value:>14.3f} ({change:+.1%}){marker}")
+
+    print(f"Сравнение с {baseline.get('commit', '?')} ({baseline_path})")
+    walk("", current['metrics'], baseline.get('metrics', {}))
+    return regressions
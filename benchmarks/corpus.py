@@ -0,0 +1,68 @@
+from typing import Dict
+
+PAGE_HEAD = """<!DOCTYPE html>
+<html lang="ru">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Портфолио кота</title>
+    <style>
+        body { margin: 0; font-family: 'Segoe UI', sans-serif; background: #fdf6e3; }
+        .hero { display: grid; place-items: center; min-height: 60vh; }
+        .card { padding: 1.5rem; border-radius: 16px; background: white; box-shadow: 0 6px 24px rgba(0,0,0,.12); }
+        @keyframes wiggle { 0%, 100% { transform: rotate(-3deg); } 50% { transform: rotate(3deg); } }
+    </style>
+</head>
+<body>
+"""
+
+PAGE_TAIL = """    <script>
+        // Кот мурлычет при наведении
+        document.querySelectorAll('.card').forEach(card => {
+            card.addEventListener('mouseenter', () => card.style.animation = 'wiggle .4s');
+            card.addEventListener('animationend', () => card.style.animation = '');
+        });
+    </script>
+</body>
+</html>"""
+
+CARD = """    <section class="card" id="skill-{i}">
+        <h2>Навык #{i}: ловля багов</h2>
+        <p>Кот умеет находить баги в коде быстрее любого линтера. Опыт: {i} лет.</p>
+        <ul><li>HTML</li><li>CSS</li><li>JavaScript</li></ul>
+    </section>
+"""
+
+REASONING = """<think>
+Пользователь хочет портфолио кота. Нужно продумать структуру:
+1. Шапка с именем кота.
+2. Карточки навыков с анимацией.
+3. Немного JavaScript для интерактива.
+Начну с <!DOCTYPE html>, затем стили в <style>.
+</think>
+"""
+
+PREAMBLE = """Конечно! Ниже готовый HTML файл с CSS и JS внутри.
+## Структура
+- Шапка
+- Карточки навыков
+"""
+
+
+def build_page(cards: int) -> str:
+    return PAGE_HEAD + "".join(CARD.format(i=i) for i in range(cards)) + PAGE_TAIL
+
+
+def build_corpus() -> Dict[str, str]:
+    """Набор типичных ответов моделей: с markdown, без, с рассуждениями и очень большие"""
+    small = build_page(5)
+    large = build_page(450)  # ~150 КБ
+    return {
+        'fenced': f"```html\n{small}\n```",
+        'fenced_with_text': f"{PREAMBLE}\n```html\n{small}\n```\n\nЕсли нужно, могу добавить темную тему.",
+        'unfenced': small,
+        'reasoning_preamble': f"{REASONING}\n{PREAMBLE}\n{small}",
+        'fragment': "<div class=\"card\"><h1>Привет</h1><p>Без полной структуры документа</p></div>",
+        'large_fenced': f"{PREAMBLE}\n```html\n{large}\n```",
+        'large_unfenced': large,
+    }
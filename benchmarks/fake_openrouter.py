@@ -0,0 +1,175 @@
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+SAMPLE_PAGE = """<!DOCTYPE html>
+<html lang="ru">
+<head>
+<meta charset="UTF-8">
+<title>Benchmark page</title>
+<style>
+body { font-family: sans-serif; display: flex; justify-content: center; }
+.card { padding: 2rem; border-radius: 12px; box-shadow: 0 4px 12px rgba(0,0,0,.2); }
+</style>
+</head>
+<body>
+<div class="card"><h1>Hello from fake OpenRouter</h1>{filler}</div>
+<script>document.querySelector('h1').addEventListener('click', () => alert('hi'));</script>
+</body>
+</html>"""
+
+RESPONSE_STYLES = ['fenced', 'unfenced', 'preamble']
+
+
+class LatencyModel:
+    """Распределение задержки ответа: constant:S, uniform:A,B или lognormal:MU,SIGMA (в секундах)"""
+
+    def __init__(self, spec: str = "constant:0.05", seed: Optional[int] = None):
+        self.spec = spec
+        kind, _, params = spec.partition(':')
+        self.kind = kind
+        self.params = [float(p) for p in params.split(',') if p]
+        self.random = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.kind == 'constant':
+            return self.params[0]
+        if self.kind == 'uniform':
+            return self.random.uniform(self.params[0], self.params[1])
+        if self.kind == 'lognormal':
+            return self.random.lognormvariate(self.params[0], self.params[1])
+        raise ValueError(f"Неизвестное распределение задержки: {self.spec}")
+
+
+def build_content(style: str, filler_paragraphs: int = 5) -> str:
+    """Ответ модели в одном из типичных форматов"""
+    filler = "".join(f"<p>Параграф {i}</p>" for i in range(filler_paragraphs))
+    page = SAMPLE_PAGE.replace("{filler}", filler)
+    if style == 'fenced':
+        return f"Вот ваш код:\n```html\n{page}\n```\nГотово!"
+    if style == 'preamble':
+        return f"Сначала продумаем структуру страницы.\nНужен заголовок и карточка.\n\n{page}"
+    return page
+
+
+class FakeOpenRouterServer:
+    """Локальный сервер /chat/completions с настраиваемой задержкой, ошибками и стримингом"""
+
+    def __init__(self, latency: str = "constant:0.05", error_rate: float = 0.0,
+                 chunk_delay: float = 0.0, seed: Optional[int] = None, host: str = "127.0.0.1", port: int = 0):
+        self.latency = LatencyModel(latency, seed)
+        self.error_rate = error_rate
+        self.chunk_delay = chunk_delay
+        self.random = random.Random(seed)
+        self.requests_served = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/v1/chat/completions"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _next_response(self):
+        with self._lock:
+            self.requests_served += 1
+            delay = self.latency.sample()
+            failed = self.random.random() < self.error_rate
+            style = self.random.choice(RESPONSE_STYLES)
+        return delay, failed, style
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                delay, failed, style = fake._next_response()
+                time.sleep(delay)
+
+                if failed:
+                    body = json.dumps({'error': {'code': 503, 'message': 'fake upstream error'}}).encode()
+                    self.send_response(503)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                content = build_content(style)
+                model = payload.get('model', 'fake/model')
+
+                if payload.get('stream'):
+                    self._stream(content, model)
+                    return
+
+                body = json.dumps({
+                    'id': f"gen-{fake.requests_served}",
+                    'model': model,
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': content},
+                        'finish_reason': 'stop'
+                    }],
+                    'usage': {'prompt_tokens': 200, 'completion_tokens': len(content) // 4}
+                }, ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, content: str, model: str):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.end_headers()
+                step = 64
+                for i in range(0, len(content), step):
+                    chunk = {
+                        'model': model,
+                        'choices': [{'index': 0, 'delta': {'content': content[i:i + step]}, 'finish_reason': None}]
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    if fake.chunk_delay:
+                        time.sleep(fake.chunk_delay)
+                final = {'model': model, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}
+                self.wfile.write(f"data: {json.dumps(final)}\n\n".encode('utf-8'))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Фейковый OpenRouter для локальных тестов")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:-1.5,0.6")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeOpenRouterServer(args.latency, args.error_rate, args.chunk_delay, port=args.port)
+    print(f"Fake OpenRouter: {server.url}")
+    server.server.serve_forever()
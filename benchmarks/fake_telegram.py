@@ -0,0 +1,125 @@
+import json
+import time
+import threading
+import itertools
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from collections import Counter
+from typing import Dict
+
+
+class FakeTelegramServer:
+    """Минимальный Bot API: отвечает на вызовы, которые делает TelegramBot, и раздает загруженные файлы"""
+
+    def __init__(self, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.calls = Counter()
+        self.files: Dict[str, bytes] = {}
+        self._message_ids = itertools.count(1000)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    @property
+    def base_file_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/file/bot"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def add_file(self, file_id: str, content: bytes):
+        """Регистрация файла, который бот скачает через getFile"""
+        self.files[file_id] = content
+
+    def _message(self, chat_id) -> Dict:
+        with self._lock:
+            message_id = next(self._message_ids)
+        return {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+        }
+
+    def handle_method(self, method: str, params: Dict):
+        with self._lock:
+            self.calls[method] += 1
+
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'BenchBot', 'username': 'bench_bot',
+                    'can_join_groups': False, 'can_read_all_group_messages': False, 'supports_inline_queries': False}
+        if method in ('sendMessage', 'editMessageText'):
+            message = self._message(params.get('chat_id', 0))
+            message['text'] = params.get('text', '')
+            return message
+        if method == 'sendDocument':
+            message = self._message(params.get('chat_id', 0))
+            message['document'] = {'file_id': f"doc_{message['message_id']}", 'file_unique_id': str(message['message_id'])}
+            return message
+        if method == 'getFile':
+            file_id = params.get('file_id')
+            return {'file_id': file_id, 'file_unique_id': file_id,
+                    'file_size': len(self.files.get(file_id, b"")), 'file_path': f"documents/{file_id}"}
+        # deleteMessage, answerCallbackQuery и прочие методы просто подтверждаем
+        return True
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _parse_params(self) -> Dict:
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length) if length else b""
+                content_type = self.headers.get('Content-Type', '')
+                if content_type.startswith('application/json'):
+                    return json.loads(body or b"{}")
+                if content_type.startswith('multipart/form-data'):
+                    message = BytesParser(policy=default_policy).parsebytes(
+                        f"Content-Type: {content_type}\r\n\r\n".encode() + body
+                    )
+                    params = {}
+                    for part in message.iter_parts():
+                        name = part.get_param('name', header='content-disposition')
+                        if part.get_filename() is None:
+                            params[name] = part.get_content()
+                    return params
+                return {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+
+            def _reply(self, status: int, body: bytes, content_type: str = 'application/json'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                method = urlparse(self.path).path.rsplit('/', 1)[-1]
+                params = self._parse_params()
+                if fake.latency:
+                    time.sleep(fake.latency)
+                result = fake.handle_method(method, params)
+                self._reply(200, json.dumps({'ok': True, 'result': result}, ensure_ascii=False).encode('utf-8'))
+
+            def do_GET(self):
+                file_id = urlparse(self.path).path.rsplit('/', 1)[-1]
+                if file_id in fake.files:
+                    self._reply(200, fake.files[file_id], 'application/octet-stream')
+                else:
+                    self._reply(404, b"not found", 'text/plain')
+
+        return Handler
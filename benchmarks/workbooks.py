@@ -0,0 +1,33 @@
+import io
+import random
+from typing import Optional
+
+from openpyxl import Workbook
+
+HEADERS = ['Хочу', 'Чтобы', 'Критерии приемки', 'Комментарии']
+
+WANTS = [
+    "Создать лендинг для кофейни с меню и картой",
+    "Сделать таймер помодоро с анимацией",
+    "Нарисовать интерактивную карту офиса",
+    "Собрать галерею мемов с фильтрами",
+    "Написать игру в змейку на canvas",
+]
+
+
+def build_workbook(rows: int, seed: Optional[int] = 0) -> bytes:
+    """Синтетический .xlsx в формате, который понимает ExcelParser"""
+    rnd = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Задачи")
+    sheet.append(HEADERS)
+    for i in range(rows):
+        sheet.append([
+            f"{rnd.choice(WANTS)} #{i + 1}",
+            "Пользователь быстро понял, что делать",
+            "Работает на мобильных, загрузка меньше секунды",
+            "" if i % 3 else "Цвета в стиле бренда",
+        ])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
@@ -1,14 +1,15 @@
 import streamlit as st
 import os
-import json
 from datetime import datetime
 import base64
+from utils.artifact_store import LOG_FILENAME, get_artifact_store
+from utils.script_analyzer import analyze_scripts, preview_level, throttle_for_preview
 
 def show_gallery():
     st.title("🎨 Галерея сгенерированных проектов")
     
-    # Поиск всех сохраненных проектов
-    projects = scan_projects()
+    # Поиск всех сохраненных проектов (каталог кэшируется до появления новых артефактов)
+    projects = load_catalog(catalog_fingerprint())
     
     if not projects:
         st.info("🎭 Пока нет сгенерированных проектов. Создайте первый!")
@@ -33,52 +34,67 @@ def show_gallery():
         with cols[idx % 3]:
             display_project_card(project, idx)
 
-def scan_projects():
-    """Сканирует директории на наличие проектов"""
-    projects = []
+def iter_codes_dirs():
+    """Директории с артефактами: (путь, платформа)"""
     base_dir = "generated_codes"
     
-    # Сканируем Streamlit проекты
+    # Streamlit проекты
     streamlit_dir = os.path.join(base_dir, "streamlit", "sessions")
     if os.path.exists(streamlit_dir):
         for session_dir in os.listdir(streamlit_dir):
             session_path = os.path.join(streamlit_dir, session_dir, "codes")
             if os.path.exists(session_path):
-                projects.extend(scan_session_projects(session_path, "streamlit"))
+                yield session_path, "streamlit"
     
-    # Сканируем Telegram проекты
+    # Telegram проекты
     telegram_dir = os.path.join(base_dir, "users")
     if os.path.exists(telegram_dir):
         for user_dir in os.listdir(telegram_dir):
             user_path = os.path.join(telegram_dir, user_dir, "codes")
             if os.path.exists(user_path):
-                projects.extend(scan_session_projects(user_path, "telegram"))
+                yield user_path, "telegram"
+
+def catalog_fingerprint():
+    """Дешевый отпечаток состояния каталога: размеры журналов и mtime директорий.
+    Меняется при любом новом артефакте, поэтому служит ключом инвалидации кэша"""
+    parts = []
+    for codes_dir, _ in iter_codes_dirs():
+        log_path = os.path.join(codes_dir, LOG_FILENAME)
+        log_size = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+        parts.append((codes_dir, log_size, os.stat(codes_dir).st_mtime_ns))
+    return tuple(sorted(parts))
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_catalog(fingerprint):
+    """Каталог проектов, кэшируется по отпечатку между перезапусками скрипта"""
+    return scan_projects()
+
+def scan_projects():
+    """Сканирует директории на наличие проектов"""
+    projects = []
+    for codes_dir, platform in iter_codes_dirs():
+        projects.extend(scan_session_projects(codes_dir, platform))
     
     return sorted(projects, key=lambda x: x.get('timestamp', ''), reverse=True)
 
 def scan_session_projects(session_path, platform):
-    """Сканирует проекты в сессии"""
+    """Сканирует проекты в сессии по журналу хранилища артефактов"""
     projects = []
-    for file in os.listdir(session_path):
-        if file.endswith('.json'):
-            metadata_path = os.path.join(session_path, file)
-            try:
-                with open(metadata_path, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                
-                # Находим соответствующий HTML файл
-                html_file = metadata.get('html_file')
-                if html_file and os.path.exists(os.path.join(session_path, html_file)):
-                    projects.append({
-                        'metadata': metadata,
-                        'html_path': os.path.join(session_path, html_file),
-                        'platform': platform,
-                        'timestamp': metadata.get('generated_at', ''),
-                        'type': categorize_project(metadata.get('task_description', '')),
-                        'task_id': metadata.get('task_id', '')  # Добавляем task_id
-                    })
-            except Exception as e:
-                print(f"Error reading {metadata_path}: {e}")
+    try:
+        history = get_artifact_store().history(session_path)
+    except Exception as e:
+        print(f"Error reading {session_path}: {e}")
+        return projects
+    
+    for metadata, handle in history:
+        projects.append({
+            'metadata': metadata,
+            'handle': handle,
+            'platform': platform,
+            'timestamp': metadata.get('generated_at', ''),
+            'type': categorize_project(metadata.get('task_description', '')),
+            'task_id': handle.task_id  # Добавляем task_id
+        })
     
     return projects
 
@@ -118,12 +134,21 @@ def display_project_card(project, index):
         st.caption(f"🕐 {format_timestamp(metadata.get('generated_at'))}")
         st.caption(f"📱 {project['platform']} • {project['type']}")
         
-        # Предпросмотр (упрощенный - можно улучшить скриншотами)
-        with st.expander("👁️ Предпросмотр", expanded=False):
+        # Предпросмотр (упрощенный - можно улучшить скриншотами).
+        # Тело страницы читается из хранилища, только когда пользователь открыл превью
+        if st.checkbox("👁️ Предпросмотр", key=f"preview_{index}"):
             try:
-                with open(project['html_path'], 'r', encoding='utf-8') as f:
-                    html_content = f.read()
-                st.components.v1.html(html_content, height=300, scrolling=True)
+                # Стоимость превью записана при сохранении; для старых артефактов считаем по телу
+                level = preview_level(metadata['preview_cost']) if 'preview_cost' in metadata else None
+                if level == 'high' and not st.checkbox("▶️ Запустить тяжелое превью", key=f"heavy_{index}"):
+                    st.caption("⚠️ Страница с тяжелыми анимациями, превью не запускается автоматически")
+                else:
+                    html_content = get_artifact_store().read_html(project['handle']) or ""
+                    if level is None:
+                        level = analyze_scripts(html_content).level
+                    if level != 'low':
+                        html_content = throttle_for_preview(html_content)
+                    st.components.v1.html(html_content, height=300, scrolling=True)
             except Exception as e:
                 st.error(f"Ошибка загрузки: {e}")
         
@@ -133,16 +158,19 @@ def display_project_card(project, index):
             if st.button("📂 Открыть", key=f"open_{index}", use_container_width=True):
                 display_project_detail(project)
         with col2:
-            with open(project['html_path'], 'r', encoding='utf-8') as f:
-                html_content = f.read()
-            st.download_button(
-                "💾 Скачать",
-                html_content,
-                file_name=f"{metadata.get('task_id', 'project')}.html",
-                mime="text/html",
-                key=f"download_{index}",
-                use_container_width=True
-            )
+            # Файл готовится по первому нажатию, до этого блоб не распаковывается
+            ready_key = f"download_ready_{index}"
+            if st.session_state.get(ready_key) or st.button("💾 Скачать", key=f"prepare_{index}", use_container_width=True):
+                st.session_state[ready_key] = True
+                html_content = get_artifact_store().read_html(project['handle'])
+                st.download_button(
+                    "⬇️ Сохранить HTML",
+                    html_content or "",
+                    file_name=f"{metadata.get('task_id', 'project')}.html",
+                    mime="text/html",
+                    key=f"download_{index}",
+                    use_container_width=True
+                )
 
 def display_project_detail(project):
     """Показывает детали проекта в модальном окне"""
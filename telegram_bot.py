@@ -1,11 +1,13 @@
 
 import os
+import io
+import time
+import asyncio
 import logging
-import tempfile
 import json
 import csv
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
 
@@ -14,6 +16,15 @@ try:
     from utils.excel_parser import ExcelParser
     from utils.ai_client import AIClient
     from utils.code_renderer import CodeRenderer
+    from utils.tracing import get_tracer
+    from utils.prompts import PROMPT_VERSION
+    from utils.example_warmer import ExampleWarmer
+    from utils.artifact_store import ArtifactHandle, get_artifact_store
+    from utils.rate_governor import RateGovernor, GovernedBot, PRIORITY_CLEANUP
+    from utils.workbook_cache import get_workbook_cache, workbook_digest
+    from utils.similarity_index import get_similarity_index
+    from utils.script_analyzer import analyze_scripts
+    from utils.project_bundle import build_zip, inline_project
 except ImportError:
     # Для случая, когда запускаем из корня проекта
     import sys
@@ -21,6 +32,15 @@ except ImportError:
     from utils.excel_parser import ExcelParser
     from utils.ai_client import AIClient
     from utils.code_renderer import CodeRenderer
+    from utils.tracing import get_tracer
+    from utils.prompts import PROMPT_VERSION
+    from utils.example_warmer import ExampleWarmer
+    from utils.artifact_store import ArtifactHandle, get_artifact_store
+    from utils.rate_governor import RateGovernor, GovernedBot, PRIORITY_CLEANUP
+    from utils.workbook_cache import get_workbook_cache, workbook_digest
+    from utils.similarity_index import get_similarity_index
+    from utils.script_analyzer import analyze_scripts
+    from utils.project_bundle import build_zip, inline_project
 
 # Настройка логирования
 logging.basicConfig(
@@ -30,18 +50,55 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class TelegramBot:
-    def __init__(self, token: str):
+    # Готовые примеры из клавиатуры /start
+    EXAMPLES = {
+        'cat': "Создай креативное сайт-портфолио для кота, который ищет работу фронтенд-разработчиком. Включи анимации, интерактивные элементы и чувство юмора.",
+        'treasure': "Создай интерактивную карту сокровищ с анимацией клада, анимированным компасом и эффектами при наведении на острова.",
+        'dinosaur': "Создай простую игру 'Убеги от динозавра' с анимированным персонажем, препятствиями и счетчиком очков.",
+        'memes': "Создай генератор мемов с движущимися элементами, возможностью добавления текста и анимированными кнопками."
+    }
+    
+    # Кнопок задач на одной странице навигатора
+    NAV_PAGE_SIZE = 8
+    # Максимум результатов /find
+    FIND_LIMIT = 8
+    # Правки клавиатуры чаще этого интервала (сек) объединяются в одну
+    KEYBOARD_DEBOUNCE = 0.3
+    
+    def __init__(self, token: str, base_url: Optional[str] = None, base_file_url: Optional[str] = None):
         self.token = token
-        self.application = Application.builder().token(token).build()
+        
+        # base_url позволяет направить бота на локальный сервер Bot API (например, для бенчмарков)
+        builder = Application.builder().token(token)
+        if base_url:
+            builder = builder.base_url(base_url)
+        if base_file_url:
+            builder = builder.base_file_url(base_file_url)
+        self.application = builder.build()
         
         # Создаем директории для сохранения файлов
         self.setup_directories()
         
+        # Атомарная запись артефактов вне event loop
+        self.artifact_store = get_artifact_store()
+        
+        # Общий планировщик исходящих запросов к Telegram (лимиты и flood control)
+        self.governor = RateGovernor()
+        
+        # Разобранные книги и результаты по строкам, общие для всех пользователей
+        self.workbook_cache = get_workbook_cache()
+        
+        # Индекс прошлых ТЗ для предложения готового результата на похожий запрос
+        self.similarity_index = get_similarity_index()
+        
         # Инициализация утилит
         try:
             self.ai_client = AIClient()
             self.excel_parser = ExcelParser()
             self.code_renderer = CodeRenderer()
+            self.example_warmer = ExampleWarmer(
+                self.ai_client, self.code_renderer, list(self.EXAMPLES.values())
+            ).start()
             logger.info("Утилиты успешно инициализированы")
         except Exception as e:
             logger.error(f"Ошибка инициализации утилит: {e}")
@@ -73,6 +130,8 @@ class TelegramBot:
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("help", self.help_command))
         self.application.add_handler(CommandHandler("clear", self.clear_command))
+        self.application.add_handler(CommandHandler("find", self.find_command))
+        self.application.add_handler(CommandHandler("project", self.project_command))
         
         # Обработчики сообщений
         self.application.add_handler(MessageHandler(filters.Document.ALL, self.handle_document))
@@ -93,8 +152,15 @@ class TelegramBot:
                 'last_message_id': None,
                 'task_documents': {},
                 'keyboard_message_id': None,
-                'last_keyboard_text': None,
-                'last_keyboard_markup': None,
+                'keyboard_fingerprint': None,  # Отпечаток последней запрошенной клавиатуры
+                'pending_keyboard': None,  # Отложенная правка (text, reply_markup)
+                'keyboard_flush_task': None,
+                'last_keyboard_edit': 0.0,
+                'artifacts': {},  # task_id -> ArtifactHandle последней сохраненной версии
+                'generated_tasks': [],  # Сгенерированные задачи в порядке первой генерации (для навигатора)
+                'generated_index': {},  # task_id -> позиция в generated_tasks
+                'nav_page': 0,
+                'project_files': {},  # task_id -> файлы многофайлового проекта
                 'previous_messages': []  # Храним ID предыдущих сообщений для удаления
             }
         return self.user_data[user_id]
@@ -111,12 +177,9 @@ class TelegramBot:
                 continue
             messages_to_delete.append(msg_id)
         
-        # Удаляем сообщения
+        # Удаляем сообщения в фоне: удаления идут в полосе низкого приоритета и не задерживают ответ
         for msg_id in messages_to_delete:
-            try:
-                await context.bot.delete_message(chat_id=user_id, message_id=msg_id)
-            except Exception as e:
-                logger.debug(f"Не удалось удалить сообщение {msg_id}: {e}")
+            self.delete_in_background(context, user_id, msg_id)
         
         # Обновляем список предыдущих сообщений
         if keep_keyboard and user_data.get('keyboard_message_id'):
@@ -125,8 +188,32 @@ class TelegramBot:
             user_data['previous_messages'] = []
             user_data['keyboard_message_id'] = None
     
-    def save_user_info(self, user_id: int, username: str, first_name: str, last_name: str = ""):
-        """Сохранение информации о пользователе"""
+    @staticmethod
+    def owner_id(user_id: int) -> str:
+        """Владелец в общих индексах (похожие задачи, результаты книг): пользователи бота и приложения не пересекаются"""
+        return f"telegram_{user_id}"
+    
+    def outbound(self, context: ContextTypes.DEFAULT_TYPE) -> GovernedBot:
+        """Бот, запросы которого проходят через общий планировщик"""
+        return GovernedBot(context.bot, self.governor)
+    
+    def delete_in_background(self, context: ContextTypes.DEFAULT_TYPE, user_id: int, message_id: int):
+        """Удаление сообщения в полосе очистки без ожидания: ответы пользователю уходят раньше"""
+        future = self.governor.submit_background(
+            user_id, PRIORITY_CLEANUP, context.bot.delete_message, chat_id=user_id, message_id=message_id
+        )
+        future.add_done_callback(self._log_delete_failure)
+    
+    @staticmethod
+    def _log_delete_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.debug(f"Не удалось удалить сообщение: {future.exception()}")
+    
+    async def save_user_info(self, user_id: int, username: str, first_name: str, last_name: str = ""):
+        """Сохранение информации о пользователе (запись выполняется вне event loop)"""
+        await asyncio.to_thread(self._save_user_info, user_id, username, first_name, last_name)
+    
+    def _save_user_info(self, user_id: int, username: str, first_name: str, last_name: str):
         user_file = os.path.join(self.users_dir, f"user_{user_id}.json")
         user_info = {
             'user_id': user_id,
@@ -143,8 +230,7 @@ class TelegramBot:
                 existing_data = json.load(f)
                 user_info['first_seen'] = existing_data.get('first_seen', user_info['first_seen'])
         
-        with open(user_file, 'w', encoding='utf-8') as f:
-            json.dump(user_info, f, ensure_ascii=False, indent=2)
+        self.artifact_store.write_json(user_file, user_info, indent=2)
     
     def log_activity(self, user_id: int, action: str, task_id: str = "", task_description: str = ""):
         """Логирование активности пользователя"""
@@ -164,37 +250,35 @@ class TelegramBot:
                 task_description[:100]  # Ограничиваем длину описания
             ])
     
-    def save_generated_code(self, user_id: int, task: Dict, html_content: str, generated_code: str):
-        """Сохранение сгенерированного кода в файл"""
+    async def save_generated_code(self, user_id: int, task: Dict, html_content: str, generated_code: str,
+                                  project_files: Optional[Dict[str, str]] = None) -> ArtifactHandle:
+        """Сохранение сгенерированного кода в файл (атомарно, вне event loop).
+        project_files - файлы многофайлового проекта, html_content - его однофайловая версия"""
         user_codes_dir = os.path.join(self.users_dir, f"user_{user_id}", "codes")
-        os.makedirs(user_codes_dir, exist_ok=True)
-        
-        # Сохраняем HTML файл
-        html_filename = f"task_{task['id']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-        html_filepath = os.path.join(user_codes_dir, html_filename)
-        
-        with open(html_filepath, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        # Сохраняем метаданные
-        metadata = {
-            'task_id': task['id'],
-            'task_description': task.get('description', ''),
-            'task_summary': task.get('summary', ''),
-            'task_type': task.get('type', 'unknown'),
-            'generated_at': datetime.now().isoformat(),
-            'html_file': html_filename,
-            'user_id': user_id
-        }
         
-        metadata_filename = f"task_{task['id']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        metadata_filepath = os.path.join(user_codes_dir, metadata_filename)
+        # Оценка структурной проверки и стоимость превью сохраняются вместе с артефактом
+        report = await asyncio.to_thread(self.code_renderer.inspect_html, html_content)
+        preview_cost = await asyncio.to_thread(analyze_scripts, html_content)
+        extra_metadata = {'prompt_version': PROMPT_VERSION, 'user_id': user_id, 'quality_score': report.score,
+                          **preview_cost.as_metadata()}
+        if project_files:
+            extra_metadata['project_files'] = await asyncio.to_thread(self.artifact_store.put_files, project_files)
+        handle = await self.artifact_store.save_async(user_codes_dir, task, html_content, extra_metadata)
+        user_data = self.get_user_data(user_id)
+        user_data['artifacts'][task['id']] = handle
+        if project_files:
+            user_data['project_files'][task['id']] = project_files
+        else:
+            user_data['project_files'].pop(task['id'], None)
         
-        with open(metadata_filepath, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        # Результат строки загруженной книги доступен этому пользователю при повторной загрузке того же файла
+        if user_data.get('excel_digest') and any(t['id'] == task['id'] for t in user_data['excel_tasks']):
+            await asyncio.to_thread(
+                self.workbook_cache.record_result, user_data['excel_digest'], self.owner_id(user_id), task['id'], handle
+            )
         
         logger.info(f"Код сохранен для пользователя {user_id}, задача {task['id']}")
-        return html_filepath, metadata_filepath
+        return handle
     
     async def update_keyboard_message(self, context: ContextTypes.DEFAULT_TYPE, user_id: int, text: str = None, reply_markup=None):
         """Обновляет или создает сообщение с постоянной клавиатурой"""
@@ -204,38 +288,89 @@ class TelegramBot:
         if text is None:
             text = "💡 Выберите действие:"
         
-        # Проверяем, изменились ли текст или клавиатура
-        current_text = user_data.get('last_keyboard_text')
-        current_markup = user_data.get('last_keyboard_markup')
+        fingerprint = self.keyboard_fingerprint(text, reply_markup)
         
-        # Сравниваем текст и разметку
-        text_changed = current_text != text
-        markup_changed = str(current_markup) != str(reply_markup) if current_markup else True
+        # Если у нас уже есть сообщение с клавиатурой, правим его только при изменении
+        if user_data.get('keyboard_message_id'):
+            if fingerprint == user_data['keyboard_fingerprint']:
+                logger.debug("Сообщение с клавиатурой не изменилось, пропускаем обновление")
+                return
+            user_data['keyboard_fingerprint'] = fingerprint
+            user_data['pending_keyboard'] = (text, reply_markup)
+            
+            # Правка уже запланирована - она отправит последнее состояние
+            if user_data['keyboard_flush_task'] is not None:
+                return
+            
+            delay = user_data['last_keyboard_edit'] + self.KEYBOARD_DEBOUNCE - time.monotonic()
+            if delay <= 0:
+                await self.flush_keyboard(context, user_id)
+            else:
+                user_data['keyboard_flush_task'] = asyncio.get_running_loop().create_task(
+                    self.flush_keyboard(context, user_id, delay)
+                )
+            return
         
-        # Если у нас уже есть сообщение с клавиатурой и что-то изменилось, обновляем его
-        if user_data.get('keyboard_message_id') and (text_changed or markup_changed):
-            try:
-                await context.bot.edit_message_text(
+        # Если сообщения нет, создаем новое
+        await self.send_keyboard_message(context, user_id, text, reply_markup, fingerprint)
+    
+    @staticmethod
+    def keyboard_fingerprint(text: str, reply_markup) -> int:
+        """Структурный отпечаток клавиатуры: хэш текста и кортежей кнопок без сериализации разметки"""
+        rows = ()
+        if reply_markup is not None:
+            rows = tuple(
+                tuple((button.text, button.callback_data, button.url) for button in row)
+                for row in reply_markup.inline_keyboard
+            )
+        return hash((text, rows))
+    
+    async def flush_keyboard(self, context: ContextTypes.DEFAULT_TYPE, user_id: int, delay: float = 0):
+        """Отправка отложенной правки клавиатуры (последнего запрошенного состояния)"""
+        if delay > 0:
+            await asyncio.sleep(delay)
+        
+        user_data = self.get_user_data(user_id)
+        user_data['keyboard_flush_task'] = None
+        pending = user_data['pending_keyboard']
+        user_data['pending_keyboard'] = None
+        if pending is None:
+            return
+        text, reply_markup = pending
+        
+        try:
+            if user_data.get('keyboard_message_id'):
+                user_data['last_keyboard_edit'] = time.monotonic()
+                await self.outbound(context).edit_message_text(
                     chat_id=user_id,
                     message_id=user_data['keyboard_message_id'],
                     text=text,
                     reply_markup=reply_markup,
                     parse_mode='Markdown'
                 )
-                # Сохраняем текущее состояние
-                user_data['last_keyboard_text'] = text
-                user_data['last_keyboard_markup'] = reply_markup
                 return
-            except Exception as e:
-                # Игнорируем ошибку "Message is not modified"
-                if "Message is not modified" in str(e):
-                    logger.debug("Сообщение с клавиатурой не изменилось, пропускаем обновление")
-                    return
-                logger.warning(f"Не удалось обновить сообщение с клавиатурой: {e}")
-                # Если не удалось обновить, создаем новое
+        except Exception as e:
+            # Игнорируем ошибку "Message is not modified"
+            if "Message is not modified" in str(e):
+                logger.debug("Сообщение с клавиатурой не изменилось, пропускаем обновление")
+                return
+            logger.warning(f"Не удалось обновить сообщение с клавиатурой: {e}")
         
         # Если сообщения нет или не удалось обновить, создаем новое
-        message = await context.bot.send_message(
+        try:
+            await self.send_keyboard_message(context, user_id, text, reply_markup, user_data['keyboard_fingerprint'])
+        except Exception as e:
+            # Следующий запрос не должен считаться повтором неотправленной клавиатуры
+            user_data['keyboard_fingerprint'] = None
+            logger.error(f"Не удалось отправить сообщение с клавиатурой: {e}")
+    
+    async def send_keyboard_message(self, context: ContextTypes.DEFAULT_TYPE, user_id: int, text: str, reply_markup, fingerprint: int):
+        """Создание нового сообщения с клавиатурой"""
+        user_data = self.get_user_data(user_id)
+        # Отложенная правка старого сообщения больше не нужна
+        user_data['pending_keyboard'] = None
+        
+        message = await self.outbound(context).send_message(
             chat_id=user_id,
             text=text,
             reply_markup=reply_markup,
@@ -244,18 +379,18 @@ class TelegramBot:
         
         # Сохраняем ID сообщения с клавиатурой и текущее состояние
         user_data['keyboard_message_id'] = message.message_id
-        user_data['last_keyboard_text'] = text
-        user_data['last_keyboard_markup'] = reply_markup
+        user_data['keyboard_fingerprint'] = fingerprint
         
         # Добавляем в список для возможного удаления
         user_data['previous_messages'].append(message.message_id)
     
-    async def send_temporary_message(self, context: ContextTypes.DEFAULT_TYPE, user_id: int, text: str, parse_mode=None):
-        """Отправляет временное сообщение без клавиатуры"""
-        message = await context.bot.send_message(
+    async def send_temporary_message(self, context: ContextTypes.DEFAULT_TYPE, user_id: int, text: str, parse_mode=None, reply_markup=None):
+        """Отправляет временное сообщение (по умолчанию без клавиатуры)"""
+        message = await self.outbound(context).send_message(
             chat_id=user_id,
             text=text,
-            parse_mode=parse_mode
+            parse_mode=parse_mode,
+            reply_markup=reply_markup
         )
         
         # Сохраняем ID для возможного удаления
@@ -272,7 +407,7 @@ class TelegramBot:
         await self.cleanup_previous_messages(context, user_id)
         
         # Сохраняем информацию о пользователе
-        self.save_user_info(
+        await self.save_user_info(
             user_id=user_id,
             username=user.username or "",
             first_name=user.first_name or "",
@@ -333,6 +468,50 @@ class TelegramBot:
             reply_markup=reply_markup
         )
     
+    @staticmethod
+    def has_generated_code(user_data: Dict, task_id: str) -> bool:
+        """Код задачи есть в памяти или сохранен в хранилище (например, из кэша книги)"""
+        return task_id in user_data['generated_codes'] or task_id in user_data['artifacts']
+    
+    @staticmethod
+    def task_icon(task: Dict) -> str:
+        return "📊" if task.get('type') == 'excel' or str(task['id']).startswith('excel_') else "📝"
+    
+    @staticmethod
+    def page_buttons(view: str, page: int, pages: int) -> List[InlineKeyboardButton]:
+        """Ряд листания страниц. Callback data компактный: pg:<вид>:<страница>"""
+        row = []
+        if page > 0:
+            row.append(InlineKeyboardButton("◀️", callback_data=f"pg:{view}:{page - 1}"))
+        row.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data="no_action"))
+        if page < pages - 1:
+            row.append(InlineKeyboardButton("▶️", callback_data=f"pg:{view}:{page + 1}"))
+        return row
+    
+    def build_excel_keyboard(self, user_data: Dict, page: int = 0) -> InlineKeyboardMarkup:
+        """Страница выбора задач из Excel"""
+        tasks = user_data['excel_tasks']
+        pages = max((len(tasks) + self.NAV_PAGE_SIZE - 1) // self.NAV_PAGE_SIZE, 1)
+        page = min(max(page, 0), pages - 1)
+        start = page * self.NAV_PAGE_SIZE
+        
+        keyboard = []
+        for i, task in enumerate(tasks[start:start + self.NAV_PAGE_SIZE], start=start):
+            status = "✅ " if self.has_generated_code(user_data, task['id']) else ""
+            keyboard.append([
+                InlineKeyboardButton(
+                    f"{status}{task['id']}. {task['summary']}", 
+                    callback_data=f"ex:{i}"
+                )
+            ])
+        
+        if pages > 1:
+            keyboard.append(self.page_buttons('x', page, pages))
+        keyboard.append([InlineKeyboardButton("📝 Текстовый ввод", callback_data="text_input")])
+        keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back_to_main")])
+        
+        return InlineKeyboardMarkup(keyboard)
+    
     async def update_main_keyboard(self, context: ContextTypes.DEFAULT_TYPE, user_id: int, task: Dict = None):
         """Обновляет основную клавиатуру управления"""
         user_data = self.get_user_data(user_id)
@@ -341,36 +520,36 @@ class TelegramBot:
         
         # Если есть текущая задача, добавляем кнопки для работы с ней
         if task and task['id'] in user_data['generated_codes']:
-            keyboard.append([InlineKeyboardButton("🔄 Перегенерировать код", callback_data="regenerate")])
-        
-        # Кнопки для навигации по задачам
-        switch_buttons = []
-        
-        # Добавляем кнопки для переключения между задачами
-        for i, excel_task in enumerate(user_data['excel_tasks']):
-            if excel_task['id'] in user_data['generated_codes']:
-                switch_buttons.append(
-                    InlineKeyboardButton(
-                        f"📊 {excel_task['summary'][:15]}...", 
-                        callback_data=f"switch_task_excel_{i}"
-                    )
-                )
+            keyboard.append([
+                InlineKeyboardButton("🔄 Перегенерировать код", callback_data="regenerate"),
+                InlineKeyboardButton("✏️ Изменить", callback_data="edit_task")
+            ])
         
-        for i, text_task in enumerate(user_data['text_tasks']):
-            if text_task['id'] in user_data['generated_codes']:
-                switch_buttons.append(
-                    InlineKeyboardButton(
-                        f"📝 {text_task['summary'][:15]}...", 
-                        callback_data=f"switch_task_text_{i}"
-                    )
+        # Навигатор по сгенерированным задачам: одна страница, стоимость не зависит от числа задач
+        generated_tasks = user_data['generated_tasks']
+        if generated_tasks:
+            pages = (len(generated_tasks) + self.NAV_PAGE_SIZE - 1) // self.NAV_PAGE_SIZE
+            page = min(max(user_data['nav_page'], 0), pages - 1)
+            user_data['nav_page'] = page
+            start = page * self.NAV_PAGE_SIZE
+            
+            switch_buttons = [
+                InlineKeyboardButton(
+                    f"{self.task_icon(nav_task)} {nav_task['summary'][:15]}...",
+                    callback_data=f"sw:{nav_task['id']}"
                 )
-        
-        # Добавляем кнопки переключения (максимум 2 в ряд)
-        if switch_buttons:
-            keyboard.append([InlineKeyboardButton("🔀 Переключиться на задачу:", callback_data="no_action")])
+                for nav_task in generated_tasks[start:start + self.NAV_PAGE_SIZE]
+            ]
+            
+            header = "🔀 Переключиться на задачу:"
+            if pages > 1:
+                header = f"🔀 Переключиться на задачу ({page + 1}/{pages}):"
+            keyboard.append([InlineKeyboardButton(header, callback_data="no_action")])
+            # Кнопки переключения (максимум 2 в ряд)
             for i in range(0, len(switch_buttons), 2):
-                row = switch_buttons[i:i+2]
-                keyboard.append(row)
+                keyboard.append(switch_buttons[i:i+2])
+            if pages > 1:
+                keyboard.append(self.page_buttons('m', page, pages))
         
         # Основные кнопки управления
         keyboard.extend([
@@ -426,6 +605,8 @@ class TelegramBot:
 - Используйте кнопки для переключения между задачами
 - Каждая новая задача добавляется в список
 - Можно вернуться к любой предыдущей задаче
+- /find <начало названия> - найти задачу по началу названия
+- /project <описание> - проект из нескольких файлов (index.html, styles.css, app.js) в ZIP архиве
 
 Для начала работы отправьте текст задачи или Excel файл!
         """
@@ -459,8 +640,15 @@ class TelegramBot:
             'last_message_id': None,
             'task_documents': {},
             'keyboard_message_id': None,
-            'last_keyboard_text': None,
-            'last_keyboard_markup': None,
+            'keyboard_fingerprint': None,
+            'pending_keyboard': None,
+            'keyboard_flush_task': None,
+            'last_keyboard_edit': 0.0,
+            'artifacts': {},
+            'generated_tasks': [],
+            'generated_index': {},
+            'nav_page': 0,
+            'project_files': {},
             'previous_messages': []
         }
         
@@ -474,6 +662,117 @@ class TelegramBot:
         
         logger.info(f"Пользователь {user_id} очистил историю")
     
+    def register_generated_task(self, user_data: Dict, task: Dict):
+        """Добавление задачи в навигатор при первой генерации (повторная обновляет запись)"""
+        position = user_data['generated_index'].get(task['id'])
+        if position is None:
+            user_data['generated_index'][task['id']] = len(user_data['generated_tasks'])
+            user_data['generated_tasks'].append(task)
+            # Навигатор открывается на странице с новой задачей
+            user_data['nav_page'] = (len(user_data['generated_tasks']) - 1) // self.NAV_PAGE_SIZE
+        else:
+            user_data['generated_tasks'][position] = task
+    
+    @staticmethod
+    def forget_excel_results(user_data: Dict):
+        """Сброс результатов задач прежней Excel книги: id задач позиционные (excel_1, excel_2...),
+        поэтому строки новой книги иначе открыли бы страницы старой"""
+        for key in ('artifacts', 'generated_codes', 'html_contents', 'task_documents', 'project_files'):
+            user_data[key] = {
+                task_id: value for task_id, value in user_data[key].items() if not task_id.startswith('excel_')
+            }
+        user_data['generated_tasks'] = [
+            task for task in user_data['generated_tasks'] if not task['id'].startswith('excel_')
+        ]
+        user_data['generated_index'] = {task['id']: i for i, task in enumerate(user_data['generated_tasks'])}
+        user_data['nav_page'] = 0
+        if user_data['current_task'] and user_data['current_task']['id'].startswith('excel_'):
+            user_data['current_task'] = None
+    
+    async def find_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /find - поиск задачи по началу названия или описания"""
+        user_id = update.effective_user.id
+        user_data = self.get_user_data(user_id)
+        
+        # Очищаем предыдущие сообщения, но сохраняем клавиатуру
+        await self.cleanup_previous_messages(context, user_id, keep_keyboard=True)
+        
+        prefix = " ".join(context.args or []).strip().lower()
+        self.log_activity(user_id, "find_task", task_description=prefix)
+        
+        if not prefix:
+            await self.send_temporary_message(
+                context, user_id,
+                "🔍 Укажите начало названия задачи, например: /find карта"
+            )
+            return
+        
+        keyboard = []
+        
+        # Сгенерированные задачи - переключение
+        for task in user_data['generated_tasks']:
+            if len(keyboard) >= self.FIND_LIMIT:
+                break
+            if task['summary'].lower().startswith(prefix) or task['description'].lower().startswith(prefix):
+                keyboard.append([InlineKeyboardButton(
+                    f"✅ {self.task_icon(task)} {task['summary'][:30]}", callback_data=f"sw:{task['id']}"
+                )])
+        
+        # Еще не сгенерированные задачи из Excel - генерация
+        for i, task in enumerate(user_data['excel_tasks']):
+            if len(keyboard) >= self.FIND_LIMIT:
+                break
+            if task['id'] in user_data['generated_index']:
+                continue
+            if task['summary'].lower().startswith(prefix) or task['description'].lower().startswith(prefix):
+                keyboard.append([InlineKeyboardButton(
+                    f"⏳ 📊 {task['summary'][:30]}", callback_data=f"ex:{i}"
+                )])
+        
+        if not keyboard:
+            await self.send_temporary_message(
+                context, user_id,
+                f"🔍 Задачи на «{prefix}» не найдены"
+            )
+            return
+        
+        keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back_to_main")])
+        await self.update_keyboard_message(
+            context, user_id,
+            f"🔍 Задачи на «{prefix}»:",
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+    
+    async def project_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /project - генерация проекта из нескольких файлов с отправкой ZIP архивом"""
+        user_id = update.effective_user.id
+        user_data = self.get_user_data(user_id)
+        
+        # Очищаем предыдущие сообщения, но сохраняем клавиатуру
+        await self.cleanup_previous_messages(context, user_id, keep_keyboard=True)
+        
+        text = " ".join(context.args or []).strip()
+        self.log_activity(user_id, "project_command", task_description=text[:50])
+        
+        if not text:
+            await self.send_temporary_message(
+                context, user_id,
+                "📦 Опишите проект после команды, например: /project игра змейка с таблицей рекордов"
+            )
+            return
+        
+        task_id = f"text_{len(user_data['text_tasks']) + 1}"
+        task = {
+            'id': task_id,
+            'description': text,
+            'summary': text[:40] + "..." if len(text) > 40 else text,
+            'type': 'text',
+            'output': 'project'
+        }
+        user_data['text_tasks'].append(task)
+        
+        await self.generate_and_send_code(update, context, task)
+    
     async def handle_document(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка загрузки Excel файлов"""
         user_id = update.effective_user.id
@@ -495,39 +794,38 @@ class TelegramBot:
             )
             return
         
-        # Скачивание файла
-        file = await context.bot.get_file(document.file_id)
-        file_path = f"temp_{user_id}_{document.file_name}"
-        await file.download_to_drive(file_path)
-        
         try:
-            # Парсинг Excel
-            with open(file_path, 'rb') as f:
-                tasks = self.excel_parser.extract_tasks_from_xlsx(f)
+            # Скачивание файла в память
+            file = await context.bot.get_file(document.file_id)
+            file_bytes = bytes(await file.download_as_bytearray())
+            digest = workbook_digest(file_bytes)
+            
+            # Та же книга уже разбиралась (этим или другим пользователем) - берем готовые задачи
+            tasks = await asyncio.to_thread(self.workbook_cache.get_tasks, digest)
+            if tasks is None:
+                tasks = await asyncio.to_thread(self.excel_parser.extract_tasks_from_xlsx, io.BytesIO(file_bytes))
+                if tasks:
+                    await asyncio.to_thread(self.workbook_cache.put_tasks, digest, tasks)
             
             if tasks:
+                if user_data.get('excel_digest') != digest:
+                    self.forget_excel_results(user_data)
                 user_data['excel_tasks'] = tasks
+                user_data['excel_digest'] = digest
                 user_data['state'] = 'excel_loaded'
                 
+                # Уже сгенерированные строки открываются без обращения к модели
+                results = await asyncio.to_thread(self.workbook_cache.results, digest, self.owner_id(user_id))
+                user_data['artifacts'].update(results)
+                
+                ready_text = f"\n✅ Уже готово: {len(results)}" if results else ""
                 await self.send_temporary_message(
                     context, user_id,
-                    f"✅ Найдено задач: {len(tasks)}\n\nВыберите задачу для генерации кода:"
+                    f"✅ Найдено задач: {len(tasks)}{ready_text}\n\nВыберите задачу для генерации кода:"
                 )
                 
-                # Обновляем клавиатуру для выбора задач
-                keyboard = []
-                for i, task in enumerate(tasks):
-                    keyboard.append([
-                        InlineKeyboardButton(
-                            f"{task['id']}. {task['summary']}", 
-                            callback_data=f"excel_task_{i}"
-                        )
-                    ])
-                
-                keyboard.append([InlineKeyboardButton("📝 Текстовый ввод", callback_data="text_input")])
-                keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back_to_main")])
-                
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                # Обновляем клавиатуру для выбора задач (постранично)
+                reply_markup = self.build_excel_keyboard(user_data)
                 
                 await self.update_keyboard_message(
                     context, user_id,
@@ -548,10 +846,6 @@ class TelegramBot:
                 context, user_id,
                 f"❌ Ошибка обработки файла: {str(e)}"
             )
-        finally:
-            # Удаляем временный файл
-            if os.path.exists(file_path):
-                os.remove(file_path)
     
     async def handle_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка текстовых сообщений - НЕ УДАЛЯЕМ КЛАВИАТУРУ"""
@@ -565,6 +859,11 @@ class TelegramBot:
         # Логируем действие
         self.log_activity(user_id, "text_input", task_description=text[:50])
         
+        # Если пользователь описывает правку текущей задачи
+        if user_data['state'] == 'editing' and user_data['current_task']:
+            await self.edit_and_send_code(update, context, user_data['current_task'], text)
+            return
+        
         # Если пользователь в состоянии выбора задачи из Excel
         if user_data['state'] == 'excel_loaded' and text.isdigit():
             task_index = int(text) - 1
@@ -582,6 +881,25 @@ class TelegramBot:
             'type': 'text'
         }
         
+        # Похожий запрос уже генерировался - предлагаем готовый результат вместо нового вызова модели
+        # Только собственные генерации пользователя с текущими промптами и моделью
+        match = await asyncio.to_thread(self.similarity_index.query, text, self.owner_id(user_id), self.ai_client.model)
+        if match and os.path.exists(match.ref.get('path', '')):
+            user_data['similar_offer'] = {'task': task, 'ref': match.ref}
+            self.log_activity(user_id, "similar_offer", task_id, match.description)
+            reply_markup = InlineKeyboardMarkup([
+                [InlineKeyboardButton("♻️ Показать готовый результат", callback_data="dup:use")],
+                [InlineKeyboardButton("✨ Все равно сгенерировать заново", callback_data="dup:fresh")]
+            ])
+            await self.send_temporary_message(
+                context, user_id,
+                f"♻️ Похожая задача уже генерировалась (сходство {match.similarity:.0%}):\n"
+                f"«{match.description[:200]}»",
+                reply_markup=reply_markup
+            )
+            # Задача попадет в список только после выбора: готовый результат или новая генерация
+            return
+        
         user_data['text_tasks'].append(task)
         await self.generate_and_send_code(update, context, task)
         
@@ -605,13 +923,52 @@ class TelegramBot:
         logger.info(f"Получен callback: {callback_data} от пользователя {user_id}")
         
         try:
-            if callback_data.startswith('excel_task_'):
+            if callback_data.startswith('ex:'):
                 # Выбор задачи из Excel
-                task_index = int(callback_data.split('_')[2])
+                task_index = int(callback_data[3:])
                 if task_index < len(user_data['excel_tasks']):
                     task = user_data['excel_tasks'][task_index]
                     await self.generate_and_send_code(update, context, task)
             
+            elif callback_data.startswith('dup:'):
+                # Ответ на предложение готового результата для похожего запроса
+                offer = user_data.pop('similar_offer', None)
+                if not offer:
+                    await self.send_temporary_message(
+                        context, user_id,
+                        "❌ Предложение устарело, отправьте запрос заново"
+                    )
+                    return
+                
+                # Задача добавляется в список только сейчас; id выдается заново - пока предложение
+                # ждало ответа, могли появиться другие текстовые задачи
+                task = dict(offer['task'], id=f"text_{len(user_data['text_tasks']) + 1}")
+                user_data['text_tasks'].append(task)
+                
+                html_content = None
+                if callback_data == 'dup:use':
+                    html_content = await self.artifact_store.read_html_async(ArtifactHandle(**offer['ref']))
+                if html_content:
+                    await self.generate_and_send_code(
+                        update, context, task,
+                        pregenerated=(html_content, html_content), index_result=False
+                    )
+                else:
+                    await self.generate_and_send_code(update, context, task)
+            
+            elif callback_data.startswith('pg:'):
+                # Листание страниц навигатора (m) или выбора задач из Excel (x)
+                _, view, page = callback_data.split(':')
+                if view == 'x':
+                    await self.update_keyboard_message(
+                        context, user_id,
+                        "📋 Выберите задачу из Excel:",
+                        reply_markup=self.build_excel_keyboard(user_data, int(page))
+                    )
+                else:
+                    user_data['nav_page'] = int(page)
+                    await self.update_main_keyboard(context, user_id, user_data.get('current_task'))
+            
             elif callback_data == 'text_input':
                 # Переход к текстовому вводу - НЕ УДАЛЯЕМ КЛАВИАТУРУ
                 user_data['state'] = 'idle'
@@ -632,25 +989,31 @@ class TelegramBot:
                         "❌ Нет текущей задачи для перегенерации"
                     )
             
-            elif callback_data.startswith('switch_task_'):
-                # Переключение на другую задачу
-                parts = callback_data.split('_')
-                if len(parts) >= 4:
-                    task_type = parts[2]
-                    task_index = int(parts[3])
-                    
-                    if task_type == 'excel' and task_index < len(user_data['excel_tasks']):
-                        task = user_data['excel_tasks'][task_index]
-                    elif task_type == 'text' and task_index < len(user_data['text_tasks']):
-                        task = user_data['text_tasks'][task_index]
-                    else:
-                        await self.send_temporary_message(
-                            context, user_id,
-                            "❌ Задача не найдена"
-                        )
-                        return
-                    
-                    await self.switch_to_task(update, context, task)
+            elif callback_data == 'edit_task':
+                # Точечная правка текущей задачи
+                current_task = user_data['current_task']
+                if current_task and current_task['id'] in user_data['html_contents']:
+                    user_data['state'] = 'editing'
+                    await self.send_temporary_message(
+                        context, user_id,
+                        "✏️ Опишите, что изменить в текущей странице:"
+                    )
+                else:
+                    await self.send_temporary_message(
+                        context, user_id,
+                        "❌ Нет текущей задачи для изменения"
+                    )
+            
+            elif callback_data.startswith('sw:'):
+                # Переключение по id задачи: позиции в навигаторе меняются при смене Excel книги
+                task_index = user_data['generated_index'].get(callback_data[3:])
+                if task_index is not None:
+                    await self.switch_to_task(update, context, user_data['generated_tasks'][task_index])
+                else:
+                    await self.send_temporary_message(
+                        context, user_id,
+                        "❌ Задача не найдена"
+                    )
             
             elif callback_data == 'task_list':
                 # Показать список задач
@@ -684,24 +1047,20 @@ class TelegramBot:
             
             elif callback_data.startswith('example_'):
                 example_type = callback_data.split('_')[1]
-                examples = {
-                    'cat': "Создай креативное сайт-портфолио для кота, который ищет работу фронтенд-разработчиком. Включи анимации, интерактивные элементы и чувство юмора.",
-                    'treasure': "Создай интерактивную карту сокровищ с анимацией клада, анимированным компасом и эффектами при наведении на острова.",
-                    'dinosaur': "Создай простую игру 'Убеги от динозавра' с анимированным персонажем, препятствиями и счетчиком очков.",
-                    'memes': "Создай генератор мемов с движущимися элементами, возможностью добавления текста и анимированными кнопками."
-                }
                 
-                if example_type in examples:
+                if example_type in self.EXAMPLES:
                     task_id = f"example_{len(user_data['text_tasks']) + 1}"
                     task = {
                         'id': task_id,
-                        'description': examples[example_type],
+                        'description': self.EXAMPLES[example_type],
                         'summary': f"Пример: {example_type}",
                         'type': 'example'
                     }
                     
                     user_data['text_tasks'].append(task)
-                    await self.generate_and_send_code(update, context, task)
+                    # Берем заранее подготовленный вариант, если он есть
+                    pregenerated = self.example_warmer.take(task['description'])
+                    await self.generate_and_send_code(update, context, task, pregenerated=pregenerated)
                     
             else:
                 logger.warning(f"Неизвестный callback: {callback_data}")
@@ -734,14 +1093,14 @@ class TelegramBot:
         if user_data['excel_tasks']:
             text += "📊 **Задачи из Excel:**\n"
             for i, task in enumerate(user_data['excel_tasks']):
-                status = "✅" if task['id'] in user_data['generated_codes'] else "⏳"
+                status = "✅" if self.has_generated_code(user_data, task['id']) else "⏳"
                 text += f"{status} {task['id']}. {task['summary']}\n"
         
         # Текстовые задачи
         if user_data['text_tasks']:
             text += "\n📝 **Текстовые задачи:**\n"
             for i, task in enumerate(user_data['text_tasks']):
-                status = "✅" if task['id'] in user_data['generated_codes'] else "⏳"
+                status = "✅" if self.has_generated_code(user_data, task['id']) else "⏳"
                 text += f"{status} {task['summary']}\n"
         
         await self.send_temporary_message(
@@ -770,7 +1129,10 @@ class TelegramBot:
 
 **Управление:**
 - 🔄 Перегенерировать - создать новый код для текущей задачи
+- ✏️ Изменить - точечно поправить текущую страницу по описанию
 - 📋 Список задач - показать все задачи и переключиться между ними
+- /find <начало названия> - найти задачу
+- /project <описание> - многофайловый проект в ZIP
 - 📝 Новая задача - ввести новое текстовое описание
 - 📖 Справка - показать эту справку
 - 🗑️ Очистить - удалить историю задач
@@ -797,8 +1159,15 @@ class TelegramBot:
             'last_message_id': None,
             'task_documents': {},
             'keyboard_message_id': None,
-            'last_keyboard_text': None,
-            'last_keyboard_markup': None,
+            'keyboard_fingerprint': None,
+            'pending_keyboard': None,
+            'keyboard_flush_task': None,
+            'last_keyboard_edit': 0.0,
+            'artifacts': {},
+            'generated_tasks': [],
+            'generated_index': {},
+            'nav_page': 0,
+            'project_files': {},
             'previous_messages': []
         }
         await self.send_temporary_message(
@@ -811,97 +1180,213 @@ class TelegramBot:
         
         logger.info(f"Пользователь {user_id} очистил историю")
     
-    async def generate_and_send_code(self, update: Update, context: ContextTypes.DEFAULT_TYPE, task: Dict, regenerate: bool = False):
-        """Генерация и отправка кода"""
-        user_id = update.effective_user.id if update.message else update.callback_query.from_user.id
+    async def get_project_files(self, user_id: int, task: Dict) -> Optional[Dict[str, str]]:
+        """Файлы многофайлового проекта задачи (из памяти или по манифесту в журнале хранилища)"""
+        if task.get('output') != 'project':
+            return None
         user_data = self.get_user_data(user_id)
+        files = user_data['project_files'].get(task['id'])
+        if files is None:
+            codes_dir = os.path.join(self.users_dir, f"user_{user_id}", "codes")
+            metadata = (await asyncio.to_thread(self.artifact_store.index, codes_dir)).get(task['id'], {})
+            if metadata.get('project_files'):
+                files = await asyncio.to_thread(self.artifact_store.read_files, metadata['project_files'])
+            if files:
+                user_data['project_files'][task['id']] = files
+        return files
+    
+    async def send_result_document(self, context: ContextTypes.DEFAULT_TYPE, user_id: int, task: Dict,
+                                   html_content: str, caption: str):
+        """Отправка результата из памяти: HTML файл или ZIP архив проекта, без временных файлов"""
+        files = await self.get_project_files(user_id, task)
+        if files:
+            data = await asyncio.to_thread(build_zip, files)
+            filename = f"task_{task['id']}_project.zip"
+        else:
+            data = html_content.encode('utf-8')
+            filename = f"task_{task['id']}_code.html"
         
-        # Очищаем предыдущие сообщения, но сохраняем клавиатуру
-        await self.cleanup_previous_messages(context, user_id, keep_keyboard=True)
+        return await self.outbound(context).send_document(
+            chat_id=user_id,
+            document=InputFile(io.BytesIO(data), filename=filename),
+            caption=caption
+        )
+    
+    async def generate_and_send_code(self, update: Update, context: ContextTypes.DEFAULT_TYPE, task: Dict,
+                                     regenerate: bool = False, pregenerated: Optional[Tuple[str, str]] = None,
+                                     index_result: bool = True):
+        """Генерация и отправка кода (pregenerated - готовая пара generated_code, html_content,
+        index_result - добавить результат в индекс похожих задач)"""
+        user_id = update.effective_user.id if update.message else update.callback_query.from_user.id
+        user_data = self.get_user_data(user_id)
+        tracer = get_tracer()
         
-        # Получаем информацию о пользователе для сохранения
-        user = update.effective_user if update.message else update.callback_query.from_user
+        with tracer.span("generate_and_send_code", user_id=user_id, task_id=task['id'], regenerate=regenerate):
+            # Очищаем предыдущие сообщения, но сохраняем клавиатуру
+            with tracer.span("cleanup_messages"):
+                await self.cleanup_previous_messages(context, user_id, keep_keyboard=True)
+            
+            # Логируем действие
+            action = "regenerate_code" if regenerate else "generate_code"
+            with tracer.span("log_activity"):
+                self.log_activity(user_id, action, task['id'], task.get('description', ''))
+            
+            # Проверяем, не генерировали ли уже код для этой задачи
+            if not regenerate and self.has_generated_code(user_data, task['id']):
+                await self.switch_to_task(update, context, task)
+                return
+            
+            # Отправляем сообщение о начале генерации
+            with tracer.span("telegram.send_status"):
+                message = await self.outbound(context).send_message(
+                    chat_id=user_id,
+                    text=f"🔄 Генерируем код для: {task['summary']}..."
+                )
+            user_data['previous_messages'].append(message.message_id)
+            
+            try:
+                # Вызовы AI блокируются на минуты (hedging, повторы, продолжения) - выполняются
+                # в потоке, чтобы цикл событий продолжал обслуживать остальных пользователей
+                project_files = None
+                if pregenerated:
+                    generated_code, html_content = pregenerated
+                elif task.get('output') == 'project':
+                    # Генерация проекта: файлы уходят в ZIP, однофайловая версия - в хранилище и превью
+                    with tracer.span("ai.generate_project"), self.example_warmer.generating():
+                        project_files = await asyncio.to_thread(self.ai_client.generate_project, task['description'])
+                    
+                    generated_code = project_files['index.html'] if project_files else None
+                    if project_files:
+                        with tracer.span("prepare_html"):
+                            html_content = self.code_renderer.prepare_html(inline_project(project_files))
+                else:
+                    # Пользовательская генерация - фоновый прогрев примеров уступает ей API
+                    with tracer.span("ai.generate_code"), self.example_warmer.generating():
+                        generated_code = await asyncio.to_thread(self.ai_client.generate_code, task['description'])
+                    
+                    if generated_code:
+                        with tracer.span("prepare_html"):
+                            html_content = self.code_renderer.prepare_html(generated_code)
+                
+                if generated_code:
+                    
+                    # Сохраняем код в файлы
+                    with tracer.span("save_generated_code"):
+                        handle = await self.save_generated_code(user_id, task, html_content, generated_code, project_files)
+                    if index_result:
+                        await asyncio.to_thread(
+                            self.similarity_index.add, task['description'], handle._asdict(), self.owner_id(user_id), self.ai_client.model
+                        )
+                    
+                    # Сохраняем код в память
+                    self.register_generated_task(user_data, task)
+                    user_data['generated_codes'][task['id']] = generated_code
+                    user_data['html_contents'][task['id']] = html_content
+                    user_data['current_task'] = task
+                    user_data['state'] = 'code_generated'
+                    
+                    # Отправляем файл - раньше удаления статуса и прочей очистки
+                    with tracer.span("telegram.send_document"):
+                        doc_message = await self.send_result_document(
+                            context, user_id, task, html_content,
+                            f"✅ Код сгенерирован для: {task['summary']}"
+                        )
+                    
+                    # Сообщение о генерации удаляется в фоне, в очереди за предыдущими удалениями
+                    self.delete_in_background(context, user_id, message.message_id)
+                    if message.message_id in user_data['previous_messages']:
+                        user_data['previous_messages'].remove(message.message_id)
+                    
+                    # Сохраняем ID документа для задачи
+                    user_data['task_documents'][task['id']] = doc_message.message_id
+                    user_data['previous_messages'].append(doc_message.message_id)
+                    
+                    # Обновляем клавиатуру управления
+                    with tracer.span("telegram.update_keyboard"):
+                        await self.update_main_keyboard(context, user_id, task)
+                    
+                    logger.info(f"Код сгенерирован для задачи {task['id']} пользователя {user_id}")
+                else:
+                    await self.outbound(context).edit_message_text(
+                        chat_id=user_id,
+                        message_id=message.message_id,
+                        text="❌ Не удалось сгенерировать код. Попробуйте изменить описание задачи."
+                    )
+                    
+            except Exception as e:
+                logger.error(f"Error generating code: {e}")
+                await self.outbound(context).edit_message_text(
+                    chat_id=user_id,
+                    message_id=message.message_id,
+                    text=f"❌ Ошибка генерации кода: {str(e)}"
+                )
+    
+    async def edit_and_send_code(self, update: Update, context: ContextTypes.DEFAULT_TYPE, task: Dict, instruction: str):
+        """Точечная правка сгенерированного кода и отправка результата"""
+        user_id = update.effective_user.id
+        user_data = self.get_user_data(user_id)
         
         # Логируем действие
-        action = "regenerate_code" if regenerate else "generate_code"
-        self.log_activity(user_id, action, task['id'], task.get('description', ''))
+        self.log_activity(user_id, "edit_code", task['id'], instruction)
         
-        # Проверяем, не генерировали ли уже код для этой задачи
-        if not regenerate and task['id'] in user_data['generated_codes']:
-            await self.switch_to_task(update, context, task)
-            return
+        user_data['state'] = 'code_generated'
         
-        # Отправляем сообщение о начале генерации
-        message = await context.bot.send_message(
+        message = await self.outbound(context).send_message(
             chat_id=user_id,
-            text=f"🔄 Генерируем код для: {task['summary']}..."
+            text=f"✏️ Вносим изменения в: {task['summary']}..."
         )
         user_data['previous_messages'].append(message.message_id)
         
         try:
-            # Генерация кода
-            generated_code = self.ai_client.generate_code(task['description'])
+            html_content = user_data['html_contents'][task['id']]
+            project_files = await self.get_project_files(user_id, task)
+            with self.example_warmer.generating():
+                if project_files:
+                    # Правятся только затронутые файлы проекта, остальные остаются теми же блобами
+                    project_files = await asyncio.to_thread(self.ai_client.edit_project, project_files, instruction)
+                    edited_code = project_files['index.html'] if project_files else None
+                else:
+                    edited_code = await asyncio.to_thread(self.ai_client.edit_code, html_content, instruction)
             
-            if generated_code:
-                html_content = self.code_renderer.prepare_html(generated_code)
-                
-                # Сохраняем код в файлы
-                html_filepath, metadata_filepath = self.save_generated_code(
-                    user_id, task, html_content, generated_code
-                )
-                
-                # Сохраняем код в память
-                user_data['generated_codes'][task['id']] = generated_code
-                user_data['html_contents'][task['id']] = html_content
-                user_data['current_task'] = task
-                user_data['state'] = 'code_generated'
-                
-                # Создаем временный HTML файл для отправки
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-                    f.write(html_content)
-                    temp_file_path = f.name
-                
-                # Удаляем сообщение о генерации
-                try:
-                    await context.bot.delete_message(chat_id=user_id, message_id=message.message_id)
-                    user_data['previous_messages'].remove(message.message_id)
-                except Exception as e:
-                    logger.debug(f"Не удалось удалить сообщение о генерации: {e}")
-                
-                # Отправляем файл
-                with open(temp_file_path, 'rb') as f:
-                    doc_message = await context.bot.send_document(
-                        chat_id=user_id,
-                        document=InputFile(f, filename=f"task_{task['id']}_code.html"),
-                        caption=f"✅ Код сгенерирован для: {task['summary']}"
-                    )
-                
-                # Сохраняем ID документа для задачи
-                user_data['task_documents'][task['id']] = doc_message.message_id
-                user_data['previous_messages'].append(doc_message.message_id)
-                
-                # Обновляем клавиатуру управления
-                await self.update_main_keyboard(context, user_id, task)
-                
-                logger.info(f"Код сгенерирован для задачи {task['id']} пользователя {user_id}")
-            else:
-                await context.bot.edit_message_text(
+            if not edited_code:
+                await self.outbound(context).edit_message_text(
                     chat_id=user_id,
                     message_id=message.message_id,
-                    text="❌ Не удалось сгенерировать код. Попробуйте изменить описание задачи."
+                    text="❌ Не удалось применить изменение. Попробуйте переформулировать или перегенерируйте код."
                 )
-                
+                return
+            
+            html_content = self.code_renderer.prepare_html(inline_project(project_files) if project_files else edited_code)
+            
+            # Сохраняем новую версию в файлы и память
+            await self.save_generated_code(user_id, task, html_content, edited_code, project_files)
+            user_data['generated_codes'][task['id']] = edited_code
+            user_data['html_contents'][task['id']] = html_content
+            
+            doc_message = await self.send_result_document(
+                context, user_id, task, html_content,
+                f"✏️ Изменения внесены: {task['summary']}"
+            )
+            
+            # Сообщение о правке удаляется в фоне, после отправки результата
+            self.delete_in_background(context, user_id, message.message_id)
+            if message.message_id in user_data['previous_messages']:
+                user_data['previous_messages'].remove(message.message_id)
+            
+            user_data['task_documents'][task['id']] = doc_message.message_id
+            user_data['previous_messages'].append(doc_message.message_id)
+            
+            await self.update_main_keyboard(context, user_id, task)
+            
+            logger.info(f"Код изменен для задачи {task['id']} пользователя {user_id}")
+            
         except Exception as e:
-            logger.error(f"Error generating code: {e}")
-            await context.bot.edit_message_text(
+            logger.error(f"Error editing code: {e}")
+            await self.outbound(context).edit_message_text(
                 chat_id=user_id,
                 message_id=message.message_id,
-                text=f"❌ Ошибка генерации кода: {str(e)}"
+                text=f"❌ Ошибка изменения кода: {str(e)}"
             )
-        finally:
-            # Удаляем временный файл
-            if 'temp_file_path' in locals() and os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
     
     async def switch_to_task(self, update: Update, context: ContextTypes.DEFAULT_TYPE, task: Dict):
         """Переключение на существующую задачу с повторной отправкой файла"""
@@ -914,7 +1399,7 @@ class TelegramBot:
         # Логируем действие
         self.log_activity(user_id, "switch_task", task['id'], task.get('description', ''))
         
-        if task['id'] not in user_data['generated_codes']:
+        if not self.has_generated_code(user_data, task['id']):
             await self.send_temporary_message(
                 context, user_id,
                 "❌ Код для этой задачи еще не сгенерирован"
@@ -923,22 +1408,30 @@ class TelegramBot:
         
         user_data['current_task'] = task
         
-        # Получаем сохраненный HTML контент
-        html_content = user_data['html_contents'][task['id']]
-        
-        # Создаем временный HTML файл для отправки
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-            f.write(html_content)
-            temp_file_path = f.name
+        # Получаем сохраненный HTML контент (при отсутствии в памяти - из хранилища)
+        html_content = user_data['html_contents'].get(task['id'])
+        if html_content is None:
+            handle = user_data['artifacts'].get(task['id']) or self.artifact_store.latest(
+                os.path.join(self.users_dir, f"user_{user_id}", "codes"), task['id']
+            )
+            html_content = await self.artifact_store.read_html_async(handle) if handle else None
+            if html_content is None:
+                await self.send_temporary_message(
+                    context, user_id,
+                    "❌ Не удалось загрузить сохраненный код задачи"
+                )
+                return
+            user_data['html_contents'][task['id']] = html_content
+            # Исходный ответ модели не сохраняется, код восстанавливается из HTML
+            user_data['generated_codes'].setdefault(task['id'], html_content)
+            self.register_generated_task(user_data, task)
         
         try:
             # Отправляем файл заново
-            with open(temp_file_path, 'rb') as f:
-                doc_message = await context.bot.send_document(
-                    chat_id=user_id,
-                    document=InputFile(f, filename=f"task_{task['id']}_code.html"),
-                    caption=f"📂 Активная задача: {task['summary']}"
-                )
+            doc_message = await self.send_result_document(
+                context, user_id, task, html_content,
+                f"📂 Активная задача: {task['summary']}"
+            )
             
             # Сохраняем ID документа для задачи
             user_data['task_documents'][task['id']] = doc_message.message_id
@@ -954,16 +1447,15 @@ class TelegramBot:
                 context, user_id,
                 f"❌ Ошибка при отправке файла: {str(e)}"
             )
-        finally:
-            # Удаляем временный файл
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
 
 def run_bot(token: str):
     """Запуск Telegram бота"""
     bot = TelegramBot(token)
     print("🤖 Telegram бот запущен...")
-    bot.application.run_polling()
+    try:
+        bot.application.run_polling()
+    finally:
+        bot.artifact_store.flush()
 
 if __name__ == "__main__":
     # Для прямого запуска telegram_bot.py   
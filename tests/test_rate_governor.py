@@ -0,0 +1,45 @@
+import time
+import asyncio
+
+from utils.rate_governor import PRIORITY_CLEANUP, PRIORITY_RESULT, RateGovernor
+
+
+def _recorder(log, name):
+    async def call(**kwargs):
+        log.append((name, time.monotonic()))
+        return name
+    return call
+
+
+def test_result_dispatched_ahead_of_pending_cleanup():
+    async def scenario():
+        governor = RateGovernor(global_rate=30, chat_rate=1, chat_burst=3)
+        log = []
+        started = time.monotonic()
+        # Очистка прошлых сообщений и удаление статуса уже в очереди
+        for i in range(6):
+            governor.submit_background(1, PRIORITY_CLEANUP, _recorder(log, f"cleanup_{i}"), chat_id=1)
+        governor.submit_background(1, PRIORITY_CLEANUP, _recorder(log, "status"), chat_id=1)
+        result = await governor.submit(1, PRIORITY_RESULT, _recorder(log, "document"), chat_id=1)
+        return result, log, started
+
+    result, log, started = asyncio.run(scenario())
+    assert result == "document"
+    assert log[0][0] == "document"
+    assert log[0][1] - started < 0.5
+
+
+def test_cancelled_call_does_not_take_token():
+    async def scenario():
+        governor = RateGovernor(global_rate=30, chat_rate=1, chat_burst=1)
+        log = []
+        cancelled = governor.submit_background(1, PRIORITY_RESULT, _recorder(log, "cancelled"), chat_id=1)
+        cancelled.cancel()
+        started = time.monotonic()
+        await governor.submit(1, PRIORITY_RESULT, _recorder(log, "document"), chat_id=1)
+        return log, started
+
+    log, started = asyncio.run(scenario())
+    assert [name for name, _ in log] == ["document"]
+    # Единственный токен чата достался документу, а не отмененному запросу
+    assert log[0][1] - started < 0.5
@@ -0,0 +1,25 @@
+from utils.artifact_store import ArtifactHandle
+from utils.workbook_cache import WorkbookCache, workbook_digest
+
+
+def _handle(tmp_path, name):
+    path = tmp_path / f"{name}.html.gz"
+    path.write_bytes(b"")
+    return ArtifactHandle(str(tmp_path), "excel_1", str(path), "gzip", "2024-01-01T00:00:00", name)
+
+
+def test_results_are_scoped_to_owner(tmp_path):
+    cache = WorkbookCache(str(tmp_path / "workbooks"))
+    digest = workbook_digest(b"same workbook")
+
+    alice = _handle(tmp_path, "alice")
+    cache.record_result(digest, "alice", "excel_1", alice)
+
+    assert cache.results(digest, "alice") == {"excel_1": alice}
+    # Тот же файл, загруженный другим пользователем, не открывает чужие страницы
+    assert cache.results(digest, "bob") == {}
+
+    bob = _handle(tmp_path, "bob")
+    cache.record_result(digest, "bob", "excel_1", bob)
+    assert cache.results(digest, "alice") == {"excel_1": alice}
+    assert cache.results(digest, "bob") == {"excel_1": bob}
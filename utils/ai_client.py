@@ -1,16 +1,80 @@
 import requests
 import os
+import time
 import logging
-from typing import Optional
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional, Tuple
 import json
+from utils.tracing import get_tracer
+from utils.html_scanner import scan_html
+from utils.html_patch import PatchError, apply_search_replace, parse_search_replace_blocks
+from utils.html_validator import validate_html_document
+from utils.project_bundle import ProjectError, parse_project_files, serialize_project, validate_project
+from utils.structured_output import RESPONSE_FORMAT, SchemaError, StructuredPage, parse_structured_page
+from utils import prompts
+from utils.code_renderer import CodeRenderer
+from utils.latency_tracker import LatencyTracker
 
 logger = logging.getLogger(__name__)
 
 class AIClient:
+    # Бюджет токенов на сам HTML и отдельно на рассуждения reasoning-моделей
+    OUTPUT_MAX_TOKENS = 4000
+    REASONING_MAX_TOKENS = 1024
+    REASONING_MODEL_MARKERS = ('r1', 'reason', 'think', 'qwq', 'o1', 'o3', 'o4')
+    
+    # Продолжение обрезанных документов
+    MAX_CONTINUATIONS = 2
+    STITCH_OVERLAP = 200
+    STITCH_MIN_OVERLAP = 16
+    CONTINUE_PROMPT = prompts.CONTINUE_PROMPT
+    
+    # Повторные генерации, если документ не прошел структурную проверку даже после продолжений
+    QUALITY_RETRIES = 1
+    
+    # Структурированный вывод: попытки исправить ответ, не прошедший схему
+    MAX_REPAIRS = 1
+    
+    # Правки существующего документа - короткий ответ с блоками SEARCH/REPLACE
+    EDIT_MAX_TOKENS = 1500
+    
+    # Хеджирование: если основная модель не прислала первый байт за HEDGE_QUANTILE
+    # наблюдаемых задержек, параллельно запрашиваем следующую модель из списка
+    HEDGE_QUANTILE = 0.9
+    HEDGE_DEFAULT_DELAY = 20.0
+    HEDGE_MIN_DELAY = 3.0
+    HEDGE_MIN_SAMPLES = 10
+    
+    # Таймауты по наблюдаемым задержкам: p99 * запас + отступ, отдельно для первого байта и всего ответа.
+    # Пока наблюдений мало, используются значения по умолчанию
+    CONNECT_TIMEOUT = 10.0
+    DEFAULT_FIRST_BYTE_DEADLINE = 120.0
+    DEFAULT_TOTAL_DEADLINE = 180.0
+    TIMEOUT_QUANTILE = 0.99
+    TIMEOUT_MARGIN = 1.5
+    TIMEOUT_PADDING = 5.0
+    TIMEOUT_MIN_SAMPLES = 20
+    MIN_FIRST_BYTE_DEADLINE = 10.0
+    MIN_TOTAL_DEADLINE = 20.0
+    MAX_TOTAL_DEADLINE = 300.0
+    
     def __init__(self):
         self.api_url = "https://openrouter.ai/api/v1/chat/completions"
         self.model = "tngtech/deepseek-r1t2-chimera:free"
         self.api_key = self._get_api_key()
+        
+        # Резервные модели для хеджирования (через запятую). Пусто - режим выключен
+        self.hedge_models = [m.strip() for m in os.getenv('OPENROUTER_HEDGE_MODELS', '').split(',') if m.strip()]
+        self.hedge_quantile = float(os.getenv('OPENROUTER_HEDGE_QUANTILE', self.HEDGE_QUANTILE))
+        self.latency_tracker = LatencyTracker(
+            os.getenv('LATENCY_STATS_FILE', os.path.join("generated_codes", "latency_stats.json"))
+        )
+        self._code_renderer = CodeRenderer()
+        
+        # Режим JSON ответа {html, title, summary} по схеме вместо эвристической очистки текста
+        self.structured_output = os.getenv('OPENROUTER_STRUCTURED_OUTPUT', '0') == '1'
     
     def _get_api_key(self):
         """Получение API ключа из переменных окружения"""
@@ -33,45 +97,484 @@ class AIClient:
             logger.error("API ключ не настроен")
             return None
         
-        prompt = f"""
-        Ты опытный фронтенд-разработчик. Сгенерируй чистый, валидный HTML/CSS/JS код.
+        if self.structured_output:
+            page = self.generate_page(task_description)
+            return scan_html(page.html) if page else None
+        
+        return self._generate_plain(task_description)
+    
+    def generate_page(self, task_description: str) -> Optional[StructuredPage]:
+        """Генерация в режиме JSON ответа по схеме со строгим разбором.
+        Ответ, не прошедший схему, отправляется модели на исправление (MAX_REPAIRS раз)"""
+        
+        if not self.api_key:
+            logger.error("API ключ не настроен")
+            return None
+        
+        messages = prompts.build_structured_messages(self.model, task_description)
+        
+        for attempt in range(self.MAX_REPAIRS + 1):
+            completion = self._request_completion(messages, response_format=RESPONSE_FORMAT)
+            if completion is None:
+                if attempt == 0:
+                    # Модель или провайдер не принял response_format - обычный режим
+                    logger.warning("Структурированный ответ не получен, генерируем в обычном режиме")
+                    html = self._generate_plain(task_description)
+                    return StructuredPage(html, "", "") if html else None
+                return None
+            
+            content, finish_reason = completion
+            try:
+                page = parse_structured_page(content)
+            except SchemaError as e:
+                error = str(e)
+                if finish_reason == 'length':
+                    error += "; ответ обрезан по лимиту, сделай страницу компактнее"
+                logger.warning(f"Ответ не прошел схему (попытка {attempt + 1}): {error}")
+                messages = messages + [
+                    {"role": "assistant", "content": content},
+                    {"role": "user", "content": prompts.REPAIR_PROMPT.format(error=error)}
+                ]
+                continue
+            
+            logger.info(f"Структурированный ответ принят: {page.title}")
+            return page
+        
+        logger.error("Ответ не соответствует схеме после исправлений")
+        return None
+    
+    def _generate_plain(self, task_description: str) -> Optional[str]:
+        """Генерация HTML текстом с продолжением обрезанных ответов и повтором при поврежденном документе"""
+        best, best_report = None, None
+        for attempt in range(self.QUALITY_RETRIES + 1):
+            if self.hedge_models:
+                result = self._generate_hedged(task_description)
+            else:
+                # Статичные инструкции идут в system сообщении, ТЗ - в user
+                messages = prompts.build_generate_messages(self.model, task_description)
+                result = self._complete_document(messages)
+            if not result:
+                continue
+            
+            report = validate_html_document(result)
+            if report.acceptable:
+                return result
+            logger.warning(f"Документ не прошел проверку (попытка {attempt + 1}): {report.summary()}")
+            if best_report is None or report.score > best_report.score:
+                best, best_report = result, report
+        
+        if best is None:
+            return None
+        # Повторы исчерпаны: документ с мелкими дефектами лучше, чем отсутствие результата,
+        # но оборванный посреди разметки не отдается
+        scanned = scan_html(best)
+        if scanned.is_full_document and scanned.has_closing_html:
+            logger.warning(f"Отдаем лучший из полученных документов, оценка {best_report.summary()}")
+            return scanned
+        logger.error(f"Не удалось получить целый документ, лучшая оценка {best_report.summary()}")
+        return None
+    
+    def _generate_hedged(self, task_description: str) -> Optional[str]:
+        """Гонка моделей: побеждает первый валидный HTML, остальные запросы отменяются"""
+        models = [self.model] + self.hedge_models
+        executor = ThreadPoolExecutor(max_workers=len(models))
+        attempts = {}
+        
+        def launch(model: str) -> threading.Event:
+            cancel_event = threading.Event()
+            first_byte_event = threading.Event()
+            messages = prompts.build_generate_messages(model, task_description)
+            # Копия контекста, чтобы спаны трассировки попали в текущий трейс
+            context = contextvars.copy_context()
+            future = executor.submit(
+                context.run, self._complete_document, messages, model, first_byte_event, cancel_event
+            )
+            attempts[future] = (model, cancel_event)
+            return first_byte_event
+        
+        try:
+            first_byte_event = launch(models[0])
+            next_index = 1
+            pending = set(attempts)
+            
+            while pending:
+                timeout = None
+                if next_index < len(models) and not first_byte_event.is_set():
+                    timeout = self._hedge_delay(models[next_index - 1])
+                
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                
+                if not done:
+                    if not first_byte_event.is_set():
+                        logger.info(f"Нет первого байта за {timeout:.1f} с, хеджируем запрос моделью {models[next_index]}")
+                        first_byte_event = launch(models[next_index])
+                        next_index += 1
+                        pending = {f for f in attempts if not f.done()}
+                    continue
+                
+                for future in done:
+                    model, _ = attempts[future]
+                    result = future.result()
+                    if result and self._code_renderer.validate_html(result):
+                        logger.info(f"Гонку выиграла модель {model}")
+                        return result
+                    logger.warning(f"Модель {model} не вернула валидный HTML")
+                
+                # Все запущенные попытки провалились - сразу пробуем следующую модель
+                if not pending and next_index < len(models):
+                    first_byte_event = launch(models[next_index])
+                    next_index += 1
+                    pending = {f for f in attempts if not f.done()}
+            
+            return None
+        finally:
+            # Отменяем проигравшие запросы и не ждем их завершения
+            for _, cancel_event in attempts.values():
+                cancel_event.set()
+            executor.shutdown(wait=False)
+    
+    def generate_project(self, task_description: str) -> Optional[Dict[str, str]]:
+        """Генерация многофайлового проекта (имя файла -> содержимое) с проверкой структуры"""
+        
+        if not self.api_key:
+            logger.error("API ключ не настроен")
+            return None
+        
+        messages = prompts.build_project_messages(self.model, task_description)
+        for attempt in range(self.QUALITY_RETRIES + 1):
+            # Обрыв проекта виден только по finish_reason: разделители файлов не дают понять, где конец
+            content = self._complete_text(messages, is_truncated=lambda text, reason: reason == 'length')
+            if not content:
+                continue
+            try:
+                files = parse_project_files(content)
+            except ProjectError as e:
+                logger.warning(f"Ответ не разобран как проект (попытка {attempt + 1}): {e}")
+                continue
+            
+            problems = validate_project(files)
+            if not problems:
+                logger.info(f"Проект сгенерирован: {', '.join(sorted(files))}")
+                return files
+            logger.warning(f"Проект не прошел проверку (попытка {attempt + 1}): {'; '.join(problems)}")
+        
+        logger.error("Не удалось получить корректный проект")
+        return None
+    
+    def _hedge_delay(self, model: str) -> float:
+        """Задержка до хеджирования - квантиль наблюдаемого времени до первого байта"""
+        if self.latency_tracker.count(model, 'first_byte') < self.HEDGE_MIN_SAMPLES:
+            return self.HEDGE_DEFAULT_DELAY
+        delay = self.latency_tracker.quantile(model, 'first_byte', self.hedge_quantile)
+        return max(self.HEDGE_MIN_DELAY, delay)
+    
+    def _deadlines(self, model: str) -> Tuple[float, float]:
+        """Дедлайны (первый байт, весь ответ) по p99 наблюдаемых задержек модели"""
+        first_byte = self.DEFAULT_FIRST_BYTE_DEADLINE
+        total = self.DEFAULT_TOTAL_DEADLINE
+        
+        if self.latency_tracker.count(model, 'first_byte') >= self.TIMEOUT_MIN_SAMPLES:
+            observed = self.latency_tracker.quantile(model, 'first_byte', self.TIMEOUT_QUANTILE)
+            first_byte = min(self.MAX_TOTAL_DEADLINE, max(
+                self.MIN_FIRST_BYTE_DEADLINE, observed * self.TIMEOUT_MARGIN + self.TIMEOUT_PADDING
+            ))
+        
+        if self.latency_tracker.count(model, 'total') >= self.TIMEOUT_MIN_SAMPLES:
+            observed = self.latency_tracker.quantile(model, 'total', self.TIMEOUT_QUANTILE)
+            total = min(self.MAX_TOTAL_DEADLINE, max(
+                self.MIN_TOTAL_DEADLINE, observed * self.TIMEOUT_MARGIN + self.TIMEOUT_PADDING
+            ))
+        
+        return first_byte, max(first_byte, total)
+    
+    def edit_code(self, html: str, instruction: str) -> Optional[str]:
+        """Точечная правка готового документа через блоки SEARCH/REPLACE вместо полной генерации"""
+        
+        if not self.api_key:
+            logger.error("API ключ не настроен")
+            return None
+        
+        completion = self._request_completion(
+            prompts.build_edit_messages(self.model, html, instruction),
+            max_tokens=self.EDIT_MAX_TOKENS
+        )
+        if completion is None:
+            return None
+        
+        content, finish_reason = completion
+        blocks = parse_search_replace_blocks(content)
+        
+        if not blocks:
+            # Модель проигнорировала формат и вернула документ целиком
+            scanned = self._clean_ai_output(content)
+            if scanned.is_full_document and scanned.has_closing_html:
+                report = validate_html_document(scanned)
+                if not report.acceptable and validate_html_document(html).acceptable:
+                    logger.error(f"Правка полным документом повредила страницу: {report.summary()}")
+                    return None
+                logger.info("Правка вернулась полным документом")
+                return scanned
+            logger.error("В ответе на правку нет блоков SEARCH/REPLACE")
+            return None
+        
+        try:
+            patched = apply_search_replace(html, blocks)
+        except PatchError as e:
+            logger.error(f"Не удалось применить правку: {e}")
+            return None
+        
+        scanned = self._clean_ai_output(patched)
+        report = validate_html_document(scanned)
+        if not report.acceptable and validate_html_document(html).acceptable:
+            logger.error(f"После правки документ поврежден: {report.summary()}")
+            return None
+        
+        logger.info(f"Применено правок: {len(blocks)}, finish_reason={finish_reason}")
+        return scanned
+    
+    def edit_project(self, files: Dict[str, str], instruction: str) -> Optional[Dict[str, str]]:
+        """Правка проекта блоками SEARCH/REPLACE: меняются только затронутые файлы"""
+        
+        if not self.api_key:
+            logger.error("API ключ не настроен")
+            return None
+        
+        project_text = serialize_project(files)
+        completion = self._request_completion(
+            prompts.build_project_edit_messages(self.model, project_text, instruction),
+            max_tokens=self.EDIT_MAX_TOKENS
+        )
+        if completion is None:
+            return None
+        
+        blocks = parse_search_replace_blocks(completion[0])
+        if not blocks:
+            logger.error("В ответе на правку проекта нет блоков SEARCH/REPLACE")
+            return None
+        
+        try:
+            edited = parse_project_files(apply_search_replace(project_text, blocks))
+        except (PatchError, ProjectError) as e:
+            logger.error(f"Не удалось применить правку проекта: {e}")
+            return None
+        
+        problems = validate_project(edited)
+        if problems:
+            logger.error(f"После правки проект поврежден: {'; '.join(problems)}")
+            return None
+        
+        changed = [name for name in edited if files.get(name) != edited[name]]
+        logger.info(f"Применено правок: {len(blocks)}, изменены файлы: {', '.join(changed) or 'нет'}")
+        return edited
+    
+    def is_reasoning_model(self, model: str = None) -> bool:
+        """Модели с рассуждениями тратят часть max_tokens на reasoning"""
+        model = (model or self.model).lower()
+        return any(marker in model for marker in self.REASONING_MODEL_MARKERS)
+    
+    def _build_payload(self, messages: List[Dict], max_tokens: int = None, model: str = None,
+                       response_format: Dict = None) -> Dict:
+        """Формирование запроса с учетом бюджета на рассуждения"""
+        max_tokens = max_tokens or self.OUTPUT_MAX_TOKENS
+        model = model or self.model
+        payload = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": 0.7,
+            "top_p": 0.9,
+        }
+        if response_format:
+            payload["response_format"] = response_format
+        
+        if self.is_reasoning_model(model):
+            # Ограничиваем рассуждения и не возвращаем их в ответе,
+            # чтобы на сам ответ оставалось max_tokens токенов
+            payload["max_tokens"] = max_tokens + self.REASONING_MAX_TOKENS
+            payload["reasoning"] = {
+                "max_tokens": self.REASONING_MAX_TOKENS,
+                "exclude": True
+            }
+        
+        return payload
+    
+    def _complete_document(self, messages: List[Dict], model: str = None,
+                           first_byte_event: threading.Event = None,
+                           cancel_event: threading.Event = None) -> Optional[str]:
+        """Запрос документа с автоматическим продолжением обрезанного ответа"""
+        content = self._complete_text(messages, model, first_byte_event, cancel_event)
+        if content is None:
+            return None
         
-        ТЗ: {task_description}
+        # Очистка вывода
+        with get_tracer().span("ai.clean_output"):
+            cleaned_code = self._clean_ai_output(content)
+        return cleaned_code
+    
+    def _complete_text(self, messages: List[Dict], model: str = None,
+                       first_byte_event: threading.Event = None,
+                       cancel_event: threading.Event = None,
+                       is_truncated: Callable[[str, Optional[str]], bool] = None) -> Optional[str]:
+        """Сырой текст ответа с продолжениями, пока is_truncated (по умолчанию - проверка HTML) видит обрыв"""
+        is_truncated = is_truncated or self._is_truncated
         
-        Требования к коду:
-        - Современный HTML5 с семантической разметкой
-        - CSS3 с Flexbox/Grid, адаптивный дизайн
-        - Минимальный JavaScript только по необходимости
-        - Красивый современный UI
-        - Mobile-friendly верстка
+        # Стрим позволяет отдельно контролировать время до первого байта
+        completion = self._stream_completion(messages, model, first_byte_event, cancel_event)
+        if completion is None:
+            return None
         
-        Верни ТОЛЬКО готовый HTML файл с CSS внутри <style> и JS внутри <script>.
-        Не добавляй пояснения, комментарии или markdown разметку.
-        """
+        content, finish_reason = completion
         
-        headers = {
+        continuations = 0
+        while continuations < self.MAX_CONTINUATIONS and is_truncated(content, finish_reason):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            continuations += 1
+            logger.info(f"Ответ обрезан (finish_reason={finish_reason}), запрашиваем продолжение #{continuations}")
+            
+            continuation_messages = messages + [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": self.CONTINUE_PROMPT}
+            ]
+            completion = self._request_completion(continuation_messages, model=model)
+            if completion is None:
+                break
+            
+            part, finish_reason = completion
+            if not part.strip():
+                break
+            content = self._stitch(content, part)
+        
+        return content
+    
+    def _is_truncated(self, content: str, finish_reason: Optional[str]) -> bool:
+        """Документ обрезан по лимиту токенов или оборван: нет </html>, открыт тег, script или style"""
+        if finish_reason == 'length':
+            return True
+        return validate_html_document(scan_html(content)).truncated
+    
+    def _stitch(self, previous: str, continuation: str) -> str:
+        """Склейка частей ответа: убираем markdown обертку и повтор хвоста предыдущей части"""
+        part = continuation.lstrip('\n')
+        if part.startswith('```'):
+            # Модель снова открыла блок кода - отбрасываем строку с ```
+            newline = part.find('\n')
+            part = part[newline + 1:] if newline != -1 else ""
+        
+        # Модель часто повторяет хвост предыдущей части. Короткие совпадения не трогаем,
+        # иначе "hel" + "lo" превратится в "helo"
+        max_overlap = min(len(previous), len(part), self.STITCH_OVERLAP)
+        for size in range(max_overlap, self.STITCH_MIN_OVERLAP - 1, -1):
+            if previous.endswith(part[:size]):
+                part = part[size:]
+                break
+        
+        return previous + part
+    
+    def _headers(self) -> Dict:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "HTTP-Referer": "https://github.com",
             "X-Title": "AI Code Generator"
         }
+    
+    def _stream_completion(self, messages: List[Dict], model: str = None,
+                           first_byte_event: threading.Event = None,
+                           cancel_event: threading.Event = None) -> Optional[Tuple[str, Optional[str]]]:
+        """Стриминговый запрос: отмечает первый байт и прерывается по cancel_event"""
+        model = model or self.model
+        payload = self._build_payload(messages, model=model)
+        payload["stream"] = True
+        first_byte_deadline, total_deadline = self._deadlines(model)
         
-        payload = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "max_tokens": 4000,
-            "temperature": 0.7,
-            "top_p": 0.9,
-        }
+        started = time.monotonic()
+        first_byte_at = None
+        try:
+            logger.info(f"Отправляем стриминговый запрос к AI ({model}), дедлайны {first_byte_deadline:.0f}/{total_deadline:.0f} с...")
+            with get_tracer().span("ai.stream_request", model=model) as span:
+                with requests.post(self.api_url, json=payload, headers=self._headers(),
+                                   timeout=(self.CONNECT_TIMEOUT, first_byte_deadline), stream=True) as response:
+                    if span is not None:
+                        span.set_attribute('http.status_code', response.status_code)
+                    
+                    if response.status_code != 200:
+                        logger.error(f"Ошибка API ({model}): {response.status_code} - {response.text}")
+                        return None
+                    
+                    response.encoding = 'utf-8'
+                    parts = []
+                    finish_reason = None
+                    for line in response.iter_lines(decode_unicode=True):
+                        if cancel_event is not None and cancel_event.is_set():
+                            logger.info(f"Запрос к {model} отменен")
+                            return None
+                        
+                        # Служебные комментарии SSE приходят и до первого токена, поэтому
+                        # дедлайны проверяем сами, а не полагаемся только на таймаут сокета
+                        elapsed = time.monotonic() - started
+                        if first_byte_at is None and elapsed > first_byte_deadline:
+                            logger.error(f"Нет первого байта от {model} за {first_byte_deadline:.0f} с")
+                            return None
+                        if elapsed > total_deadline:
+                            logger.error(f"Ответ от {model} не уложился в {total_deadline:.0f} с")
+                            return None
+                        # Пропускаем пустые строки и служебные комментарии SSE
+                        if not line or not line.startswith('data:'):
+                            continue
+                        data = line[5:].strip()
+                        if data == '[DONE]':
+                            break
+                        
+                        chunk = json.loads(data)
+                        if 'error' in chunk:
+                            logger.error(f"Ошибка API ({model}) в стриме: {chunk['error']}")
+                            return None
+                        if not chunk.get('choices'):
+                            continue
+                        
+                        choice = chunk['choices'][0]
+                        delta = (choice.get('delta') or {}).get('content')
+                        if delta:
+                            if first_byte_at is None:
+                                first_byte_at = time.monotonic()
+                                self.latency_tracker.record(model, 'first_byte', first_byte_at - started)
+                                if first_byte_event is not None:
+                                    first_byte_event.set()
+                            parts.append(delta)
+                        finish_reason = choice.get('finish_reason') or finish_reason
+                    
+                    content = "".join(parts)
+                    self.latency_tracker.record(model, 'total', time.monotonic() - started)
+                    logger.info(f"Стрим от {model} завершен: {len(content)} символов, finish_reason={finish_reason}")
+                    return content, finish_reason
+                
+        except requests.exceptions.Timeout:
+            logger.error(f"Таймаут стримингового запроса к {model}")
+            return None
+        except requests.exceptions.ConnectionError:
+            logger.error(f"Ошибка соединения с API ({model})")
+            return None
+        except Exception as e:
+            logger.error(f"Неожиданная ошибка стрима ({model}): {e}")
+            return None
+    
+    def _request_completion(self, messages: List[Dict], max_tokens: int = None,
+                            model: str = None, response_format: Dict = None) -> Optional[Tuple[str, Optional[str]]]:
+        """Один запрос к OpenRouter. Возвращает (content, finish_reason) или None при ошибке"""
+        headers = self._headers()
+        model = model or self.model
+        
+        payload = self._build_payload(messages, max_tokens, model, response_format)
+        _, total_deadline = self._deadlines(model)
         
         try:
             logger.info("Отправляем запрос к AI...")
-            response = requests.post(self.api_url, json=payload, headers=headers, timeout=120)
+            with get_tracer().span("ai.request", model=model) as span:
+                response = requests.post(self.api_url, json=payload, headers=headers,
+                                         timeout=(self.CONNECT_TIMEOUT, total_deadline))
+                if span is not None:
+                    span.set_attribute('http.status_code', response.status_code)
             
             logger.info(f"Статус ответа: {response.status_code}")
             
@@ -80,12 +583,15 @@ class AIClient:
                 logger.info("Ответ получен успешно")
                 
                 if 'choices' in result and len(result['choices']) > 0:
-                    content = result['choices'][0]['message']['content']
-                    logger.info(f"Длина ответа: {len(content)} символов")
-                    
-                    # Очистка вывода
-                    cleaned_code = self._clean_ai_output(content)
-                    return cleaned_code
+                    choice = result['choices'][0]
+                    content = choice['message'].get('content') or ""
+                    finish_reason = choice.get('finish_reason')
+                    usage = result.get('usage', {})
+                    logger.info(
+                        f"Длина ответа: {len(content)} символов, finish_reason={finish_reason}, "
+                        f"токены: {usage.get('prompt_tokens')}/{usage.get('completion_tokens')}"
+                    )
+                    return content, finish_reason
                 else:
                     logger.error("Неожиданный формат ответа от API")
                     logger.debug(f"Полный ответ: {json.dumps(result, indent=2)}")
@@ -103,7 +609,7 @@ class AIClient:
                 return None
                 
         except requests.exceptions.Timeout:
-            logger.error("Таймаут запроса к AI API (120 секунд)")
+            logger.error(f"Таймаут запроса к AI API ({total_deadline:.0f} секунд)")
             return None
         except requests.exceptions.ConnectionError:
             logger.error("Ошибка соединения с API")
@@ -116,29 +622,7 @@ class AIClient:
         """Очистка вывода AI от лишних элементов"""
         if not text:
             return ""
-            
-        # Удаляем markdown коды
-        if '```html' in text:
-            text = text.split('```html')[1].split('```')[0]
-        elif '```' in text:
-            parts = text.split('```')
-            if len(parts) >= 2:
-                text = parts[1]  # Берем содержимое между первыми ```
-        
-        # Удаляем пояснения до начала кода
-        lines = text.split('\n')
-        code_lines = []
-        code_started = False
-        
-        for line in lines:
-            # Ищем начало HTML кода
-            if any(tag in line.lower() for tag in ['<!doctype', '<html', '<!DOCTYPE']):
-                code_started = True
-            
-            if code_started or line.strip().startswith('<'):
-                code_lines.append(line)
-        
-        result = '\n'.join(code_lines).strip()
         
-        # Если после очистки пусто, возвращаем оригинал
-        return result if result else text
+        # Один проход: markdown блоки, рассуждения, пояснения до кода и классификация структуры.
+        # Возвращается ScannedHtml, поэтому prepare_html не сканирует текст повторно
+        return scan_html(text)
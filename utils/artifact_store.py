@@ -0,0 +1,377 @@
+import os
+import gzip
+import json
+import atexit
+import asyncio
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Журнал артефактов директории: одна JSON строка на каждую сохраненную версию.
+# Расширение не .json, чтобы старые сканеры метаданных (*.json) не принимали его за артефакт
+LOG_FILENAME = "artifacts.jsonl"
+
+# Общее хранилище тел страниц, адресуемое по SHA-256 содержимого
+DEFAULT_BLOB_DIR = os.path.join("generated_codes", "blobs")
+
+_EXTENSIONS = {'zstd': '.html.zst', 'gzip': '.html.gz'}
+
+
+class ArtifactHandle(NamedTuple):
+    """Ссылка на сохраненный артефакт: по ней можно получить HTML без сканирования директорий"""
+    codes_dir: str
+    task_id: str
+    path: str  # блоб или старый несжатый task_*.html
+    encoding: str  # zstd | gzip | '' для старых файлов
+    generated_at: str
+    digest: str = ''
+
+
+class _CodesIndex:
+    """Состояние журнала одной директории в памяти"""
+
+    def __init__(self):
+        self.records: List[Tuple[Dict, ArtifactHandle]] = []
+        self.latest: Dict[str, Tuple[Dict, ArtifactHandle]] = {}
+        self.offset = 0
+
+    def add(self, metadata: Dict, handle: ArtifactHandle):
+        self.records.append((metadata, handle))
+        current = self.latest.get(handle.task_id)
+        if current is None or handle.generated_at >= current[1].generated_at:
+            self.latest[handle.task_id] = (metadata, handle)
+
+
+class ArtifactStore:
+    """Сохранение сгенерированных страниц и метаданных
+
+    Тела страниц сжимаются (zstd, если установлен zstandard, иначе gzip) и хранятся один раз
+    по SHA-256 содержимого, поэтому повторные примеры и одинаковые перегенерации не занимают
+    места. Метаданные всех версий директории дописываются в один журнал artifacts.jsonl.
+    Старые пары task_*.html + task_*.json читаются прозрачно.
+
+    Файлы пишутся во временный файл, синхронизируются и переименовываются, поэтому ни читатели,
+    ни восстановление после сбоя не видят частично записанный файл. fsync журнала и директорий
+    выполняется пачками: после fsync_batch записей или по таймеру через fsync_interval секунд
+    после первой несинхронизированной записи.
+    Существующий блоб перед повторным использованием сверяется с digest - блоб,
+    оборванный сбоем до fsync, перезаписывается.
+    Асинхронные методы выполняют запись в пуле потоков, не блокируя event loop.
+    """
+
+    def __init__(self, blob_dir: Optional[str] = None, compression: Optional[str] = None,
+                 fsync_batch: int = 16, fsync_interval: float = 2.0):
+        self.blob_dir = blob_dir or os.getenv('ARTIFACT_BLOB_DIR', DEFAULT_BLOB_DIR)
+        compression = (compression or os.getenv('ARTIFACT_COMPRESSION', '')).lower()
+        if compression not in _EXTENSIONS:
+            compression = 'zstd' if zstandard is not None else 'gzip'
+        if compression == 'zstd' and zstandard is None:
+            logger.warning("zstandard не установлен, блобы сжимаются gzip")
+            compression = 'gzip'
+        self.compression = compression
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self._indexes: Dict[str, _CodesIndex] = {}
+        self._pending_sync: List[str] = []
+        self._sync_timer: Optional[threading.Timer] = None
+        self._verified_blobs = set()  # блобы, уже сверенные с digest в этом процессе
+        self._lock = threading.Lock()
+
+    # --- запись ---
+
+    def write_bytes(self, path: str, data: bytes):
+        """Атомарная запись файла"""
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            # Данные на диске до переименования: после сбоя под именем не окажется пустого файла
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        self._schedule_sync(path)
+
+    def write_text(self, path: str, content: str):
+        self.write_bytes(path, content.encode('utf-8'))
+
+    def write_json(self, path: str, data, indent: Optional[int] = None):
+        """Атомарная запись JSON"""
+        self.write_text(path, json.dumps(data, ensure_ascii=False, indent=indent))
+
+    async def write_json_async(self, path: str, data, indent: Optional[int] = None):
+        await asyncio.to_thread(self.write_json, path, data, indent)
+
+    def put_blob(self, content: str) -> Tuple[str, str, str]:
+        """Сохранение тела страницы, возвращает (digest, path, encoding). Повторы не записываются"""
+        data = content.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+
+        existing = self._find_blob(digest)
+        if existing:
+            return (digest,) + existing
+
+        path = self._blob_path(digest, self.compression)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self.compression == 'zstd':
+            compressed = zstandard.ZstdCompressor(level=10).compress(data)
+        else:
+            compressed = gzip.compress(data, compresslevel=6)
+        self.write_bytes(path, compressed)
+        with self._lock:
+            self._verified_blobs.add(digest)
+        return digest, path, self.compression
+
+    def put_files(self, files: Dict[str, str]) -> Dict[str, Dict]:
+        """Файлы многофайлового проекта в блобы. Манифест {имя: {blob, encoding}} пишется в метаданные;
+        неизмененные между версиями файлы не записываются повторно"""
+        manifest = {}
+        for name, content in files.items():
+            digest, _, encoding = self.put_blob(content)
+            manifest[name] = {'blob': digest, 'encoding': encoding}
+        return manifest
+
+    def save(self, codes_dir: str, task: Dict, html_content: str, extra_metadata: Dict = None) -> ArtifactHandle:
+        """Сохранение тела в хранилище и запись метаданных в журнал директории"""
+        os.makedirs(codes_dir, exist_ok=True)
+        digest, blob_path, encoding = self.put_blob(html_content)
+
+        metadata = {
+            'task_id': task['id'],
+            'task_description': task.get('description', ''),
+            'task_summary': task.get('summary', ''),
+            'task_type': task.get('type', 'unknown'),
+            'generated_at': datetime.now().isoformat(),
+            'blob': digest,
+            'encoding': encoding,
+            'size': len(html_content),
+        }
+        metadata.update(extra_metadata or {})
+
+        log_path = os.path.join(codes_dir, LOG_FILENAME)
+        line = (json.dumps(metadata, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._lock:
+            # Одна запись в режиме append: строки разных процессов не перемешиваются
+            with open(log_path, 'ab') as f:
+                f.write(line)
+        self._schedule_sync(log_path)
+        self._refresh(codes_dir)
+        self._maybe_sync()
+
+        return ArtifactHandle(codes_dir, task['id'], blob_path, encoding, metadata['generated_at'], digest)
+
+    async def save_async(self, codes_dir: str, task: Dict, html_content: str, extra_metadata: Dict = None) -> ArtifactHandle:
+        return await asyncio.to_thread(self.save, codes_dir, task, html_content, extra_metadata)
+
+    # --- чтение ---
+
+    def history(self, codes_dir: str) -> List[Tuple[Dict, ArtifactHandle]]:
+        """Все сохраненные версии директории в порядке записи"""
+        return list(self._refresh(codes_dir).records)
+
+    def latest_entries(self, codes_dir: str) -> List[Tuple[Dict, ArtifactHandle]]:
+        """Последняя версия каждой задачи директории в порядке генерации"""
+        return sorted(self._refresh(codes_dir).latest.values(), key=lambda entry: entry[1].generated_at)
+
+    def index(self, codes_dir: str) -> Dict[str, Dict]:
+        """Последние метаданные по каждой задаче директории (task_id -> metadata)"""
+        return {task_id: metadata for task_id, (metadata, _) in self._refresh(codes_dir).latest.items()}
+
+    def latest(self, codes_dir: str, task_id: str) -> Optional[ArtifactHandle]:
+        entry = self._refresh(codes_dir).latest.get(task_id)
+        return entry[1] if entry else None
+
+    def read_html(self, handle: ArtifactHandle) -> Optional[str]:
+        try:
+            with open(handle.path, 'rb') as f:
+                data = f.read()
+            if handle.encoding == 'zstd':
+                if zstandard is None:
+                    raise OSError("для чтения блоба нужен пакет zstandard")
+                data = zstandard.ZstdDecompressor().decompress(data)
+            elif handle.encoding == 'gzip':
+                data = gzip.decompress(data)
+            return data.decode('utf-8')
+        except OSError as e:
+            logger.warning(f"Не удалось прочитать артефакт {handle.path}: {e}")
+            return None
+
+    async def read_html_async(self, handle: ArtifactHandle) -> Optional[str]:
+        return await asyncio.to_thread(self.read_html, handle)
+
+    def read_files(self, manifest: Dict[str, Dict]) -> Optional[Dict[str, str]]:
+        """Файлы проекта по манифесту put_files. None, если хотя бы один блоб недоступен"""
+        files = {}
+        for name, entry in manifest.items():
+            digest, encoding = entry['blob'], entry.get('encoding', 'gzip')
+            content = self.read_html(ArtifactHandle('', name, self._blob_path(digest, encoding), encoding, '', digest))
+            if content is None:
+                return None
+            files[name] = content
+        return files
+
+    # --- fsync ---
+
+    def flush(self):
+        """Принудительный fsync всех записанных, но еще не синхронизированных файлов"""
+        with self._lock:
+            paths = self._pending_sync
+            self._pending_sync = []
+        directories = set()
+        for path in set(paths):
+            try:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                directories.add(os.path.dirname(path) or ".")
+            except OSError:
+                # Файл мог быть заменен более новой версией
+                continue
+        for directory in directories:
+            try:
+                fd = os.open(directory, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError:
+                continue
+
+    def _schedule_sync(self, path: str):
+        with self._lock:
+            if not self._pending_sync:
+                # Первая запись пачки - таймер гарантирует fsync, даже если новых сохранений не будет
+                self._sync_timer = threading.Timer(self.fsync_interval, self.flush)
+                self._sync_timer.daemon = True
+                self._sync_timer.start()
+            self._pending_sync.append(path)
+
+    def _maybe_sync(self):
+        with self._lock:
+            due = len(self._pending_sync) >= self.fsync_batch
+        if due:
+            self.flush()
+
+    # --- блобы ---
+
+    def _blob_path(self, digest: str, encoding: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest + _EXTENSIONS[encoding])
+
+    def _find_blob(self, digest: str) -> Optional[Tuple[str, str]]:
+        for encoding in (self.compression,) + tuple(e for e in _EXTENSIONS if e != self.compression):
+            path = self._blob_path(digest, encoding)
+            if os.path.exists(path) and self._blob_intact(digest, path, encoding):
+                return path, encoding
+        return None
+
+    def _blob_intact(self, digest: str, path: str, encoding: str) -> bool:
+        """Блоб читается и совпадает с digest (после сбоя до fsync файл может быть пустым или обрезанным)"""
+        with self._lock:
+            if digest in self._verified_blobs:
+                return True
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if encoding == 'zstd':
+                if zstandard is None:
+                    return False
+                data = zstandard.ZstdDecompressor().decompress(data)
+            else:
+                data = gzip.decompress(data)
+        except Exception:
+            data = None
+        if data is None or hashlib.sha256(data).hexdigest() != digest:
+            logger.warning(f"Блоб {path} поврежден и будет перезаписан")
+            return False
+        with self._lock:
+            self._verified_blobs.add(digest)
+        return True
+
+    # --- журнал ---
+
+    def _refresh(self, codes_dir: str) -> _CodesIndex:
+        """Дочитывает журнал с последней позиции: записи других процессов подхватываются без полного перечитывания"""
+        with self._lock:
+            codes_index = self._indexes.get(codes_dir)
+            if codes_index is None:
+                codes_index = _CodesIndex()
+                self._load_legacy(codes_dir, codes_index)
+                self._indexes[codes_dir] = codes_index
+
+            log_path = os.path.join(codes_dir, LOG_FILENAME)
+            try:
+                if os.path.getsize(log_path) <= codes_index.offset:
+                    return codes_index
+                with open(log_path, 'rb') as f:
+                    f.seek(codes_index.offset)
+                    data = f.read()
+            except OSError:
+                return codes_index
+
+            # Недописанную последнюю строку оставляем до следующего чтения
+            complete = data[:data.rfind(b'\n') + 1]
+            codes_index.offset += len(complete)
+            for line in complete.splitlines():
+                try:
+                    metadata = json.loads(line)
+                    digest = metadata['blob']
+                    encoding = metadata.get('encoding', 'gzip')
+                    handle = ArtifactHandle(
+                        codes_dir, metadata['task_id'], self._blob_path(digest, encoding),
+                        encoding, metadata.get('generated_at', ''), digest
+                    )
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"Пропущена поврежденная запись журнала {log_path}: {e}")
+                    continue
+                codes_index.add(metadata, handle)
+            return codes_index
+
+    def _load_legacy(self, codes_dir: str, codes_index: _CodesIndex):
+        """Старые артефакты: отдельные task_*.html и task_*.json"""
+        if not os.path.isdir(codes_dir):
+            return
+        for filename in sorted(os.listdir(codes_dir)):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(codes_dir, filename), 'r', encoding='utf-8') as f:
+                    metadata = json.load(f)
+            except Exception:
+                continue
+            task_id = metadata.get('task_id')
+            html_file = metadata.get('html_file')
+            if not task_id or not html_file or not os.path.exists(os.path.join(codes_dir, html_file)):
+                continue
+            metadata['metadata_file'] = filename
+            handle = ArtifactHandle(
+                codes_dir, task_id, os.path.join(codes_dir, html_file), '', metadata.get('generated_at', '')
+            )
+            codes_index.add(metadata, handle)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    """Общее хранилище процесса, настраивается через переменные окружения
+
+    ARTIFACT_BLOB_DIR: директория блобов (по умолчанию generated_codes/blobs)
+    ARTIFACT_COMPRESSION: zstd | gzip (по умолчанию zstd, если установлен zstandard)
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+            # Streamlit не вызывает flush при остановке - досинхронизируем последнюю пачку при выходе
+            atexit.register(_store.flush)
+        return _store
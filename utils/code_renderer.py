@@ -1,102 +1,118 @@
-import re
+import os
+import textwrap
 from typing import Optional
+from utils.html_scanner import ScannedHtml, scan_html
+from utils.html_minifier import minify_html
+from utils.html_validator import ValidationReport, validate_html_document
+
+# Шаблоны без отступов исходного кода - в сохраненный файл не попадают лишние пробелы
+_TEMPLATE_HEAD, _TEMPLATE_TAIL = textwrap.dedent("""\
+    <!DOCTYPE html>
+    <html lang="ru">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>AI Generated Code</title>
+        <style>
+            /* Базовые стили для обеспечения читаемости */
+            body {
+                margin: 0;
+                padding: 20px;
+                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                min-height: 100vh;
+                box-sizing: border-box;
+            }
+            * {
+                box-sizing: border-box;
+            }
+        </style>
+    </head>
+    <body>
+    {content}
+    </body>
+    </html>
+    """).split("{content}")
+
+_FALLBACK_HTML = textwrap.dedent("""\
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Ошибка генерации</title>
+        <style>
+            body {
+                display: flex;
+                justify-content: center;
+                align-items: center;
+                height: 100vh;
+                background: #f0f0f0;
+                font-family: Arial, sans-serif;
+            }
+            .error {
+                background: white;
+                padding: 2rem;
+                border-radius: 10px;
+                text-align: center;
+            }
+        </style>
+    </head>
+    <body>
+        <div class="error">
+            <h2>❌ Не удалось сгенерировать код</h2>
+            <p>Попробуйте перегенерировать или изменить описание задачи</p>
+        </div>
+    </body>
+    </html>
+    """)
 
 class CodeRenderer:
+    def __init__(self, minify: Optional[bool] = None):
+        # HTML_MINIFY=0 отключает минификацию, например для отладки промптов
+        self.minify = minify if minify is not None else os.getenv('HTML_MINIFY', '1') != '0'
+    
     def prepare_html(self, raw_code: str) -> str:
         """Подготовка HTML для рендеринга с улучшенной обработкой"""
         
         if not raw_code:
             return self._get_fallback_html()
         
-        # Очищаем код от возможных артефактов
+        # Очищаем код от возможных артефактов и проверяем, есть ли полная HTML структура
         cleaned_code = self._clean_html_code(raw_code)
         
-        # Проверяем, есть ли полная HTML структура
-        has_doctype = '<!DOCTYPE' in cleaned_code.upper()
-        has_html = '<html' in cleaned_code.lower()
-        has_body = '<body' in cleaned_code.lower()
-        
-        if has_doctype and has_html and has_body:
+        if cleaned_code.is_full_document:
             # Это полный HTML документ
-            return cleaned_code
+            html = cleaned_code
         else:
             # Добавляем базовую структуру
-            return self._wrap_in_html_template(cleaned_code)
-    
-    def _clean_html_code(self, code: str) -> str:
-        """Очистка HTML кода от common issues"""
-        # Удаляем лишние backticks
-        code = re.sub(r'^```html\s*|\s*```$', '', code, flags=re.IGNORECASE)
-        code = re.sub(r'^```\s*|\s*```$', '', code)
+            html = self._wrap_in_html_template(cleaned_code)
         
-        # Удаляем markdown заголовки
-        code = re.sub(r'^#+\s*.+$', '', code, flags=re.MULTILINE)
-        
-        return code.strip()
+        return self.postprocess(html)
+    
+    def postprocess(self, html: str) -> str:
+        """Финальная обработка перед сохранением и отправкой: минификация HTML, CSS и JS"""
+        if not self.minify:
+            return html
+        return minify_html(html)
+    
+    def _clean_html_code(self, code: str) -> ScannedHtml:
+        """Очистка HTML кода от common issues (backticks, markdown заголовки, пояснения)"""
+        # Код из AIClient уже просканирован - повторный проход не нужен
+        if isinstance(code, ScannedHtml):
+            return code
+        return scan_html(code)
     
     def _wrap_in_html_template(self, content: str) -> str:
         """Обертывание контента в полную HTML структуру"""
-        return f"""
-        <!DOCTYPE html>
-        <html lang="ru">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>AI Generated Code</title>
-            <style>
-                /* Базовые стили для обеспечения читаемости */
-                body {{
-                    margin: 0;
-                    padding: 20px;
-                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    min-height: 100vh;
-                    box-sizing: border-box;
-                }}
-                * {{
-                    box-sizing: border-box;
-                }}
-            </style>
-        </head>
-        <body>
-            {content}
-        </body>
-        </html>
-        """
+        return _TEMPLATE_HEAD + content + _TEMPLATE_TAIL
     
     def _get_fallback_html(self) -> str:
         """HTML для случая, когда код не сгенерировался"""
-        return """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Ошибка генерации</title>
-            <style>
-                body { 
-                    display: flex;
-                    justify-content: center;
-                    align-items: center;
-                    height: 100vh;
-                    background: #f0f0f0;
-                    font-family: Arial, sans-serif;
-                }
-                .error { 
-                    background: white;
-                    padding: 2rem;
-                    border-radius: 10px;
-                    text-align: center;
-                }
-            </style>
-        </head>
-        <body>
-            <div class="error">
-                <h2>❌ Не удалось сгенерировать код</h2>
-                <p>Попробуйте перегенерировать или изменить описание задачи</p>
-            </div>
-        </body>
-        </html>
-        """
+        return _FALLBACK_HTML
+    
+    def inspect_html(self, html: str) -> ValidationReport:
+        """Структурная проверка документа с оценкой качества"""
+        return validate_html_document(html)
     
     def validate_html(self, html: str) -> bool:
-        """Базовая валидация HTML"""
-        return bool(html and len(html) > 50)  # Простая проверка на минимальную длину
\ No newline at end of file
+        """Документ целый: теги сбалансированы, script/style закрыты, body не пустой, нет обрыва"""
+        return bool(html) and self.inspect_html(html).acceptable
\ No newline at end of file
@@ -0,0 +1,115 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ExampleWarmer:
+    """Фоновая подготовка готовых вариантов для примеров
+
+    Для каждого описания держит до pool_size сгенерированных вариантов. Пул пополняется
+    в фоне, только когда нет идущих пользовательских генераций и с окончания последней
+    прошло idle_seconds, и не чаще,
+    чем раз в min_interval секунд, чтобы не упираться в лимиты бесплатных моделей.
+    Каждый вариант выдается один раз, поэтому повторные нажатия получают новый результат.
+    """
+
+    def __init__(self, ai_client, code_renderer, descriptions: List[str],
+                 pool_size: int = None, min_interval: float = None, idle_seconds: float = 10.0):
+        self.ai_client = ai_client
+        self.code_renderer = code_renderer
+        self.pool_size = pool_size if pool_size is not None else int(os.getenv('EXAMPLE_WARMER_POOL_SIZE', 2))
+        self.min_interval = min_interval if min_interval is not None else float(os.getenv('EXAMPLE_WARMER_INTERVAL', 30))
+        self.idle_seconds = idle_seconds
+        self._pools: Dict[str, deque] = {description: deque() for description in descriptions}
+        self._lock = threading.Lock()
+        self._last_activity = 0.0
+        self._active = 0  # пользовательские генерации, идущие прямо сейчас
+        self._last_warm = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.pool_size > 0
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name="example-warmer", daemon=True)
+        self._thread.start()
+        logger.info(f"Прогрев примеров запущен: {len(self._pools)} примеров по {self.pool_size} вариантов")
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def touch(self):
+        """Отметка пользовательской генерации - фоновый прогрев уступает ей API"""
+        self._last_activity = time.monotonic()
+
+    @contextmanager
+    def generating(self):
+        """Пользовательская генерация: пока она идет, прогрев не запускается"""
+        with self._lock:
+            self._active += 1
+        self.touch()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+            self.touch()
+
+    @property
+    def busy(self) -> bool:
+        with self._lock:
+            return self._active > 0
+
+    def take(self, description: str) -> Optional[Tuple[str, str]]:
+        """Готовый вариант (generated_code, html_content) или None, если пул пуст"""
+        with self._lock:
+            pool = self._pools.get(description)
+            if not pool:
+                return None
+            return pool.popleft()
+
+    def available(self, description: str) -> int:
+        with self._lock:
+            return len(self._pools.get(description, ()))
+
+    def _next_description(self) -> Optional[str]:
+        with self._lock:
+            candidates = [(len(pool), d) for d, pool in self._pools.items() if len(pool) < self.pool_size]
+        if not candidates:
+            return None
+        return min(candidates)[1]
+
+    def _run(self):
+        while not self._stop.wait(1.0):
+            now = time.monotonic()
+            if self.busy or now - self._last_activity < self.idle_seconds or now - self._last_warm < self.min_interval:
+                continue
+
+            description = self._next_description()
+            if description is None:
+                continue
+
+            self._last_warm = now
+            try:
+                generated_code = self.ai_client.generate_code(description)
+                if not generated_code:
+                    continue
+                html_content = self.code_renderer.prepare_html(generated_code)
+                if not self.code_renderer.validate_html(html_content):
+                    continue
+                with self._lock:
+                    self._pools[description].append((generated_code, html_content))
+                logger.info(f"Подготовлен вариант примера: {description[:40]}...")
+            except Exception as e:
+                logger.warning(f"Ошибка прогрева примера: {e}")
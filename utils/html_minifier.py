@@ -0,0 +1,210 @@
+import re
+from typing import List
+
+# Элементы, содержимое которых обрабатывается отдельно или не трогается
+_RAW_ELEMENT = re.compile(r'<(script|style|pre|textarea)\b([^>]*)>(.*?)</\1\s*>', re.IGNORECASE | re.DOTALL)
+# Комментарии, кроме условных <!--[if IE]> и пустых маркеров <!---->
+_HTML_COMMENT = re.compile(r'<!--(?!\[if|\s*\[endif|>)(?:.*?)-->', re.DOTALL)
+_SCRIPT_TYPE = re.compile(r'\btype\s*=\s*["\']?([^"\'\s>]+)', re.IGNORECASE)
+_JS_TYPES = {'', 'text/javascript', 'application/javascript', 'module', 'text/babel'}
+
+_CSS_TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/|\s+|[^"\'/\s]+|/', re.DOTALL)
+_CSS_PUNCTUATION = set('{};,')
+
+# После этих символов / начинает регулярное выражение, а не деление
+_REGEX_PREFIX = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'delete', 'void', 'throw', 'new'}
+
+
+def _strip_lines(text: str) -> str:
+    """Без отступов, концевых пробелов и пустых строк. Переводы строк сохраняются"""
+    return "\n".join(line.strip() for line in text.split('\n') if line.strip())
+
+
+def minify_css(css: str) -> str:
+    """CSS без комментариев и лишних пробелов; строки в кавычках не меняются"""
+    parts: List[str] = []
+    pending_space = False
+    for match in _CSS_TOKEN.finditer(css):
+        token = match.group(0)
+        if token.startswith('/*'):
+            pending_space = True
+            continue
+        if token.isspace():
+            pending_space = True
+            continue
+        if pending_space and parts and parts[-1][-1] not in _CSS_PUNCTUATION and token[0] not in _CSS_PUNCTUATION:
+            parts.append(' ')
+        pending_space = False
+        parts.append(token)
+    return "".join(parts)
+
+
+def minify_js(js: str) -> str:
+    """Консервативная очистка JavaScript
+
+    Удаляет комментарии, отступы и пустые строки, но оставляет переводы строк,
+    поэтому автоматическая расстановка точек с запятой работает как в исходнике.
+    Строки, шаблонные строки и регулярные выражения не меняются. Если разбор
+    не уверен (незакрытая строка или комментарий), возвращается исходный код.
+    """
+    out: List[str] = []
+    line: List[str] = []
+    i = 0
+    n = len(js)
+    last = ''  # последний значимый токен - чтобы отличить регулярное выражение от деления
+
+    def end_line():
+        text = "".join(line).strip()
+        if text:
+            out.append(text)
+        line.clear()
+
+    while i < n:
+        char = js[i]
+        if char == '\n':
+            end_line()
+            i += 1
+        elif char in '"\'':
+            end = i + 1
+            while end < n and js[end] != char:
+                if js[end] == '\\':
+                    end += 1
+                elif js[end] == '\n':
+                    return js
+                end += 1
+            if end >= n:
+                return js
+            line.append(js[i:end + 1])
+            last = char
+            i = end + 1
+        elif char == '`':
+            end = _template_end(js, i + 1)
+            if end < 0:
+                return js
+            # Шаблонная строка может быть многострочной - переносим ее целиком
+            line.append(js[i:end + 1])
+            last = char
+            i = end + 1
+        elif js.startswith('//', i):
+            end = js.find('\n', i)
+            i = n if end < 0 else end
+        elif js.startswith('/*', i):
+            end = js.find('*/', i + 2)
+            if end < 0:
+                return js
+            if '\n' in js[i:end]:
+                end_line()
+            else:
+                line.append(' ')
+            i = end + 2
+        elif char == '/' and (not last or last in _REGEX_PREFIX or last in _REGEX_KEYWORDS):
+            end = i + 1
+            in_class = False
+            while end < n and (js[end] != '/' or in_class):
+                if js[end] == '\\':
+                    end += 1
+                elif js[end] == '[':
+                    in_class = True
+                elif js[end] == ']':
+                    in_class = False
+                elif js[end] == '\n':
+                    return js
+                end += 1
+            if end >= n:
+                return js
+            while end + 1 < n and (js[end + 1].isalnum()):
+                end += 1
+            line.append(js[i:end + 1])
+            last = ')'
+            i = end + 1
+        elif char.isspace():
+            if line and not line[-1].endswith(' '):
+                line.append(' ')
+            i += 1
+        else:
+            end = i + 1
+            if char.isalnum() or char in '_$':
+                while end < n and (js[end].isalnum() or js[end] in '_$'):
+                    end += 1
+            line.append(js[i:end])
+            last = js[i:end]
+            i = end
+    end_line()
+    return "\n".join(out)
+
+
+def _template_end(js: str, start: int) -> int:
+    """Позиция закрывающего ` шаблонной строки с учетом ${...}, -1 если не найдена"""
+    i = start
+    n = len(js)
+    while i < n:
+        char = js[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '`':
+            return i
+        if js.startswith('${', i):
+            depth = 1
+            i += 2
+            while i < n and depth:
+                if js[i] == '{':
+                    depth += 1
+                elif js[i] == '}':
+                    depth -= 1
+                elif js[i] == '`':
+                    nested = _template_end(js, i + 1)
+                    if nested < 0:
+                        return -1
+                    i = nested
+                elif js[i] in '"\'':
+                    quote = js[i]
+                    i += 1
+                    while i < n and js[i] != quote:
+                        i += 2 if js[i] == '\\' else 1
+                i += 1
+            continue
+        i += 1
+    return -1
+
+
+def _minify_markup(markup: str) -> str:
+    markup = _HTML_COMMENT.sub('', markup)
+    stripped = _strip_lines(markup)
+    if not stripped:
+        # Пробел между строчными элементами значим - оставляем один перевод строки
+        return '\n' if markup and markup.isspace() else ''
+    # Пробел на границе с соседним элементом тоже сохраняем
+    if markup[0].isspace():
+        stripped = '\n' + stripped
+    if markup[-1].isspace():
+        stripped += '\n'
+    return stripped
+
+
+def minify_html(html: str) -> str:
+    """Минификация документа: разметка, <style> и <script>
+
+    Содержимое <pre> и <textarea>, а также скрипты не на JavaScript (шаблоны,
+    JSON-LD) остаются как есть. Переводы строк в разметке сохраняются - строки
+    короче, но правки по фрагментам (html_patch) продолжают находить их построчно.
+    """
+    if not html:
+        return html
+
+    parts: List[str] = []
+    position = 0
+    for match in _RAW_ELEMENT.finditer(html):
+        parts.append(_minify_markup(html[position:match.start()]))
+        tag, attributes, body = match.group(1).lower(), match.group(2), match.group(3)
+        if tag == 'style':
+            body = minify_css(body)
+        elif tag == 'script':
+            script_type = _SCRIPT_TYPE.search(attributes)
+            if (script_type.group(1).lower() if script_type else '') in _JS_TYPES:
+                body = minify_js(body)
+        parts.append(f"<{match.group(1)}{attributes}>{body}</{match.group(1)}>")
+        position = match.end()
+    parts.append(_minify_markup(html[position:]))
+    return "".join(parts).strip()
@@ -0,0 +1,78 @@
+import re
+from typing import List, Tuple
+
+# Формат правок, который просим у модели:
+# <<<<<<< SEARCH
+# фрагмент текущего документа
+# =======
+# новый фрагмент
+# >>>>>>> REPLACE
+_BLOCK = re.compile(
+    r'^<{5,9} ?SEARCH[^\n]*\n(.*?)^={5,9}[ \t]*\n(.*?)^>{5,9} ?REPLACE[^\n]*$',
+    re.MULTILINE | re.DOTALL
+)
+
+
+class PatchError(ValueError):
+    """Правку невозможно применить к документу"""
+
+
+def parse_search_replace_blocks(text: str) -> List[Tuple[str, str]]:
+    """Извлечение пар (search, replace) из ответа модели"""
+    blocks = []
+    for match in _BLOCK.finditer(text or ""):
+        search = match.group(1)
+        replace = match.group(2)
+        # Последний перевод строки принадлежит разделителю
+        if search.endswith('\n'):
+            search = search[:-1]
+        if replace.endswith('\n'):
+            replace = replace[:-1]
+        blocks.append((search, replace))
+    return blocks
+
+
+def _find_by_lines(document: str, search: str) -> Tuple[int, int]:
+    """Поиск фрагмента без учета отступов и концевых пробелов в строках"""
+    search_lines = [line.strip() for line in search.strip('\n').split('\n')]
+    if not search_lines or not any(search_lines):
+        return -1, -1
+
+    doc_lines = document.split('\n')
+    offsets = []
+    position = 0
+    for line in doc_lines:
+        offsets.append(position)
+        position += len(line) + 1
+
+    window = len(search_lines)
+    for i in range(len(doc_lines) - window + 1):
+        if doc_lines[i].strip() != search_lines[0]:
+            continue
+        if all(doc_lines[i + k].strip() == search_lines[k] for k in range(1, window)):
+            start = offsets[i]
+            end = offsets[i + window - 1] + len(doc_lines[i + window - 1])
+            return start, end
+    return -1, -1
+
+
+def apply_search_replace(document: str, blocks: List[Tuple[str, str]]) -> str:
+    """Применение правок по порядку. Каждый SEARCH должен найтись в документе"""
+    if not blocks:
+        raise PatchError("В ответе модели нет блоков SEARCH/REPLACE")
+
+    for index, (search, replace) in enumerate(blocks, start=1):
+        if not search.strip():
+            raise PatchError(f"Блок {index}: пустой SEARCH")
+
+        start = document.find(search)
+        if start != -1:
+            document = document[:start] + replace + document[start + len(search):]
+            continue
+
+        start, end = _find_by_lines(document, search)
+        if start == -1:
+            raise PatchError(f"Блок {index}: фрагмент не найден в документе")
+        document = document[:start] + replace + document[end:]
+
+    return document
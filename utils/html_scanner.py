@@ -0,0 +1,172 @@
+import re
+from typing import List, Optional
+
+# Теги, по которым классифицируем документ. Регулярка без учета регистра,
+# поэтому строки не нужно копировать через lower()/upper()
+_STRUCTURE_TAG = re.compile(r'<(/?)(!doctype|html|body)', re.IGNORECASE)
+_THINK_OPEN = re.compile(r'<think(?:ing)?>', re.IGNORECASE)
+_THINK_CLOSE = re.compile(r'</think(?:ing)?>', re.IGNORECASE)
+
+
+class ScannedHtml(str):
+    """Строка с HTML и результатом классификации структуры документа"""
+
+    has_doctype = False
+    has_html = False
+    has_body = False
+    has_closing_html = False
+
+    @property
+    def is_full_document(self) -> bool:
+        return self.has_doctype and self.has_html and self.has_body
+
+
+class HtmlScanner:
+    """Однопроходный потоковый сканер ответа модели
+
+    За один проход по строкам:
+    - пропускает рассуждения <think>...</think> и пояснения до начала кода;
+    - выбирает содержимое markdown блока (```html приоритетнее обычного ```);
+    - отмечает наличие <!DOCTYPE>, <html>, <body> и закрывающего </html>.
+
+    Текст можно подавать частями через feed() по мере получения стрима.
+    """
+
+    def __init__(self):
+        self._raw_chunks: List[str] = []
+        self._pending: List[str] = []
+        self._state = 'text'  # text | think | fence | done
+        self._lines: List[str] = []
+        self._code_started = False
+        self._fence_is_html = False
+        self._fence_found = False
+        self._fence_lines: List[str] = []
+        self._flags = {'!doctype': False, 'html': False, 'body': False, '/html': False}
+        self._fence_flags = None
+
+    def feed(self, chunk: str):
+        if not chunk:
+            return
+        self._raw_chunks.append(chunk)
+        end = chunk.find('\n')
+        if end == -1:
+            # Строка еще не закончилась - копим части без конкатенации
+            self._pending.append(chunk)
+            return
+        self._pending.append(chunk[:end])
+        self._process_line("".join(self._pending))
+        start = end + 1
+        while True:
+            end = chunk.find('\n', start)
+            if end == -1:
+                break
+            self._process_line(chunk[start:end])
+            start = end + 1
+        self._pending = [chunk[start:]] if start < len(chunk) else []
+
+    def finish(self) -> ScannedHtml:
+        if self._pending:
+            self._process_line("".join(self._pending))
+            self._pending = []
+
+        if self._state == 'fence':
+            # Незакрытый блок (например, обрезанный ответ) - берем то, что есть
+            self._accept_fence()
+
+        result = "\n".join(self._lines).strip()
+        if not result:
+            # Если после очистки пусто, возвращаем оригинал
+            result = "".join(self._raw_chunks)
+
+        scanned = ScannedHtml(result)
+        scanned.has_doctype = self._flags['!doctype']
+        scanned.has_html = self._flags['html']
+        scanned.has_body = self._flags['body']
+        scanned.has_closing_html = self._flags['/html']
+        return scanned
+
+    def _mark(self, line: str, flags: dict):
+        for match in _STRUCTURE_TAG.finditer(line):
+            name = match.group(2)
+            if name[0] == '!':
+                flags['!doctype'] = True
+            elif match.group(1):
+                flags['/' + name.lower()] = True
+            else:
+                flags[name.lower()] = True
+
+    def _accept_fence(self):
+        self._lines = self._fence_lines
+        self._flags = self._fence_flags
+        self._fence_found = True
+        self._state = 'done' if self._fence_is_html else 'text'
+
+    def _process_line(self, line: str):
+        state = self._state
+
+        if state == 'think':
+            close = _THINK_CLOSE.search(line)
+            if close:
+                self._state = 'text'
+                rest = line[close.end():]
+                if rest.strip():
+                    self._process_line(rest)
+            return
+
+        stripped = line.strip()
+
+        if state == 'fence':
+            if stripped.startswith('```'):
+                self._accept_fence()
+                return
+            self._fence_lines.append(line)
+            self._mark(line, self._fence_flags)
+            return
+
+        if state == 'done':
+            # Уже нашли ```html блок, но пропускаем рассуждения и ищем только его
+            return
+
+        # state == 'text'
+        if stripped.startswith('```'):
+            language = stripped[3:].strip()
+            is_html = language[:4].lower() == 'html'
+            # Первый ```html блок всегда выигрывает; обычный ``` - только если других блоков не было
+            if is_html or not self._fence_found:
+                self._state = 'fence'
+                self._fence_is_html = is_html
+                self._fence_lines = []
+                self._fence_flags = {'!doctype': False, 'html': False, 'body': False, '/html': False}
+            return
+
+        if self._fence_found:
+            return
+
+        if not self._code_started:
+            think = _THINK_OPEN.match(stripped)
+            if think:
+                close = _THINK_CLOSE.search(stripped, think.end())
+                if close is None:
+                    self._state = 'think'
+                elif stripped[close.end():].strip():
+                    self._process_line(stripped[close.end():])
+                return
+
+        if self._flags['/html'] and not stripped.startswith('<'):
+            # Пояснения после закрытия документа
+            return
+
+        before = self._flags['!doctype'] or self._flags['html']
+        self._mark(line, self._flags)
+        if not before and (self._flags['!doctype'] or self._flags['html']):
+            self._code_started = True
+
+        if self._code_started or stripped.startswith('<'):
+            self._lines.append(line)
+
+
+def scan_html(text: Optional[str]) -> ScannedHtml:
+    """Сканирование полного ответа модели за один проход"""
+    scanner = HtmlScanner()
+    scanner.feed(text or "")
+    return scanner.finish()
@@ -0,0 +1,166 @@
+import os
+from html.parser import HTMLParser
+from typing import List, NamedTuple, Optional
+
+# Элементы без закрывающего тега
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'param', 'source', 'track', 'wbr',
+}
+# Элементы, закрывающий тег которых по спецификации можно опустить
+OPTIONAL_END = {
+    'html', 'head', 'body', 'p', 'li', 'dt', 'dd', 'tr', 'td', 'th', 'thead', 'tbody',
+    'tfoot', 'colgroup', 'option', 'optgroup', 'rb', 'rt', 'rp', 'caption',
+}
+RAW_TEXT_ELEMENTS = {'script', 'style'}
+
+# Штрафы к оценке качества
+_PENALTY_TRUNCATED = 0.5
+_PENALTY_RAW_UNCLOSED = 0.3
+_PENALTY_EMPTY_BODY = 0.4
+_PENALTY_NO_DOCTYPE = 0.05
+_PENALTY_UNCLOSED = 0.05
+_PENALTY_STRAY = 0.02
+_MAX_TAG_PENALTY = 0.3
+
+
+class ValidationReport(NamedTuple):
+    score: float  # 0..1, 1 - без замечаний
+    truncated: bool
+    empty_body: bool
+    unclosed_raw: List[str]  # незакрытые <script>/<style>
+    unclosed: List[str]
+    stray: List[str]  # закрывающие теги без открывающих
+    min_score: float
+
+    @property
+    def acceptable(self) -> bool:
+        """Документ можно сохранять и отправлять пользователю"""
+        return (not self.truncated and not self.empty_body and not self.unclosed_raw
+                and self.score >= self.min_score)
+
+    def summary(self) -> str:
+        problems = []
+        if self.truncated:
+            problems.append("обрезан")
+        if self.empty_body:
+            problems.append("пустой body")
+        if self.unclosed_raw:
+            problems.append(f"не закрыты {', '.join(self.unclosed_raw)}")
+        if self.unclosed:
+            problems.append(f"не закрыто тегов: {len(self.unclosed)}")
+        if self.stray:
+            problems.append(f"лишних закрывающих: {len(self.stray)}")
+        return f"{self.score:.2f}" + (f" ({'; '.join(problems)})" if problems else "")
+
+
+class HtmlValidator(HTMLParser):
+    """Потоковая структурная проверка документа на html.parser
+
+    Текст подается частями через feed(), результат - report() после close():
+    баланс тегов с учетом необязательных закрывающих, закрытие <script>/<style>,
+    непустой body и признаки обрыва (незакрытый тег, комментарий или </html>).
+    """
+
+    def __init__(self, min_score: Optional[float] = None):
+        super().__init__(convert_charrefs=True)
+        self.min_score = min_score if min_score is not None else float(os.getenv('HTML_MIN_QUALITY', 0.6))
+        self._stack: List[str] = []
+        self._stray: List[str] = []
+        self._unclosed: List[str] = []
+        self._has_doctype = False
+        self._has_html = False
+        self._closed_html = False
+        self._body_content = 0
+        self._in_body = False
+        self._tail_incomplete = False
+        self._report: Optional[ValidationReport] = None
+
+    def handle_decl(self, decl):
+        if decl.lower().startswith('doctype'):
+            self._has_doctype = True
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'html':
+            self._has_html = True
+        elif tag == 'body':
+            self._in_body = True
+        elif self._in_body or not self._has_html:
+            # Элементы вне <head> считаются содержимым (фрагмент без <html> - тоже).
+            # <script> тоже: страница может целиком строиться скриптом
+            if tag not in ('head', 'meta', 'link', 'title', 'base', 'style'):
+                self._body_content += 1
+        if tag not in VOID_ELEMENTS:
+            self._stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        # <div/> в HTML не закрывает элемент, но для оценки считаем его самозакрытым
+        if tag not in VOID_ELEMENTS and tag not in ('html', 'body'):
+            if self._in_body or not self._has_html:
+                self._body_content += 1
+            return
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in VOID_ELEMENTS:
+            return
+        if tag == 'html':
+            self._closed_html = True
+        if tag == 'body':
+            self._in_body = False
+        if tag not in self._stack:
+            self._stray.append(tag)
+            return
+        while self._stack:
+            open_tag = self._stack.pop()
+            if open_tag == tag:
+                break
+            if open_tag not in OPTIONAL_END:
+                self._unclosed.append(open_tag)
+
+    def handle_data(self, data):
+        if self._stack and self._stack[-1] in RAW_TEXT_ELEMENTS:
+            return
+        if (self._in_body or not self._has_html) and data.strip():
+            self._body_content += 1
+
+    def close(self):
+        # Недоразобранный хвост ("<div cla", "<!-- ...") - документ оборвался посреди тега
+        self._tail_incomplete = bool(self.rawdata.strip()) and self.rawdata.lstrip().startswith('<')
+        super().close()
+
+    def report(self) -> ValidationReport:
+        if self._report is not None:
+            return self._report
+
+        unclosed_raw = [tag for tag in self._stack if tag in RAW_TEXT_ELEMENTS]
+        unclosed = self._unclosed + [
+            tag for tag in self._stack if tag not in OPTIONAL_END and tag not in RAW_TEXT_ELEMENTS
+        ]
+        truncated = self._tail_incomplete or bool(unclosed_raw) or (self._has_html and not self._closed_html)
+        empty_body = self._body_content == 0
+
+        score = 1.0
+        if truncated:
+            score -= _PENALTY_TRUNCATED
+        if unclosed_raw:
+            score -= _PENALTY_RAW_UNCLOSED
+        if empty_body:
+            score -= _PENALTY_EMPTY_BODY
+        if self._has_html and not self._has_doctype:
+            score -= _PENALTY_NO_DOCTYPE
+        score -= min(_MAX_TAG_PENALTY, len(unclosed) * _PENALTY_UNCLOSED)
+        score -= min(_MAX_TAG_PENALTY, len(self._stray) * _PENALTY_STRAY)
+
+        self._report = ValidationReport(
+            round(max(0.0, score), 3), truncated, empty_body, unclosed_raw, unclosed, list(self._stray), self.min_score
+        )
+        return self._report
+
+
+def validate_html_document(html: Optional[str], min_score: Optional[float] = None) -> ValidationReport:
+    """Проверка готового документа за один проход"""
+    validator = HtmlValidator(min_score)
+    validator.feed(html or "")
+    validator.close()
+    return validator.report()
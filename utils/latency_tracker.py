@@ -0,0 +1,200 @@
+import os
+import json
+import math
+import time
+import atexit
+import logging
+import threading
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LatencySketch:
+    """Онлайн скетч квантилей с логарифмическими корзинами (как DDSketch)
+
+    Память не зависит от количества наблюдений, относительная ошибка квантиля - не больше accuracy.
+    """
+
+    MIN_VALUE = 1e-3
+
+    def __init__(self, accuracy: float = 0.02):
+        self.accuracy = accuracy
+        self._gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+
+    def add(self, value: float):
+        index = math.ceil(math.log(max(value, self.MIN_VALUE)) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return 2 * self._gamma ** index / (self._gamma + 1)
+        return None
+
+    def merge(self, other: 'LatencySketch'):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+
+    def to_dict(self) -> Dict:
+        return {'accuracy': self.accuracy, 'buckets': {str(k): v for k, v in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LatencySketch':
+        sketch = cls(data.get('accuracy', 0.02))
+        sketch.buckets = {int(k): v for k, v in data.get('buckets', {}).items()}
+        sketch.count = sum(sketch.buckets.values())
+        return sketch
+
+
+# model -> metric -> номер окна -> скетч
+Windows = Dict[str, Dict[str, Dict[int, LatencySketch]]]
+
+
+def _merge_windows(target: Windows, source: Windows):
+    for model, metrics in source.items():
+        for metric, windows in metrics.items():
+            target_windows = target.setdefault(model, {}).setdefault(metric, {})
+            for window, sketch in windows.items():
+                target_windows.setdefault(window, LatencySketch(sketch.accuracy)).merge(sketch)
+
+
+def _prune_windows(data: Windows, oldest: int):
+    for metrics in data.values():
+        for windows in metrics.values():
+            for window in [w for w in windows if w < oldest]:
+                del windows[window]
+
+
+class LatencyTracker:
+    """Задержки по моделям и метрикам (first_byte, total) с сохранением между перезапусками
+
+    Наблюдения раскладываются по окнам фиксированной длины (window секунд, границы кратны
+    длине окна), квантили считаются по текущему и предыдущему окну - статистика следует
+    за изменением скорости провайдера. При сохранении новые наблюдения добавляются
+    к состоянию на диске, поэтому бот и Streamlit приложение делят один файл, не затирая друг друга.
+    """
+
+    SAVE_INTERVAL = 5.0
+    WINDOW_SECONDS = 3600.0
+
+    def __init__(self, file_path: Optional[str] = None, window: Optional[float] = None):
+        self.file_path = file_path
+        self.window = window if window is not None else float(os.getenv('LATENCY_WINDOW_SECONDS', self.WINDOW_SECONDS))
+        self._windows: Windows = {}
+        self._pending: Windows = {}  # наблюдения, еще не добавленные в файл
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+        self._load()
+        if file_path:
+            atexit.register(self.save)
+
+    def _current_window(self) -> int:
+        return int(time.time() // self.window)
+
+    def record(self, model: str, metric: str, seconds: float):
+        window = self._current_window()
+        with self._lock:
+            for data in (self._windows, self._pending):
+                windows = data.setdefault(model, {}).setdefault(metric, {})
+                windows.setdefault(window, LatencySketch()).add(seconds)
+            _prune_windows(self._windows, window - 1)
+            should_save = time.monotonic() - self._last_save > self.SAVE_INTERVAL
+        if should_save:
+            self.save()
+
+    def _recent(self, model: str, metric: str) -> Iterable[LatencySketch]:
+        oldest = self._current_window() - 1
+        windows = self._windows.get(model, {}).get(metric, {})
+        return [sketch for window, sketch in windows.items() if window >= oldest]
+
+    def count(self, model: str, metric: str) -> int:
+        with self._lock:
+            return sum(sketch.count for sketch in self._recent(model, metric))
+
+    def quantile(self, model: str, metric: str, q: float) -> Optional[float]:
+        with self._lock:
+            recent = self._recent(model, metric)
+            if not recent:
+                return None
+            merged = LatencySketch(recent[0].accuracy)
+            for sketch in recent:
+                merged.merge(sketch)
+            return merged.quantile(q)
+
+    def save(self):
+        if not self.file_path:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_save = time.monotonic()
+        if not pending:
+            return
+
+        oldest = self._current_window() - 1
+        try:
+            # Состояние на диске могло обновиться другим процессом - добавляем к нему только свои наблюдения
+            data = self._read()
+            _merge_windows(data, pending)
+            _prune_windows(data, oldest)
+            os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+            temp_path = f"{self.file_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._serialize(data), f)
+            os.replace(temp_path, self.file_path)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить статистику задержек: {e}")
+            with self._lock:
+                _merge_windows(self._pending, pending)
+            return
+
+        with self._lock:
+            # Наблюдения, записанные во время сохранения, еще только в _pending
+            _merge_windows(data, self._pending)
+            self._windows = data
+
+    @staticmethod
+    def _serialize(data: Windows) -> Dict:
+        return {
+            model: {
+                metric: {str(window): sketch.to_dict() for window, sketch in windows.items()}
+                for metric, windows in metrics.items()
+            }
+            for model, metrics in data.items()
+        }
+
+    def _read(self) -> Windows:
+        if not os.path.exists(self.file_path):
+            return {}
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+        data: Windows = {}
+        for model, metrics in raw.items():
+            for metric, windows in metrics.items():
+                # Старый формат без окон (один скетч за все время) не переносится
+                if 'buckets' in windows:
+                    continue
+                data.setdefault(model, {})[metric] = {
+                    int(window): LatencySketch.from_dict(sketch) for window, sketch in windows.items()
+                }
+        return data
+
+    def _load(self):
+        if not self.file_path:
+            return
+        try:
+            self._windows = self._read()
+            _prune_windows(self._windows, self._current_window() - 1)
+            logger.info(f"Загружена статистика задержек для {len(self._windows)} моделей")
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить статистику задержек: {e}")
@@ -0,0 +1,126 @@
+import io
+import re
+import zipfile
+import posixpath
+from typing import Dict, List, Optional
+
+from utils.html_validator import validate_html_document
+
+PROJECT_ENTRY = "index.html"
+MAX_PROJECT_FILES = 12
+ALLOWED_EXTENSIONS = {'.html', '.css', '.js', '.json', '.svg', '.md', '.txt'}
+
+# Разделитель файлов в ответе модели: === FILE: styles.css ===
+_FILE_MARKER = re.compile(r'^[ \t]*={3,}[ \t]*FILE:[ \t]*(?P<name>[^=\n]+?)[ \t]*={3,}[ \t]*$', re.MULTILINE)
+_FENCE = re.compile(r'^[ \t]*```[^\n]*\n(?P<body>.*?)\n?[ \t]*```[ \t]*$', re.DOTALL)
+
+_STYLESHEET = re.compile(r'<link\b[^>]*\bhref\s*=\s*["\']([^"\']+)["\'][^>]*>', re.IGNORECASE)
+_SCRIPT_SRC = re.compile(r'<script\b([^>]*)\bsrc\s*=\s*["\']([^"\']+)["\']([^>]*)>\s*</script\s*>', re.IGNORECASE)
+_REL_STYLESHEET = re.compile(r'\brel\s*=\s*["\']?stylesheet', re.IGNORECASE)
+
+
+class ProjectError(ValueError):
+    """Ответ модели не удалось разобрать как многофайловый проект"""
+
+
+def safe_filename(name: str) -> Optional[str]:
+    """Нормализованный относительный путь внутри проекта или None, если путь небезопасен"""
+    name = name.strip().strip('`"\'').replace('\\', '/')
+    if not name or name.startswith('/'):
+        return None
+    name = posixpath.normpath(name)
+    if name.startswith('..') or ':' in name:
+        return None
+    if posixpath.splitext(name)[1].lower() not in ALLOWED_EXTENSIONS:
+        return None
+    return name
+
+
+def parse_project_files(text: str) -> Dict[str, str]:
+    """Файлы проекта из ответа в формате === FILE: имя === ... Повтор имени - побеждает последний"""
+    markers = list(_FILE_MARKER.finditer(text or ""))
+    if not markers:
+        raise ProjectError("в ответе нет разделителей файлов")
+
+    files = {}
+    for i, marker in enumerate(markers):
+        name = safe_filename(marker.group('name'))
+        if name is None:
+            raise ProjectError(f"недопустимое имя файла: {marker.group('name').strip()}")
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+        body = text[marker.end():end].strip('\n')
+        fenced = _FENCE.match(body.strip())
+        if fenced:
+            body = fenced.group('body')
+        files[name] = body.strip('\n') + '\n'
+
+    if len(files) > MAX_PROJECT_FILES:
+        raise ProjectError(f"слишком много файлов: {len(files)}")
+    return files
+
+
+def _local_reference(reference: str) -> Optional[str]:
+    if re.match(r'^(?:[a-z]+:)?//', reference, re.IGNORECASE) or reference.startswith(('data:', '#')):
+        return None
+    return posixpath.normpath(reference.split('?')[0].split('#')[0])
+
+
+def validate_project(files: Dict[str, str]) -> List[str]:
+    """Список проблем проекта: нет index.html, он поврежден, пустые файлы, ссылки на несуществующие файлы"""
+    problems = []
+    index = files.get(PROJECT_ENTRY)
+    if index is None:
+        return [f"нет {PROJECT_ENTRY}"]
+
+    report = validate_html_document(index)
+    if not report.acceptable:
+        problems.append(f"{PROJECT_ENTRY}: {report.summary()}")
+
+    for name, body in files.items():
+        if not body.strip():
+            problems.append(f"{name}: пустой файл")
+
+    references = [m.group(1) for m in _STYLESHEET.finditer(index) if _REL_STYLESHEET.search(m.group(0))]
+    references += [m.group(2) for m in _SCRIPT_SRC.finditer(index)]
+    for reference in references:
+        local = _local_reference(reference)
+        if local is not None and local not in files:
+            problems.append(f"{PROJECT_ENTRY} ссылается на отсутствующий {reference}")
+    return problems
+
+
+def inline_project(files: Dict[str, str]) -> str:
+    """Однофайловая версия проекта для превью и хранилища: локальные CSS и JS встраиваются в index.html"""
+    index = files.get(PROJECT_ENTRY, "")
+
+    def inline_style(match):
+        local = _local_reference(match.group(1))
+        if not _REL_STYLESHEET.search(match.group(0)) or local not in files:
+            return match.group(0)
+        return f"<style>\n{files[local]}</style>"
+
+    def inline_script(match):
+        local = _local_reference(match.group(2))
+        if local not in files:
+            return match.group(0)
+        # </script> внутри кода закрыл бы встроенный блок раньше времени
+        body = files[local].replace('</script', '<\\/script')
+        return f"<script{match.group(1)}{match.group(3)}>\n{body}</script>"
+
+    index = _STYLESHEET.sub(inline_style, index)
+    return _SCRIPT_SRC.sub(inline_script, index)
+
+
+def serialize_project(files: Dict[str, str]) -> str:
+    """Проект одним текстом в формате ответа модели - для правок через SEARCH/REPLACE"""
+    ordered = sorted(files, key=lambda name: (name != PROJECT_ENTRY, name))
+    return "\n".join(f"=== FILE: {name} ===\n{files[name].rstrip()}\n" for name in ordered)
+
+
+def build_zip(files: Dict[str, str], root: str = "") -> bytes:
+    """ZIP архив проекта в памяти, без временных файлов"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        for name in sorted(files):
+            archive.writestr(posixpath.join(root, name) if root else name, files[name])
+    return buffer.getvalue()
@@ -0,0 +1,105 @@
+from typing import Dict, List
+
+# Версия шаблонов. Меняется при любом изменении текста промптов,
+# чтобы сохраненные ответы старых версий не смешивались с новыми
+PROMPT_VERSION = "v2"
+
+# Статичная часть запроса. Идет первым сообщением и не меняется между запросами,
+# поэтому провайдеры могут кэшировать этот префикс
+GENERATE_SYSTEM_PROMPT = (
+    "Ты опытный фронтенд-разработчик. По ТЗ пользователя верни один валидный HTML5 файл: "
+    "семантическая разметка, CSS3 (Flexbox/Grid) внутри <style>, минимум JavaScript внутри <script>, "
+    "красивый современный адаптивный UI. "
+    "Ответ - только код от <!DOCTYPE html> до </html>, без пояснений и markdown."
+)
+
+PROJECT_SYSTEM_PROMPT = (
+    "Ты опытный фронтенд-разработчик. По ТЗ пользователя верни небольшой проект из нескольких файлов: "
+    "index.html (семантическая разметка, подключает styles.css и app.js относительными путями), "
+    "styles.css (CSS3, Flexbox/Grid, адаптивный современный UI) и app.js (JavaScript без сторонних библиотек). "
+    "Дополнительные файлы добавляй только при необходимости. "
+    "Каждый файл начинается строкой-разделителем вида === FILE: имя_файла ===, "
+    "далее только его содержимое. Без пояснений и markdown."
+)
+
+STRUCTURED_SYSTEM_PROMPT = (
+    "Ты опытный фронтенд-разработчик. По ТЗ пользователя сделай один валидный HTML5 файл: "
+    "семантическая разметка, CSS3 (Flexbox/Grid) внутри <style>, минимум JavaScript внутри <script>, "
+    "красивый современный адаптивный UI. "
+    "Ответ - только JSON объект с полями html (документ от <!DOCTYPE html> до </html>), "
+    "title (короткое название) и summary (одно предложение о результате), без markdown и пояснений."
+)
+
+REPAIR_PROMPT = (
+    "Ответ не соответствует формату: {error}. "
+    "Верни исправленный ответ - только JSON объект с полями html, title и summary, без markdown и пояснений."
+)
+
+EDIT_SYSTEM_PROMPT = (
+    "Ты опытный фронтенд-разработчик. Пользователь присылает HTML документ и описание изменения. "
+    "Верни только блоки замены в формате:\n"
+    "<<<<<<< SEARCH\nточный фрагмент документа\n=======\nновый фрагмент\n>>>>>>> REPLACE\n"
+    "SEARCH дословно совпадает с фрагментом документа и как можно короче. "
+    "Не возвращай документ целиком, без пояснений и markdown."
+)
+
+CONTINUE_PROMPT = (
+    "Ответ оборвался. Продолжи HTML код ровно с того места, где остановился. "
+    "Не повторяй уже написанное, не добавляй пояснения и markdown разметку."
+)
+
+# Провайдеры, которым нужна явная точка кэширования (у остальных кэш префикса автоматический)
+EXPLICIT_CACHE_PREFIXES = ('anthropic/', 'google/gemini')
+
+
+def _system_message(model: str, text: str) -> Dict:
+    if model.startswith(EXPLICIT_CACHE_PREFIXES):
+        return {
+            "role": "system",
+            "content": [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+        }
+    return {"role": "system", "content": text}
+
+
+def build_generate_messages(model: str, task_description: str) -> List[Dict]:
+    """Сообщения для генерации страницы по ТЗ"""
+    return [
+        _system_message(model, GENERATE_SYSTEM_PROMPT),
+        {"role": "user", "content": f"ТЗ: {task_description}"}
+    ]
+
+
+def build_structured_messages(model: str, task_description: str) -> List[Dict]:
+    """Сообщения для генерации страницы в режиме JSON ответа {html, title, summary}"""
+    return [
+        _system_message(model, STRUCTURED_SYSTEM_PROMPT),
+        {"role": "user", "content": f"ТЗ: {task_description}"}
+    ]
+
+
+def build_project_messages(model: str, task_description: str) -> List[Dict]:
+    """Сообщения для генерации многофайлового проекта по ТЗ"""
+    return [
+        _system_message(model, PROJECT_SYSTEM_PROMPT),
+        {"role": "user", "content": f"ТЗ: {task_description}"}
+    ]
+
+
+def build_edit_messages(model: str, html: str, instruction: str) -> List[Dict]:
+    """Сообщения для правки документа. Документ идет раньше инструкции,
+    чтобы последовательные правки одной страницы делили общий префикс"""
+    return [
+        _system_message(model, EDIT_SYSTEM_PROMPT),
+        {"role": "user", "content": f"Документ:\n{html}\n\nИзменение: {instruction}"}
+    ]
+
+
+def build_project_edit_messages(model: str, project_text: str, instruction: str) -> List[Dict]:
+    """Правка многофайлового проекта: файлы идут одним документом с разделителями"""
+    return [
+        _system_message(model, EDIT_SYSTEM_PROMPT),
+        {"role": "user", "content": (
+            f"Документ:\n{project_text}\n\nИзменение: {instruction}\n"
+            "Строки === FILE: имя === разделяют файлы проекта, не меняй их."
+        )}
+    ]
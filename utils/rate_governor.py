@@ -0,0 +1,219 @@
+import os
+import time
+import asyncio
+import logging
+import itertools
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Приоритетные полосы: меньшее значение отправляется раньше
+PRIORITY_RESULT = 0  # результаты генерации (документы)
+PRIORITY_INTERACTIVE = 1  # сообщения, клавиатуры, статусы
+PRIORITY_CLEANUP = 2  # удаление старых сообщений
+
+
+class TokenBucket:
+    """Корзина токенов: rate запросов в секунду, всплеск до capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        # До этого момента запросы запрещены (RetryAfter от Telegram)
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Сколько секунд ждать до следующего разрешенного запроса"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+class _Call:
+    __slots__ = ('priority', 'seq', 'chat_id', 'func', 'args', 'kwargs', 'future', 'attempts')
+
+    def __init__(self, priority, seq, chat_id, func, args, kwargs, future):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.attempts = 0
+
+
+class RateGovernor:
+    """Планировщик исходящих запросов к Bot API
+
+    Общая корзина (по умолчанию 30 запросов/с) и корзина на каждый чат (1 запрос/с
+    со всплеском до 3). Из готовых к отправке запросов первым уходит запрос с высшим
+    приоритетом, внутри приоритета - в порядке поступления. При RetryAfter чат
+    блокируется на указанное Telegram время, а запрос повторяется до max_retries раз.
+    """
+
+    # Чистить простаивающие корзины чатов, когда их больше этого числа
+    MAX_IDLE_BUCKETS = 10000
+
+    def __init__(self, global_rate: float = None, chat_rate: float = None, chat_burst: float = None,
+                 max_retries: int = 3):
+        self.global_rate = global_rate or float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+        self.chat_rate = chat_rate or float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+        self.chat_burst = chat_burst or float(os.getenv('TELEGRAM_CHAT_BURST', 3))
+        self.max_retries = max_retries
+        self._global = TokenBucket(self.global_rate, self.global_rate)
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._queue: List[_Call] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        # Ссылки на запущенные отправки: задачу без ссылки сборщик мусора может удалить до завершения
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, chat_id, priority: int, func: Callable, /, *args, **kwargs):
+        """Поставить запрос в очередь и дождаться его результата"""
+        return await self.submit_background(chat_id, priority, func, *args, **kwargs)
+
+    def submit_background(self, chat_id, priority: int, func: Callable, /, *args, **kwargs) -> asyncio.Future:
+        """Поставить запрос в очередь, не дожидаясь отправки"""
+        loop = asyncio.get_running_loop()
+        call = _Call(priority, next(self._seq), chat_id, func, args, kwargs, loop.create_future())
+        self._push(call)
+        return call.future
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def _push(self, call: _Call):
+        self._queue.append(call)
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > self.MAX_IDLE_BUCKETS:
+                now = time.monotonic()
+                self._chats = {k: b for k, b in self._chats.items() if not b.idle(now)}
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _dispatch(self):
+        while True:
+            # Отмененные запросы не тратят токены корзин
+            self._queue = [call for call in self._queue if not call.future.cancelled()]
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            wait = self._global.delay(now)
+            chosen = None
+            if wait <= 0:
+                wait = None
+                for call in sorted(self._queue, key=lambda c: (c.priority, c.seq)):
+                    delay = self._chat_bucket(call.chat_id).delay(now)
+                    if delay <= 0:
+                        chosen = call
+                        break
+                    wait = delay if wait is None else min(wait, delay)
+
+            if chosen is None:
+                # Ждем освобождения корзины или нового запроса
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._queue.remove(chosen)
+            self._global.take(now)
+            self._chat_bucket(chosen.chat_id).take(now)
+            task = asyncio.get_running_loop().create_task(self._run(chosen))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, call: _Call):
+        if call.future.cancelled():
+            return
+        try:
+            result = await call.func(*call.args, **call.kwargs)
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            seconds = retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else float(retry_after)
+            bucket = self._chat_bucket(call.chat_id) if call.chat_id is not None else self._global
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + seconds)
+            call.attempts += 1
+            if call.attempts > self.max_retries:
+                if not call.future.done():
+                    call.future.set_exception(e)
+                return
+            logger.warning(f"Flood control для чата {call.chat_id}: повтор через {seconds:.1f} с")
+            self._push(call)
+            return
+        except Exception as e:
+            if not call.future.done():
+                call.future.set_exception(e)
+            return
+        if not call.future.done():
+            call.future.set_result(result)
+
+
+class GovernedBot:
+    """Обертка над telegram.Bot: методы отправки идут через RateGovernor
+
+    Приоритет берется из PRIORITIES по имени метода, его можно переопределить аргументом priority.
+    Остальные атрибуты возвращаются от исходного бота без изменений.
+    """
+
+    PRIORITIES = {
+        'send_document': PRIORITY_RESULT,
+        'send_message': PRIORITY_INTERACTIVE,
+        'edit_message_text': PRIORITY_INTERACTIVE,
+        'edit_message_reply_markup': PRIORITY_INTERACTIVE,
+        'delete_message': PRIORITY_CLEANUP,
+    }
+
+    def __init__(self, bot, governor: RateGovernor):
+        self._bot = bot
+        self._governor = governor
+
+    def __getattr__(self, name):
+        attr = getattr(self._bot, name)
+        if name not in self.PRIORITIES:
+            return attr
+
+        default_priority = self.PRIORITIES[name]
+
+        async def governed(*args, priority: int = None, **kwargs):
+            chat_id = kwargs.get('chat_id', args[0] if args else None)
+            return await self._governor.submit(
+                chat_id, default_priority if priority is None else priority, attr, *args, **kwargs
+            )
+
+        return governed
@@ -0,0 +1,167 @@
+import re
+from typing import Dict, List, NamedTuple
+
+_SCRIPT = re.compile(r'<script\b([^>]*)>(.*?)</script\s*>', re.IGNORECASE | re.DOTALL)
+_SCRIPT_SRC = re.compile(r'\bsrc\s*=', re.IGNORECASE)
+_SCRIPT_TYPE = re.compile(r'\btype\s*=\s*["\']?([^"\'\s>]+)', re.IGNORECASE)
+_JS_TYPES = {'', 'text/javascript', 'application/javascript', 'module', 'text/babel'}
+
+# Комментарии и содержимое строк убираются, чтобы не реагировать на текст страницы
+_NOISE = re.compile(
+    r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`',
+    re.DOTALL
+)
+
+_RAF = re.compile(r'\brequestAnimationFrame\s*\(')
+_SET_INTERVAL = re.compile(r'\bsetInterval\s*\(')
+_BUSY_LOOP = re.compile(r'\bwhile\s*\(\s*(?:true|1)\s*\)|\bfor\s*\(\s*;\s*;\s*\)')
+_DOM_CREATE = re.compile(r'\bcreateElement\s*\(|\.appendChild\s*\(|\.insertAdjacentHTML\s*\(|\.innerHTML\s*\+=|\.append\s*\(')
+_LARGE_LOOP = re.compile(r'\bfor\s*\([^;)]*;[^;)]*<=?\s*(\d{4,})')
+_TIMER = re.compile(r'\bsetTimeout\s*\(')
+_WEBGL = re.compile(r'getContext\s*\(\s*["\'](?:webgl2?|experimental-webgl)["\']')
+
+# Период setInterval меньше этого значения (мс) считается слишком частым
+FAST_INTERVAL_MS = 50
+LARGE_LOOP_ITERATIONS = 1000
+
+# Вклад признаков в стоимость превью
+_WEIGHTS = {
+    'busy_loop': 0.6,
+    'raf_loop': 0.3,
+    'fast_interval': 0.25,
+    'dom_growth': 0.3,
+    'large_loop': 0.15,
+    'webgl': 0.1,
+    'interval': 0.05,
+}
+
+# Подписи признаков для интерфейса
+FLAG_LABELS = {
+    'busy_loop': 'бесконечный цикл',
+    'raf_loop': 'цикл анимации',
+    'fast_interval': 'частый setInterval',
+    'dom_growth': 'рост DOM в таймерах',
+    'large_loop': 'большие циклы',
+    'webgl': 'WebGL',
+    'interval': 'setInterval',
+}
+
+LEVEL_MEDIUM = 0.3
+LEVEL_HIGH = 0.6
+
+
+def preview_level(score: float) -> str:
+    """low - превью как есть, medium - с троттлингом, high - только по запросу"""
+    if score >= LEVEL_HIGH:
+        return 'high'
+    if score >= LEVEL_MEDIUM:
+        return 'medium'
+    return 'low'
+
+
+class PreviewCost(NamedTuple):
+    score: float  # 0..1
+    flags: List[str]
+
+    @property
+    def level(self) -> str:
+        return preview_level(self.score)
+
+    def describe(self) -> str:
+        return ", ".join(FLAG_LABELS.get(flag, flag) for flag in self.flags)
+
+    def as_metadata(self) -> Dict:
+        return {'preview_cost': self.score, 'preview_flags': self.flags}
+
+
+def _interval_periods(code: str) -> List[int]:
+    """Периоды setInterval, заданные числом (-1 - период не литерал)"""
+    periods = []
+    for match in _SET_INTERVAL.finditer(code):
+        depth = 1
+        last_comma = -1
+        i = match.end()
+        while i < len(code) and depth:
+            char = code[i]
+            if char in '([{':
+                depth += 1
+            elif char in ')]}':
+                depth -= 1
+            elif char == ',' and depth == 1:
+                last_comma = i
+            i += 1
+        argument = code[last_comma + 1:i - 1].strip() if last_comma != -1 else ''
+        periods.append(int(argument) if argument.isdigit() else -1)
+    return periods
+
+
+def inline_scripts(html: str) -> List[str]:
+    """Содержимое встроенных JavaScript блоков документа"""
+    scripts = []
+    for match in _SCRIPT.finditer(html or ""):
+        attributes = match.group(1)
+        if _SCRIPT_SRC.search(attributes):
+            continue
+        script_type = _SCRIPT_TYPE.search(attributes)
+        if (script_type.group(1).lower() if script_type else '') in _JS_TYPES:
+            scripts.append(match.group(2))
+    return scripts
+
+
+def analyze_scripts(html: str) -> PreviewCost:
+    """Статическая оценка нагрузки, которую страница создаст в превью
+
+    Ищет бесконечные циклы, циклы requestAnimationFrame, частые setInterval,
+    создание DOM в таймерах и анимациях, большие циклы и WebGL. Код не выполняется.
+    """
+    raw = "\n".join(inline_scripts(html))
+    if not raw.strip():
+        return PreviewCost(0.0, [])
+    code = _NOISE.sub('""', raw)
+
+    flags = []
+    if _BUSY_LOOP.search(code):
+        flags.append('busy_loop')
+    has_raf = bool(_RAF.search(code))
+    if has_raf:
+        flags.append('raf_loop')
+    periods = _interval_periods(code)
+    if any(0 <= period < FAST_INTERVAL_MS for period in periods):
+        flags.append('fast_interval')
+    elif periods:
+        flags.append('interval')
+    # DOM создается внутри повторяющихся колбэков - страница растет без ограничения
+    if _DOM_CREATE.search(code) and (has_raf or periods or len(_TIMER.findall(code)) > 1):
+        flags.append('dom_growth')
+    if any(int(bound) >= LARGE_LOOP_ITERATIONS for bound in _LARGE_LOOP.findall(code)):
+        flags.append('large_loop')
+    if _WEBGL.search(raw):
+        flags.append('webgl')
+
+    score = min(1.0, sum(_WEIGHTS[flag] for flag in flags))
+    return PreviewCost(round(float(score), 2), flags)
+
+
+# Вставляется первым скриптом превью: анимации не чаще 30 кадров/с, таймеры не чаще FAST_INTERVAL_MS
+_THROTTLE_SHIM = (
+    "<script>(function(){"
+    "var st=window.setTimeout.bind(window),ct=window.clearTimeout.bind(window),"
+    "si=window.setInterval.bind(window),t0=Date.now();"
+    "window.requestAnimationFrame=function(cb){return st(function(){cb(Date.now()-t0)},33)};"
+    "window.cancelAnimationFrame=function(id){ct(id)};"
+    "window.setInterval=function(f,d){var a=[].slice.call(arguments,2);"
+    "return si.apply(null,[f,Math.max(+d||0," + str(FAST_INTERVAL_MS) + ")].concat(a))};"
+    "})();</script>"
+)
+_HEAD_OPEN = re.compile(r'<head\b[^>]*>', re.IGNORECASE)
+_HTML_OPEN = re.compile(r'<html\b[^>]*>', re.IGNORECASE)
+
+
+def throttle_for_preview(html: str) -> str:
+    """Копия документа для превью с ограничением частоты анимаций и таймеров.
+    Сохраненный и отправляемый файл не меняется"""
+    for pattern in (_HEAD_OPEN, _HTML_OPEN):
+        match = pattern.search(html)
+        if match:
+            return html[:match.end()] + _THROTTLE_SHIM + html[match.end():]
+    return _THROTTLE_SHIM + html
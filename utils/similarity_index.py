@@ -0,0 +1,192 @@
+import os
+import re
+import json
+import random
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from utils.prompts import PROMPT_VERSION
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_FILE = os.path.join("generated_codes", "similarity_index.jsonl")
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+class SimilarMatch(NamedTuple):
+    similarity: float
+    description: str
+    ref: Dict  # ArtifactHandle._asdict() найденной генерации
+
+
+def normalize_text(text: str) -> str:
+    """Нижний регистр, без пунктуации и лишних пробелов"""
+    return " ".join(re.findall(r'\w+', text.lower()))
+
+
+def shingles(text: str, size: int = 5) -> Set[str]:
+    """Символьные n-граммы нормализованного текста"""
+    text = normalize_text(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class SimilarityIndex:
+    """Локальный индекс похожих ТЗ на MinHash + LSH
+
+    Сигнатура - num_perm минимальных хэшей символьных шинглов. LSH делит ее на bands полос:
+    кандидаты - описания, совпавшие хотя бы в одной полосе, затем для них считается точная
+    мера Жаккара по шинглам. Индекс дописывается в JSON Lines файл вместе с сигнатурами,
+    поэтому загрузка не пересчитывает хэши.
+
+    Каждая запись хранит владельца, версию шаблонов промптов и модель: пользователю
+    предлагаются только его собственные генерации, сделанные текущими промптами и той же моделью.
+    """
+
+    def __init__(self, file_path: Optional[str] = None, threshold: float = None,
+                 num_perm: int = 64, bands: int = 16, shingle_size: int = 5,
+                 prompt_version: str = PROMPT_VERSION):
+        if num_perm % bands:
+            raise ValueError("num_perm должен делиться на bands")
+        self.file_path = file_path
+        self.threshold = threshold if threshold is not None else float(os.getenv('SIMILARITY_THRESHOLD', 0.8))
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.prompt_version = prompt_version
+
+        # Фиксированное зерно: сигнатуры должны совпадать между перезапусками
+        rng = random.Random(1)
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+
+        self._entries: List[Dict] = []
+        self._by_key: Dict[Tuple, int] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def signature(self, text: str) -> List[int]:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+            for shingle in shingles(text, self.shingle_size)
+        ]
+        if not hashes:
+            return [_MAX_HASH] * self.num_perm
+        return [min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes) for a, b in self._perms]
+
+    @staticmethod
+    def _key(entry: Dict) -> Tuple:
+        return entry.get('owner'), entry.get('prompt_version'), entry.get('model'), normalize_text(entry['text'])
+
+    def add(self, description: str, ref: Dict, owner: str, model: str):
+        """Добавление генерации владельца owner. Повтор того же текста только обновляет ссылку"""
+        if not normalize_text(description):
+            return
+        entry = {
+            'text': description, 'ref': ref, 'owner': str(owner),
+            'prompt_version': self.prompt_version, 'model': model,
+        }
+        with self._lock:
+            position = self._by_key.get(self._key(entry))
+            if position is not None:
+                if self._entries[position]['ref'] == ref:
+                    return
+                self._entries[position]['ref'] = ref
+                entry = self._entries[position]
+            else:
+                entry['signature'] = self.signature(description)
+                self._insert(entry)
+            self._append(entry)
+
+    def query(self, description: str, owner: str, model: str) -> Optional[SimilarMatch]:
+        """Самая похожая прошлая генерация владельца owner со сходством не ниже threshold.
+        Генерации других пользователей, старых версий промптов и других моделей не предлагаются"""
+        signature = self.signature(description)
+        query_shingles = shingles(description, self.shingle_size)
+        scope = (str(owner), self.prompt_version, model)
+
+        with self._lock:
+            candidates = set()
+            for band, key in self._band_keys(signature):
+                candidates.update(self._buckets.get((band, key), ()))
+            entries = [self._entries[i] for i in candidates if self._key(self._entries[i])[:3] == scope]
+
+        best = None
+        for entry in entries:
+            similarity = jaccard(query_shingles, shingles(entry['text'], self.shingle_size))
+            if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                best = SimilarMatch(similarity, entry['text'], entry['ref'])
+        return best
+
+    def _band_keys(self, signature: List[int]):
+        for band in range(self.bands):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def _insert(self, entry: Dict):
+        position = len(self._entries)
+        self._entries.append(entry)
+        self._by_key[self._key(entry)] = position
+        for band, key in self._band_keys(entry['signature']):
+            self._buckets[(band, key)].append(position)
+
+    def _append(self, entry: Dict):
+        if not self.file_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+            with open(self.file_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить индекс похожих задач: {e}")
+
+    def _load(self):
+        if not self.file_path or not os.path.exists(self.file_path):
+            return
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if len(entry.get('signature', ())) != self.num_perm:
+                    entry['signature'] = self.signature(entry['text'])
+                position = self._by_key.get(self._key(entry))
+                if position is not None:
+                    # Более поздняя строка обновляет ссылку
+                    self._entries[position]['ref'] = entry['ref']
+                else:
+                    self._insert(entry)
+        logger.info(f"Загружен индекс похожих задач: {len(self._entries)} описаний")
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_similarity_index() -> SimilarityIndex:
+    """Общий индекс процесса
+
+    SIMILARITY_INDEX_FILE: файл индекса (по умолчанию generated_codes/similarity_index.jsonl)
+    SIMILARITY_THRESHOLD: минимальное сходство по Жаккару для предложения готового результата (0.8)
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SimilarityIndex(os.getenv('SIMILARITY_INDEX_FILE', DEFAULT_INDEX_FILE))
+        return _index
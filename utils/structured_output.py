@@ -0,0 +1,62 @@
+import json
+from typing import NamedTuple
+
+from utils.html_validator import validate_html_document
+
+# JSON схема ответа в режиме структурированного вывода (response_format OpenRouter)
+PAGE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "html": {"type": "string", "description": "Полный HTML5 документ от <!DOCTYPE html> до </html>"},
+        "title": {"type": "string", "description": "Короткое название страницы"},
+        "summary": {"type": "string", "description": "Одно предложение о том, что сделано"},
+    },
+    "required": ["html", "title", "summary"],
+    "additionalProperties": False,
+}
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "generated_page", "strict": True, "schema": PAGE_SCHEMA},
+}
+
+
+class SchemaError(ValueError):
+    """Ответ не соответствует схеме PAGE_SCHEMA"""
+
+
+class StructuredPage(NamedTuple):
+    html: str
+    title: str
+    summary: str
+
+
+def parse_structured_page(content: str) -> StructuredPage:
+    """Строгий разбор ответа: ровно один JSON объект по схеме, без markdown и пояснений вокруг.
+    HTML должен пройти структурную проверку"""
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError) as e:
+        raise SchemaError(f"ответ не является JSON: {e}")
+
+    if not isinstance(data, dict):
+        raise SchemaError("ответ должен быть JSON объектом")
+    required = PAGE_SCHEMA["required"]
+    missing = [key for key in required if key not in data]
+    if missing:
+        raise SchemaError(f"нет полей: {', '.join(missing)}")
+    extra = [key for key in data if key not in PAGE_SCHEMA["properties"]]
+    if extra:
+        raise SchemaError(f"лишние поля: {', '.join(extra)}")
+    wrong = [key for key in required if not isinstance(data[key], str)]
+    if wrong:
+        raise SchemaError(f"поля должны быть строками: {', '.join(wrong)}")
+    if not data["html"].strip():
+        raise SchemaError("поле html пустое")
+
+    report = validate_html_document(data["html"])
+    if not report.acceptable:
+        raise SchemaError(f"html поврежден: {report.summary()}")
+
+    return StructuredPage(data["html"].strip(), data["title"].strip(), data["summary"].strip())
+
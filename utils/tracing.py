@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Текущий активный спан (работает и для потоков, и для asyncio задач)
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+class Span:
+    """Отрезок времени одной стадии обработки (формат полей совместим с OpenTelemetry)"""
+
+    def __init__(self, name: str, trace_id: str, parent: Optional['Span'] = None, attributes: Dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent else None
+        # Дочерние спаны наследуют атрибуты родителя (user_id, task_id и т.д.)
+        self.attributes = dict(parent.attributes) if parent else {}
+        self.attributes.update(attributes or {})
+        self.path = f"{parent.path};{name}" if parent else name
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano = None
+        self.status = "OK"
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_span_id': self.parent_span_id,
+            'path': self.path,
+            'start_time_unix_nano': self.start_time_unix_nano,
+            'end_time_unix_nano': self.end_time_unix_nano,
+            'attributes': self.attributes,
+            'status': self.status
+        }
+
+
+class JsonFileExporter:
+    """Запись завершенных спанов в локальный JSON Lines файл"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.file_path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+
+class Tracer:
+    """Легковесный трассировщик. Без экспортера работает как no-op"""
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            yield None
+            return
+
+        parent = _current_span.get()
+        trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        span = Span(name, trace_id, parent, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "ERROR"
+            span.set_attribute('error', repr(e))
+            raise
+        finally:
+            span.end_time_unix_nano = time.time_ns()
+            _current_span.reset(token)
+            try:
+                self.exporter.export(span)
+            except Exception as e:
+                logger.debug(f"Не удалось экспортировать спан {name}: {e}")
+
+
+class OpenTelemetryTracer:
+    """Обертка над opentelemetry-api с тем же интерфейсом, что и у Tracer"""
+
+    enabled = True
+
+    def __init__(self):
+        from opentelemetry import trace
+        self._tracer = trace.get_tracer("ai_code_generator")
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        attributes = {k: v for k, v in attributes.items() if v is not None}
+        with self._tracer.start_as_current_span(name, attributes=attributes) as span:
+            yield span
+
+
+_tracer = None
+
+
+def get_tracer():
+    """Глобальный трассировщик, настраивается через переменные окружения
+
+    TRACING_EXPORTER: none (по умолчанию) | json | otel
+    TRACING_FILE: путь к JSON Lines файлу для экспортера json
+    """
+    global _tracer
+    if _tracer is None:
+        exporter_name = os.getenv('TRACING_EXPORTER', 'none').lower()
+        if exporter_name == 'json':
+            file_path = os.getenv('TRACING_FILE', os.path.join("generated_codes", "logs", "traces.jsonl"))
+            _tracer = Tracer(JsonFileExporter(file_path))
+        elif exporter_name == 'otel':
+            try:
+                _tracer = OpenTelemetryTracer()
+            except ImportError:
+                logger.warning("opentelemetry не установлен, трассировка отключена")
+                _tracer = Tracer()
+        else:
+            _tracer = Tracer()
+    return _tracer
+
+
+def load_spans(file_path: str) -> List[Dict]:
+    """Чтение спанов из JSON Lines файла"""
+    spans = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                spans.append(json.loads(line))
+    return spans
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def collapsed_stacks(spans: List[Dict]) -> List[str]:
+    """Свертка спанов в формат flamegraph.pl: "root;child;leaf <self-time в мкс>" """
+    children_time = defaultdict(int)
+    for span in spans:
+        if span.get('parent_span_id'):
+            duration = span['end_time_unix_nano'] - span['start_time_unix_nano']
+            children_time[span['parent_span_id']] += duration
+
+    self_time = defaultdict(int)
+    for span in spans:
+        duration = span['end_time_unix_nano'] - span['start_time_unix_nano']
+        own = max(0, duration - children_time.get(span['span_id'], 0))
+        self_time[span['path']] += own
+
+    return [f"{path} {ns // 1000}" for path, ns in sorted(self_time.items())]
+
+
+def summarize(spans: List[Dict]) -> str:
+    """Текстовый отчет по стадиям: количество, суммарное время, p50/p99"""
+    durations = defaultdict(list)
+    for span in spans:
+        ms = (span['end_time_unix_nano'] - span['start_time_unix_nano']) / 1e6
+        durations[span['path']].append(ms)
+
+    lines = [f"{'stage':<60} {'count':>7} {'total ms':>11} {'p50 ms':>9} {'p99 ms':>9}"]
+    for path in sorted(durations):
+        values = durations[path]
+        depth = path.count(';')
+        label = "  " * depth + path.rsplit(';', 1)[-1]
+        lines.append(
+            f"{label:<60} {len(values):>7} {sum(values):>11.1f} "
+            f"{_percentile(values, 0.5):>9.1f} {_percentile(values, 0.99):>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Отчет по трассировкам генерации")
+    parser.add_argument("file", help="JSON Lines файл со спанами")
+    parser.add_argument("--collapsed", action="store_true", help="Вывести свернутые стеки для flamegraph.pl")
+    args = parser.parse_args()
+
+    loaded = load_spans(args.file)
+    if args.collapsed:
+        print("\n".join(collapsed_stacks(loaded)))
+    else:
+        print(summarize(loaded))
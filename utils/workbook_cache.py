@@ -0,0 +1,106 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from utils.artifact_store import ArtifactHandle, get_artifact_store
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKBOOK_DIR = os.path.join("generated_codes", "workbooks")
+
+
+def workbook_digest(data: bytes) -> str:
+    """Ключ книги - SHA-256 содержимого, одинаковый для всех процессов и пользователей"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class WorkbookCache:
+    """Разобранные Excel книги (общие для всех пользователей) и результаты по строкам (у каждого свои)
+
+    <digest>.tasks.json - список задач, пишется один раз.
+    <digest>.results.jsonl - журнал результатов: владелец и ссылка на артефакт для каждой
+    сгенерированной строки, при повторной генерации побеждает последняя запись владельца.
+    Результаты одного пользователя другим, загрузившим ту же книгу, не выдаются.
+    """
+
+    MEMORY_ENTRIES = 64
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or os.getenv('WORKBOOK_CACHE_DIR', DEFAULT_WORKBOOK_DIR)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._tasks: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_tasks(self, digest: str) -> Optional[List[Dict]]:
+        with self._lock:
+            if digest in self._tasks:
+                self._tasks.move_to_end(digest)
+                return [dict(task) for task in self._tasks[digest]]
+
+        path = os.path.join(self.cache_dir, f"{digest}.tasks.json")
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                tasks = json.load(f)
+        except Exception as e:
+            logger.warning(f"Поврежден кэш книги {path}: {e}")
+            return None
+
+        self._remember(digest, tasks)
+        return [dict(task) for task in tasks]
+
+    def put_tasks(self, digest: str, tasks: List[Dict]):
+        get_artifact_store().write_json(os.path.join(self.cache_dir, f"{digest}.tasks.json"), tasks)
+        self._remember(digest, tasks)
+
+    def results(self, digest: str, owner: str) -> Dict[str, ArtifactHandle]:
+        """Последний сохраненный результат владельца owner по каждой строке книги (task_id -> ArtifactHandle)"""
+        path = os.path.join(self.cache_dir, f"{digest}.results.jsonl")
+        results = {}
+        if not os.path.exists(path):
+            return results
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    if entry.get('owner') != str(owner):
+                        continue
+                    handle = ArtifactHandle(**entry['ref'])
+                except (ValueError, KeyError, TypeError):
+                    # Недописанная строка после сбоя
+                    continue
+                results[entry['task_id']] = handle
+        # Ссылки на удаленные блобы не показываем как готовые
+        return {task_id: handle for task_id, handle in results.items() if os.path.exists(handle.path)}
+
+    def record_result(self, digest: str, owner: str, task_id: str, handle: ArtifactHandle):
+        entry = {'owner': str(owner), 'task_id': task_id, 'ref': handle._asdict()}
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(os.path.join(self.cache_dir, f"{digest}.results.jsonl"), 'a', encoding='utf-8') as f:
+                f.write(line)
+
+    def _remember(self, digest: str, tasks: List[Dict]):
+        with self._lock:
+            self._tasks[digest] = tasks
+            self._tasks.move_to_end(digest)
+            while len(self._tasks) > self.MEMORY_ENTRIES:
+                self._tasks.popitem(last=False)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_workbook_cache() -> WorkbookCache:
+    """Общий кэш книг процесса (WORKBOOK_CACHE_DIR, по умолчанию generated_codes/workbooks)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = WorkbookCache()
+        return _cache